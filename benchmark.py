@@ -0,0 +1,265 @@
+"""Benchmarks das operações principais do gerenciador de gastos.
+
+Uso:
+  python benchmark.py                          # 1k, 100k e 1M linhas
+  python benchmark.py --completo               # inclui 10M linhas
+  python benchmark.py --tamanhos 1000,50000 --saida base.json
+  python benchmark.py --comparar base.json     # compara com uma rodada anterior
+  python benchmark.py --paralelo --linhas 2000000
+
+Os dados são sintéticos e reproduzíveis (--semente). Cada tamanho roda num
+diretório temporário; o resultado vai para um JSON com tempo, vazão e pico
+de memória de cada operação.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime
+
+import main
+from main import GastosTable, agregados_equivalentes, agregados_paralelos
+
+
+TAMANHOS_PADRAO = [1_000, 100_000, 1_000_000]
+TAMANHOS_COMPLETO = TAMANHOS_PADRAO + [10_000_000]
+USUARIO_BENCHMARK = "benchmark"
+
+# Categoria -> (descrições, valor típico em R$). O peso de cada categoria
+# cai como 1/posição, então as primeiras concentram a maior parte dos gastos.
+CATEGORIAS = {
+    "Alimentação": (["Almoço no restaurante", "Padaria pão francês", "Açougue", "Café da manhã", "Mercadão"], 45),
+    "Transporte": (["Uber", "Ônibus", "Metrô", "Gasolina", "Estacionamento"], 25),
+    "Moradia": (["Aluguel", "Condomínio", "Conta de luz", "Água e esgoto", "Gás de cozinha"], 600),
+    "Lazer": (["Cinema", "Show", "Viagem de férias", "Assinatura de streaming", "Livraria"], 80),
+    "Saúde": (["Farmácia", "Consulta médica", "Exame de sangue", "Plano de saúde", "Óculos"], 150),
+    "Educação": (["Mensalidade", "Curso de inglês", "Material escolar", "Apostilas"], 300),
+    "Serviços": (["Cabeleireiro", "Lavanderia", "Conserto do celular", "Chaveiro"], 70),
+    "Vestuário": (["Calçados", "Camisetas", "Jaqueta de couro", "Acessórios"], 120),
+}
+# Datas geradas terminam num dia fixo para a rodada ser reproduzível.
+FIM_DATAS = date(2025, 12, 31)
+CIDADES = ["São Paulo", "Brasília", "Goiânia", "Belém", "Maceió", "Florianópolis", "Niterói", "Ribeirão Preto"]
+
+
+def gerar_gastos(quantidade, semente=42, anos=5):
+    """Gastos sintéticos: categorias desbalanceadas, datas espalhadas por
+    `anos` anos (2% sem data) e descrições com acentos."""
+    rnd = random.Random(semente)
+    nomes = list(CATEGORIAS)
+    pesos = [1 / posicao for posicao in range(1, len(nomes) + 1)]
+    fim = FIM_DATAS.toordinal()
+    inicio = fim - anos * 365
+    for _ in range(quantidade):
+        categoria = rnd.choices(nomes, pesos)[0]
+        descricoes, valor_tipico = CATEGORIAS[categoria]
+        descricao = rnd.choice(descricoes)
+        if rnd.random() < 0.3:
+            descricao += f" - {rnd.choice(CIDADES)}"
+        data = None
+        if rnd.random() >= 0.02:
+            data = date.fromordinal(rnd.randint(inicio, fim)).isoformat()
+        yield {
+            "descricao": descricao,
+            "categoria": categoria,
+            "valor": round(rnd.lognormvariate(0, 0.6) * valor_tipico, 2),
+            "data": data,
+        }
+
+
+def pico_memoria_mb(funcao, gastos):
+    """Pico de memória alocada por `funcao(gastos)`, em MB.
+
+    Roda num processo filho (fork) com tracemalloc, sobre uma cópia do
+    diretório: o filho parte do mesmo estado do pai, o que ele grava não
+    afeta a medição de tempo, e o número é só desta operação (não o RSS
+    acumulado do processo). None onde não há fork.
+    """
+    if not hasattr(os, "fork"):
+        return None
+    leitura, escrita = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.close(leitura)
+            copia = tempfile.mkdtemp()
+            shutil.copytree(".", copia, dirs_exist_ok=True)
+            os.chdir(copia)
+            with contextlib.redirect_stdout(io.StringIO()):
+                tracemalloc.start()
+                funcao(gastos)
+                pico = tracemalloc.get_traced_memory()[1]
+            os.write(escrita, str(pico).encode())
+            shutil.rmtree(copia, ignore_errors=True)
+        finally:
+            os._exit(0)
+    os.close(escrita)
+    with os.fdopen(leitura, "rb") as arquivo:
+        pico = arquivo.read()
+    os.waitpid(pid, 0)
+    return round(int(pico) / (1024 * 1024), 1) if pico else None
+
+
+def medir(funcao):
+    inicio = time.perf_counter()
+    resultado = funcao()
+    return time.perf_counter() - inicio, resultado
+
+
+def operacoes():
+    """(nome, função) de cada operação medida; todas recebem a tabela gerada."""
+    inicio = date.fromordinal(FIM_DATAS.toordinal() - 90).isoformat()
+    return [
+        ("salvar_gastos", lambda g: main.salvar_gastos(g, USUARIO_BENCHMARK)),
+        ("carregar_gastos", lambda g: main.carregar_gastos(USUARIO_BENCHMARK)),
+        ("filtrar_por_intervalo", lambda g: main.filtrar_por_intervalo(g, inicio, FIM_DATAS.isoformat())),
+        ("buscar_gastos", lambda g: main.buscar_gastos(g, termo="pão")),
+        ("ordenar_gastos", lambda g: main.ordenar_gastos(g, "valor")),
+        ("ordenar_varios_campos", lambda g: main.ordenar_gastos(g, "categoria,-data,valor")),
+        ("maiores_gastos", lambda g: main.ordenar_gastos(g, "-valor", limite=20)),
+        ("resumo_por_categoria", lambda g: main.resumo_por_categoria(g)),
+        ("relatorio_mensal", lambda g: main.relatorio_por_periodo(g, "mes")),
+        ("relatorio_semanal", lambda g: main.relatorio_por_periodo(g, "semana")),
+        ("exportar_csv", lambda g: main.exportar_csv(g, "benchmark.csv")),
+    ]
+
+
+def rodar_tamanho(quantidade, semente, backend, formato):
+    resultados = []
+    with tempfile.TemporaryDirectory() as pasta:
+        anterior = os.getcwd()
+        os.chdir(pasta)
+        try:
+            main.BACKEND_ARMAZENAMENTO = backend
+            main.FORMATO_JSON = formato
+            segundos, gastos = medir(lambda: GastosTable(gerar_gastos(quantidade, semente)))
+            resultados.append(registro(quantidade, "gerar", segundos, None))
+            print(formatar_registro(resultados[-1]))
+            for nome, funcao in operacoes():
+                memoria = pico_memoria_mb(funcao, gastos)
+                # Avisos de carga não interessam aqui.
+                with contextlib.redirect_stdout(io.StringIO()):
+                    segundos, _ = medir(lambda: funcao(gastos))
+                resultados.append(registro(quantidade, nome, segundos, memoria))
+                print(formatar_registro(resultados[-1]))
+        finally:
+            os.chdir(anterior)
+    return resultados
+
+
+def registro(quantidade, operacao, segundos, memoria_mb):
+    return {
+        "linhas": quantidade,
+        "operacao": operacao,
+        "segundos": round(segundos, 4),
+        "linhas_por_segundo": round(quantidade / segundos) if segundos else None,
+        "memoria_pico_mb": memoria_mb,
+    }
+
+
+def formatar_registro(r):
+    vazao = f"{r['linhas_por_segundo']:>13,}" if r["linhas_por_segundo"] else f"{'-':>13}"
+    memoria = f"{r['memoria_pico_mb']:>9.1f}" if r["memoria_pico_mb"] is not None else f"{'-':>9}"
+    return f"{r['linhas']:>10,} {r['operacao']:<22} {r['segundos']:>9.3f} {vazao} {memoria}"
+
+
+def comparar(resultados, caminho_base):
+    with open(caminho_base, "r", encoding="utf-8") as f:
+        base = {(r["linhas"], r["operacao"]): r for r in json.load(f)["resultados"]}
+    print(f"\nComparação com {caminho_base} (tempo atual / tempo base):")
+    for r in resultados:
+        anterior = base.get((r["linhas"], r["operacao"]))
+        if not anterior or not anterior["segundos"]:
+            continue
+        razao = r["segundos"] / anterior["segundos"]
+        alerta = "  <- mais lento" if razao > 1.2 else ""
+        print(f"{r['linhas']:>10,} {r['operacao']:<22} {razao:>6.2f}x{alerta}")
+
+
+def benchmark_operacoes(args):
+    if args.tamanhos:
+        tamanhos = [int(t) for t in args.tamanhos.split(",")]
+    else:
+        tamanhos = TAMANHOS_COMPLETO if args.completo else TAMANHOS_PADRAO
+
+    print(f"{'linhas':>10} {'operação':<22} {'segundos':>9} {'linhas/s':>13} {'Mem (MB)':>9}")
+    resultados = []
+    for quantidade in tamanhos:
+        resultados += rodar_tamanho(quantidade, args.semente, args.backend, args.formato)
+
+    saida = args.saida or f"benchmark_{datetime.now():%Y%m%d_%H%M%S}.json"
+    with open(saida, "w", encoding="utf-8") as f:
+        json.dump({
+            "data": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "backend": args.backend,
+            "formato": args.formato,
+            "semente": args.semente,
+            # memoria_pico_mb: o que cada operação alocou (tracemalloc).
+            "resultados": resultados,
+        }, f, ensure_ascii=False, indent=2)
+    print(f"\nResultados gravados em {saida}")
+
+    if args.comparar:
+        comparar(resultados, args.comparar)
+
+
+def benchmark_paralelo(args):
+    nucleos = main.cpus_disponiveis()
+    if args.processos:
+        processos = [int(p) for p in args.processos.split(",")]
+    else:
+        processos = [1]
+        while processos[-1] * 2 <= nucleos:
+            processos.append(processos[-1] * 2)
+        if processos[-1] != nucleos:
+            processos.append(nucleos)
+
+    print(f"Gerando {args.linhas} gastos (semente {args.semente})...")
+    gastos = GastosTable()
+    gastos.extend(gerar_gastos(args.linhas, args.semente), agregar=False)
+
+    base, referencia = medir(lambda: agregados_paralelos(gastos, 1))
+    print(f"\n{'processos':>9} {'segundos':>9} {'aceleração':>10} {'eficiência':>10}")
+    print(f"{1:>9} {base:>9.2f} {1.0:>10.2f} {1.0:>10.0%}")
+    for n in processos:
+        if n == 1:
+            continue
+        segundos, resultado = medir(lambda: agregados_paralelos(gastos, n))
+        if not agregados_equivalentes(referencia, resultado):
+            raise SystemExit(f"Resultado com {n} processos difere do serial.")
+        print(f"{n:>9} {segundos:>9.2f} {base / segundos:>10.2f} {base / segundos / n:>10.0%}")
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description="Benchmarks do gerenciador de gastos.")
+    parser.add_argument("--tamanhos", help="quantidades de linhas separadas por vírgula")
+    parser.add_argument("--completo", action="store_true", help="roda também com 10 milhões de linhas")
+    parser.add_argument("--backend", choices=("json", "binario"), default="json")
+    parser.add_argument("--formato", choices=("compacto", "legado"), default=main.FORMATO_JSON,
+                        help="formato do snapshot JSON")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--saida", help="arquivo JSON de resultados")
+    parser.add_argument("--comparar", metavar="JSON", help="resultados anteriores para comparação")
+    parser.add_argument("--paralelo", action="store_true", help="mede só a aceleração do resumo paralelo")
+    parser.add_argument("--linhas", type=int, default=2_000_000, help="linhas do --paralelo")
+    parser.add_argument("--processos", help="lista de processos do --paralelo (padrão: 1, 2, 4... até os núcleos)")
+    args = parser.parse_args()
+
+    if args.paralelo:
+        benchmark_paralelo(args)
+    else:
+        benchmark_operacoes(args)
+
+
+if __name__ == "__main__":
+    main_benchmark()
@@ -1,8 +1,48 @@
 import json
+import argparse
+import asyncio
+import atexit
+import contextlib
 import csv
+import gzip
+import operator
 import os
+import re
+import shutil
+import signal
+import sys
 import hashlib
-from datetime import datetime
+import heapq
+import mmap
+import multiprocessing
+import time
+import types
+import unicodedata
+import sqlite3
+import struct
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from functools import lru_cache, partial
+from itertools import chain, islice
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem travas entre processos
+    fcntl = None
+
+# Codecs JSON mais rápidos, se instalados; senão fica o json da biblioteca padrão.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import ujson
+except ImportError:
+    ujson = None
 
 
 # =========================
@@ -12,11 +52,93 @@ from datetime import datetime
 ARQUIVO_EXPORT = "gastos_export.csv"
 ARQUIVO_USUARIOS = "usuarios.json"
 
+# Quantas linhas o export CSV junta antes de cada writerows.
+TAMANHO_LOTE_EXPORT = 5000
+
+# Quantos registros de um extrato são validados por vez na importação.
+TAMANHO_LOTE_IMPORT = 10000
+TAMANHO_PAGINA = 20
+
+# Abaixo disso o resumo paralelo roda no próprio processo: subir os
+# processos custa mais do que somar as linhas.
+MINIMO_RESUMO_PARALELO = 200_000
+
+# Quantas permutações de ordenação (uma por combinação de critérios) a
+# GastosTable guarda; cada uma ocupa 4 bytes por gasto.
+ORDENS_GUARDADAS = 4
+
+# Quantos arquivos de usuário o relatório administrativo carrega ao mesmo tempo.
+MAXIMO_PROCESSOS_RELATORIO = 8
+
+# "json" (padrão), "binario" (snapshot mapeado com mmap) ou "sqlite".
+# Os menus são os mesmos em todos os casos.
+BACKEND_ARMAZENAMENTO = os.environ.get("GASTOS_BACKEND", "json").strip().lower()
+
+# Formato de gastos_<usuario>.json e usuarios.json ao gravar:
+#   compacto  cada gasto é uma lista posicional sob um cabeçalho com os
+#             campos, sem indentação (padrão)
+#   legado    lista de dicts indentada, como nas versões antigas
+# A leitura reconhece os dois; "convert --formato" regrava os arquivos.
+FORMATO_JSON = os.environ.get("GASTOS_FORMATO", "compacto").strip().lower()
+
+# Acima deste tamanho o journal é incorporado ao snapshot JSON.
+LIMITE_JOURNAL_BYTES = 256 * 1024
+
+# Quando as alterações feitas nos menus vão para o journal:
+#   imediata     a cada alteração (padrão)
+#   lote:N       a cada N alterações
+#   intervalo:T  a cada T segundos, por uma thread em segundo plano
+#   saida        só ao sair (ou em "Salvar agora")
+# Em todos os casos o que estiver pendente é gravado ao encerrar, inclusive
+# por Ctrl+C, SIGTERM ou SIGHUP; só um kill -9 ou uma queda de energia
+# perdem as alterações ainda não gravadas.
+POLITICA_GRAVACAO = os.environ.get("GASTOS_GRAVACAO", "imediata").strip().lower()
+
+# Quantas versões anteriores de cada snapshot (e do usuarios.json) ficam
+# guardadas como <arquivo>.1, <arquivo>.2...
+BACKUPS_MANTIDOS = 3
+
+# Servidor (python main.py serve): endereço padrão ("host:porta" ou
+# "unix:/caminho/do/socket"), de quanto em quanto tempo as alterações
+# acumuladas vão para o journal e o maior pedido/resposta aceito.
+ENDERECO_SERVIDOR = "127.0.0.1:8765"
+INTERVALO_GRAVACAO_SERVIDOR = 0.5
+LIMITE_LINHA_PROTOCOLO = 256 * 1024 * 1024
+# Exports pedidos ao servidor vão para <pasta>/<usuario>/, nunca para o
+# caminho que o cliente mandou.
+PASTA_EXPORT_SERVIDOR = "exports"
+
+# Quantas vezes a carga é refeita se outra sessão gravar um snapshot novo
+# enquanto ele está sendo lido.
+TENTATIVAS_CARGA = 5
+
 
 def arquivo_dados_do_usuario(usuario):
     return f"gastos_{usuario}.json"
 
 
+def arquivo_binario_do_usuario(usuario):
+    return f"gastos_{usuario}.bin"
+
+
+def arquivo_journal_do_usuario(usuario, backend=None):
+    if (backend or BACKEND_ARMAZENAMENTO) == "binario":
+        return f"gastos_{usuario}.bin.journal"
+    return f"gastos_{usuario}.journal"
+
+
+def arquivo_agregados_do_usuario(usuario):
+    return f"gastos_{usuario}.resumo.json"
+
+
+def arquivo_sqlite_do_usuario(usuario):
+    return f"gastos_{usuario}.db"
+
+
+def arquivo_trava_do_usuario(usuario):
+    return f"gastos_{usuario}.lock"
+
+
 # =========================
 # Usuários (login/cadastro)
 # =========================
@@ -25,21 +147,39 @@ def hash_senha(senha):
     return hashlib.sha256(senha.encode("utf-8")).hexdigest()
 
 
+def ler_usuarios(caminho):
+    with open(caminho, "rb") as f:
+        dados = decodificar_json(f.read())
+        return dados if isinstance(dados, dict) else {}
+
+
 def carregar_usuarios():
     try:
-        with open(ARQUIVO_USUARIOS, "r", encoding="utf-8") as f:
-            dados = json.load(f)
-            return dados if isinstance(dados, dict) else {}
+        return ler_usuarios(ARQUIVO_USUARIOS)
     except FileNotFoundError:
         return {}
-    except json.JSONDecodeError:
-        print("\n⚠️ usuarios.json corrompido. Criando novo.")
-        return {}
+    except ValueError:
+        pass
 
+    for n in range(1, BACKUPS_MANTIDOS + 1):
+        try:
+            usuarios = ler_usuarios(f"{ARQUIVO_USUARIOS}.{n}")
+        except (OSError, ValueError):
+            continue
+        print(f"\n⚠️ usuarios.json corrompido. Usando o backup {ARQUIVO_USUARIOS}.{n}.")
+        return usuarios
+    print("\n⚠️ usuarios.json corrompido. Criando novo.")
+    return {}
 
-def salvar_usuarios(usuarios):
-    with open(ARQUIVO_USUARIOS, "w", encoding="utf-8") as f:
-        json.dump(usuarios, f, ensure_ascii=False, indent=2)
+
+def salvar_usuarios(usuarios, formato=None):
+    if (formato or FORMATO_JSON) == "legado":
+        conteudo = json.dumps(usuarios, ensure_ascii=False, indent=2).encode("utf-8")
+    else:
+        conteudo = codificar_json(usuarios)
+    with travar_arquivo(ARQUIVO_USUARIOS + ".lock"):
+        rotacionar_backups(ARQUIVO_USUARIOS)
+        escrever_arquivo_atomico(ARQUIVO_USUARIOS, conteudo)
 
 
 def nome_usuario_valido(usuario):
@@ -84,8 +224,16 @@ def cadastrar_usuario():
 
         break
 
-    usuarios[usuario] = {"senha_hash": hash_senha(senha)}
-    salvar_usuarios(usuarios)
+    # Relê sob a trava: outra sessão pode ter cadastrado alguém (ou o
+    # mesmo nome) enquanto a senha era digitada.
+    with travar_arquivo(ARQUIVO_USUARIOS + ".lock"):
+        usuarios = carregar_usuarios()
+        if usuario in usuarios:
+            print("\nEsse usuário acabou de ser criado em outra sessão.")
+            pausar()
+            return None
+        usuarios[usuario] = {"senha_hash": hash_senha(senha)}
+        salvar_usuarios(usuarios)
 
     print("\n✅ Usuário criado com sucesso!")
     pausar()
@@ -150,27 +298,2204 @@ def menu_autenticacao():
             pausar()
 
 
+# =========================
+# Valores em centavos
+# =========================
+
+# Dentro da GastosTable, dos snapshots e dos resumos os valores são
+# centavos inteiros, então somas de milhões de gastos fecham no centavo.
+# Nos dicts que os menus veem, "valor" continua em reais (float):
+# centavos / 100 volta aos mesmos centavos com round(valor * 100).
+
+CENTAVO = Decimal("0.01")
+# Acima disso centavos / 100 deixa de voltar exato do float.
+MAXIMO_CENTAVOS = 2 ** 53 - 1
+
+
+def centavos_de_texto(texto):
+    """Centavos de "12,50", "12.5" ou "3" (meio centavo arredonda para
+    cima); ValueError se não for um número."""
+    try:
+        valor = Decimal(str(texto).strip().replace(",", "."))
+    except InvalidOperation:
+        raise ValueError(f"valor inválido: {texto!r}") from None
+    if not valor.is_finite():
+        raise ValueError(f"valor inválido: {texto!r}")
+    try:
+        centavos = int(valor.quantize(CENTAVO, ROUND_HALF_UP).scaleb(2))
+    except ArithmeticError:
+        # quantize passa da precisão do contexto (1e30, por exemplo).
+        raise ValueError(f"valor grande demais: {texto!r}") from None
+    if abs(centavos) > MAXIMO_CENTAVOS:
+        raise ValueError(f"valor grande demais: {texto!r}")
+    return centavos
+
+
+def centavos_de_valor(valor):
+    """Centavos de um valor em reais: float, int, Decimal ou texto."""
+    if isinstance(valor, float):
+        # Caminho rápido: floats vindos de centavos (ou digitados com até
+        # duas casas) ficam a menos de um milionésimo de um inteiro.
+        escalado = valor * 100
+        if abs(escalado) < MAXIMO_CENTAVOS:
+            centavos = round(escalado)
+            if abs(escalado - centavos) < 1e-6:
+                return centavos
+        return centavos_de_texto(repr(valor))
+    return centavos_de_texto(valor)
+
+
+def centavos_do_gasto(gasto):
+    centavos = gasto.get("centavos")
+    if type(centavos) is int:
+        return centavos
+    return centavos_de_valor(gasto.get("valor", 0))
+
+
+def reais(centavos):
+    return centavos / 100
+
+
+def formatar_centavos(centavos):
+    """"1234.50" a partir de 123450, sem passar por float."""
+    inteiro, resto = divmod(abs(centavos), 100)
+    return f"{'-' if centavos < 0 else ''}{inteiro}.{resto:02d}"
+
+
+def media_em_centavos(total, quantidade):
+    """Média de `total` centavos em `quantidade` partes, em centavos inteiros;
+    meio centavo arredonda para longe do zero, como em centavos_de_texto."""
+    inteiro, resto = divmod(abs(total), quantidade)
+    if resto * 2 >= quantidade:
+        inteiro += 1
+    return -inteiro if total < 0 else inteiro
+
+
+# =========================
+# Tabela de gastos (memória)
+# =========================
+
+# Em vez de uma lista de dicts, os gastos ficam em colunas compactas:
+# valores em centavos num array('q'), datas como ordinal (0 = sem data) e
+# categorias e descrições como códigos para um pool de textos distintos. Os menus
+# continuam vendo dicts: cada leitura monta um dict novo a partir das
+# colunas, e alterar um gasto exige gravá-lo de volta com `gastos[i] = g`.
+#
+# Cada linha também tem um id estável. Normalmente _ids cresce com as linhas
+# e id -> posição é um bisect nele; só se um snapshot ou journal trouxer ids
+# fora de ordem é montado o dict _slots. Os gastos com data válida ficam num
+# índice ordenado por (ordinal, id), mantido a cada alteração; filtros por
+# mês ou intervalo viram dois bisects e uma fatia. Os demais ficam no balde
+# _sem_data.
+#
+# Para a busca, cada descrição distinta (código do pool) é normalizada uma
+# vez e tem seus trigramas num índice invertido; a busca por trecho cruza os
+# trigramas do termo, confirma o trecho só nas descrições candidatas e junta
+# as linhas de cada uma. Categorias normalizadas apontam direto para as linhas.
+# As listas do índice são arrays ordenados de códigos ou ids, não sets:
+# ocupam 4 a 8 bytes por entrada em vez de um int e um slot de set.
+#
+# Os resumos (total, por categoria, por mês e por mês/categoria) também são
+# mantidos a cada alteração, em baldes [quantidade, soma]; assim "Resumo
+# geral" e "Resumo por mês" não percorrem as linhas. verificar_agregados()
+# recalcula tudo a partir das linhas. Os baldes por semana só são montados
+# quando pedidos e ficam guardados por mês: uma alteração descarta apenas
+# os do mês do gasto alterado.
+#
+# Índices e resumos podem ficar "pendentes" (_indices_prontos e
+# _agregados_prontos falsos): nesse estado as alterações não os atualizam
+# e eles são montados por inteiro na primeira consulta que precisar. É o que
+# deixa a carga rápida — e, no snapshot binário, as colunas são memoryviews
+# sobre o arquivo mapeado, copiadas para arrays só na primeira alteração.
+
+class TextosMapeados:
+    """Sequência de textos decodificados sob demanda de um heap UTF-8."""
+
+    def __init__(self, offsets, heap):
+        self.offsets = offsets
+        self.heap = heap
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return str(self.heap[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+class PoolTextos:
+    """Guarda cada texto distinto uma única vez e devolve um código para ele.
+
+    `textos` pode começar como TextosMapeados; só vira lista (e ganha o
+    dicionário texto -> código) quando um texto novo precisa ser codificado.
+    """
+
+    def __init__(self, textos=None):
+        self.textos = [] if textos is None else textos
+        self.codigos = {} if textos is None else None
+
+    def codigo(self, texto):
+        if self.codigos is None:
+            self.textos = list(self.textos)
+            self.codigos = {t: i for i, t in enumerate(self.textos)}
+        codigo = self.codigos.get(texto)
+        if codigo is None:
+            codigo = len(self.textos)
+            self.textos.append(texto)
+            self.codigos[texto] = codigo
+        return codigo
+
+
+def data_para_ordinal(data):
+    """0 para "sem data"; datas fora do formato YYYY-MM-DD ficam como None."""
+    if not isinstance(data, str) or not data:
+        return 0
+    try:
+        # Caminho rápido para o formato canônico; strptime fica para o resto
+        # (ele também aceita, por exemplo, "2026-2-8").
+        if len(data) == 10 and data[4] == data[7] == "-" and data[:4].isdigit() \
+                and data[5:7].isdigit() and data[8:].isdigit():
+            return date(int(data[:4]), int(data[5:7]), int(data[8:])).toordinal()
+        return datetime.strptime(data, "%Y-%m-%d").toordinal()
+    except ValueError:
+        return None
+
+
+def mes_do_ordinal(ordinal):
+    dia = date.fromordinal(ordinal)
+    return f"{dia.year:04d}-{dia.month:02d}"
+
+
+def inserir_ordenado(postagens, valor):
+    """Insere `valor` num array ordenado (no fim, no caso comum)."""
+    if not postagens or postagens[-1] < valor:
+        postagens.append(valor)
+    else:
+        pos = bisect_left(postagens, valor)
+        if pos == len(postagens) or postagens[pos] != valor:
+            postagens.insert(pos, valor)
+
+
+def remover_ordenado(postagens, valor):
+    pos = bisect_left(postagens, valor)
+    if pos < len(postagens) and postagens[pos] == valor:
+        del postagens[pos]
+
+
+def somar_no_balde(baldes, chave, quantidade, valor):
+    """Baldes de agregação são [quantidade, soma]; vazios são descartados."""
+    balde = baldes.setdefault(chave, [0, 0])
+    balde[0] += quantidade
+    balde[1] += valor
+    if balde[0] == 0:
+        del baldes[chave]
+
+
+def intervalo_do_mes(yyyy_mm):
+    """(primeiro ordinal do mês, primeiro ordinal do mês seguinte) ou None."""
+    if len(yyyy_mm) != 7:
+        return None
+    try:
+        inicio = datetime.strptime(yyyy_mm, "%Y-%m").date()
+        seguinte = date(inicio.year + inicio.month // 12, inicio.month % 12 + 1, 1)
+    except ValueError:
+        return None
+    return inicio.toordinal(), seguinte.toordinal()
+
+
+def agregados_equivalentes(a, b):
+    def baldes_iguais(x, y):
+        return x.keys() == y.keys() and all(x[k][:2] == y[k][:2] for k in x)
+
+    return (
+        a["total"] == b["total"]
+        and baldes_iguais(a["categorias"], b["categorias"])
+        and baldes_iguais(a["meses"], b["meses"])
+        and all(baldes_iguais(a["meses"][m][2], b["meses"][m][2]) for m in a["meses"])
+    )
+
+
+class GastosTable:
+    def __init__(self, gastos=()):
+        # (backend, base do snapshot, tamanho do journal) que a tabela
+        # reflete; None para tabelas que não vieram do disco.
+        self.versao_arquivo = None
+        self._versao_gravada = None
+        self.clear()
+        self.extend(gastos)
+
+    @classmethod
+    def de_colunas(cls, valores, datas, categorias, descricoes, ids,
+                   textos_categorias, textos_descricoes, textos_datas_invalidas):
+        """Tabela sobre colunas já prontas (arrays ou memoryviews somente leitura)."""
+        tabela = cls()
+        tabela._valores, tabela._datas, tabela._ids = valores, datas, ids
+        tabela._categorias, tabela._descricoes = categorias, descricoes
+        tabela._pool_categorias = PoolTextos(textos_categorias)
+        tabela._pool_descricoes = PoolTextos(textos_descricoes)
+        tabela._datas_invalidas = PoolTextos(textos_datas_invalidas)
+        tabela._proximo_id = ids[-1] + 1 if len(ids) else 1
+        # Conferido só quando alguém procurar ou acrescentar um id.
+        tabela._ids_ordenados = None
+        tabela._indices_prontos = False
+        tabela._agregados_prontos = False
+        return tabela
+
+    def colunas_compactadas(self):
+        """Colunas e pools sem os textos que nenhuma linha usa mais."""
+        self._compactar()
+
+        def compactar(codigos, textos):
+            usados = sorted(set(codigos))
+            novos = {antigo: i for i, antigo in enumerate(usados)}
+            return array("I", (novos[c] for c in codigos)), [textos[c] for c in usados]
+
+        categorias, textos_categorias = compactar(self._categorias, self._pool_categorias.textos)
+        descricoes, textos_descricoes = compactar(self._descricoes, self._pool_descricoes.textos)
+        return {
+            "valores": self._valores, "datas": self._datas, "ids": self._ids,
+            "categorias": categorias, "descricoes": descricoes,
+            "textos_categorias": textos_categorias, "textos_descricoes": textos_descricoes,
+            "textos_datas_invalidas": list(self._datas_invalidas.textos),
+        }
+
+    def _garantir_mutavel(self):
+        if isinstance(self._valores, memoryview):
+            colunas = []
+            for coluna in (self._valores, self._datas, self._categorias, self._descricoes, self._ids):
+                copia = array(coluna.format)
+                copia.frombytes(coluna.cast("B"))
+                colunas.append(copia)
+            self._valores, self._datas, self._categorias, self._descricoes, self._ids = colunas
+
+    def _garantir_indices(self):
+        if not self._indices_prontos:
+            self._reconstruir_indice()
+
+    def _garantir_ordem_dos_ids(self):
+        if self._ids_ordenados is None:
+            ids = self._ids
+            self._ids_ordenados = all(map(operator.lt, ids, islice(ids, 1, None)))
+            if not self._ids_ordenados:
+                self._proximo_id = max(self._proximo_id, max(ids) + 1)
+
+    def _garantir_slots(self):
+        """Monta _slots, mas só se os ids estiverem fora de ordem."""
+        self._garantir_ordem_dos_ids()
+        if self._slots is None and not self._ids_ordenados:
+            self._slots = {
+                id_gasto: slot for slot, id_gasto in enumerate(self._ids) if slot not in self._lapides
+            }
+
+    def _compactar(self):
+        """Descarta de vez as linhas marcadas como removidas."""
+        if not self._lapides:
+            return
+        manter = [slot for slot in range(len(self._ids)) if slot not in self._lapides]
+        self._valores, self._datas, self._categorias, self._descricoes, self._ids = (
+            array(coluna.typecode, (coluna[slot] for slot in manter))
+            for coluna in (self._valores, self._datas, self._categorias, self._descricoes, self._ids)
+        )
+        self._lapides = set()
+        self._slots = None
+        self._versao += 1
+
+    def _garantir_agregados(self):
+        if not self._agregados_prontos:
+            self._compactar()
+            self._total, self._por_categoria, self._por_mes = 0, {}, {}
+            self._semanas_por_mes = {}
+            self._agregados_prontos = True
+            for i in range(len(self)):
+                self._agregar(i, 1)
+
+    def clear(self):
+        self._valores = array("q")
+        # >0: ordinal da data; 0: sem data; <0: -(código + 1) em _datas_invalidas.
+        self._datas = array("i")
+        self._categorias = array("I")
+        self._descricoes = array("I")
+        self._pool_categorias = PoolTextos()
+        self._pool_descricoes = PoolTextos()
+        self._datas_invalidas = PoolTextos()
+        # Cada gasto tem um id único e estável; com _ids em ordem a posição
+        # sai de um bisect, senão de _slots (id -> posição nas colunas),
+        # montado sob demanda. Remover só marca a posição em
+        # _lapides; as colunas são compactadas quando as lápides passam de
+        # um quarto das linhas (ou quando alguém precisa de posições).
+        self._ids = array("q")
+        self._proximo_id = 1
+        self._ids_ordenados = True
+        self._slots = None
+        self._lapides = set()
+        self._indice_ordinais = array("i")
+        self._indice_ids = array("q")
+        self._sem_data = set()
+        self._indices_prontos = True
+        self._descricoes_n = []
+        self._categorias_n = []
+        self._trigramas = {}
+        self._descricoes_com_trigramas = 0
+        self._linhas_por_descricao = {}
+        self._linhas_por_categoria_n = {}
+        self._total = 0
+        self._por_categoria = {}
+        self._por_mes = {}
+        self._semanas_por_mes = {}
+        self._agregados_prontos = True
+        # Chaves e permutações de ordenação guardadas com a _versao em que
+        # foram calculadas; qualquer alteração nas linhas muda a versão. Só
+        # as ORDENS_GUARDADAS permutações mais recentes ficam.
+        self._versao = getattr(self, "_versao", 0) + 1
+        self._chaves_ordenacao = {}
+        self._ordens = {}
+
+    def marcar_gravada(self, versao_arquivo):
+        """Anota que a tabela, como está agora, é o que há em disco."""
+        self.versao_arquivo = versao_arquivo
+        self._versao_gravada = self._versao
+
+    def alterada(self):
+        """True se houve alguma alteração desde a última marcar_gravada."""
+        return self._versao != self._versao_gravada
+
+    def _agregar(self, i, sinal):
+        if not self._agregados_prontos:
+            return
+        valor = self._valores[i] * sinal
+        categoria = self._pool_categorias.textos[self._categorias[i]]
+        self._total += valor
+        somar_no_balde(self._por_categoria, categoria, sinal, valor)
+
+        ordinal = self._datas[i]
+        if ordinal > 0:
+            mes = mes_do_ordinal(ordinal)
+            self._semanas_por_mes.pop(mes, None)
+            balde = self._por_mes.setdefault(mes, [0, 0, {}])
+            balde[0] += sinal
+            balde[1] += valor
+            somar_no_balde(balde[2], categoria, sinal, valor)
+            if balde[0] == 0:
+                del self._por_mes[mes]
+
+    def agregados(self):
+        self._garantir_agregados()
+        return {"total": self._total, "categorias": self._por_categoria, "meses": self._por_mes}
+
+    def adotar_agregados(self, agregados):
+        self._total = agregados["total"]
+        self._por_categoria = agregados["categorias"]
+        self._por_mes = agregados["meses"]
+        self._semanas_por_mes = {}
+        self._agregados_prontos = True
+
+    def verificar_agregados(self, recalculados=None):
+        """Recalcula os resumos a partir das linhas; False se estavam divergentes.
+
+        `recalculados` permite passar resumos já recalculados por fora
+        (por exemplo, por agregados_paralelos).
+        """
+        anteriores = self.agregados()
+        if recalculados is None:
+            self._agregados_prontos = False
+            return agregados_equivalentes(anteriores, self.agregados())
+        self.adotar_agregados(recalculados)
+        return agregados_equivalentes(anteriores, recalculados)
+
+    def resumo(self):
+        """(quantidade, total, total por categoria) da tabela inteira, em centavos."""
+        self._garantir_agregados()
+        return len(self), self._total, {cat: balde[1] for cat, balde in self._por_categoria.items()}
+
+    def resumo_mes(self, yyyy_mm):
+        self._garantir_agregados()
+        qtd, soma, categorias = self._por_mes.get(yyyy_mm, (0, 0, {}))
+        return qtd, soma, {cat: balde[1] for cat, balde in categorias.items()}
+
+    def por_semana(self):
+        """Baldes {semana ISO "YYYY-Www": [qtd, soma, {categoria: [qtd, soma]}]}.
+
+        Só os meses sem baldes guardados são recalculados: todos numa
+        passada pelas linhas na primeira vez; depois, só as linhas dos
+        meses alterados, achadas pelo índice de datas.
+        """
+        self._garantir_agregados()
+        faltando = {mes for mes in self._por_mes if mes not in self._semanas_por_mes}
+        if faltando:
+            if len(faltando) * 2 > len(self._por_mes):
+                self._compactar()
+                slots = range(len(self._valores))
+            elif not self._indices_prontos:
+                # Montar o índice só para isto custa mais que uma passada.
+                self._compactar()
+                dias = set()
+                for mes in faltando:
+                    dias.update(range(*intervalo_do_mes(mes)))
+                slots = [i for i, ordinal in enumerate(self._datas) if ordinal in dias]
+            else:
+                slots = []
+                for mes in faltando:
+                    inicio, fim = intervalo_do_mes(mes)
+                    lo = bisect_left(self._indice_ordinais, inicio)
+                    hi = bisect_left(self._indice_ordinais, fim, lo)
+                    slots.extend(self._slots_dos_ids(self._indice_ids[lo:hi]))
+            self._acumular_semanas(slots, faltando)
+
+        semanas = {}
+        for mes in sorted(self._por_mes):
+            for semana, (qtd, soma, por_categoria) in self._semanas_por_mes[mes].items():
+                balde = semanas.setdefault(semana, [0, 0, {}])
+                balde[0] += qtd
+                balde[1] += soma
+                for categoria, (qtd_cat, soma_cat) in por_categoria.items():
+                    somar_no_balde(balde[2], categoria, qtd_cat, soma_cat)
+        return semanas
+
+    def _acumular_semanas(self, slots, meses):
+        # Primeiro por (dia, categoria), que são poucos; depois os dias são
+        # juntados nas semanas.
+        datas, valores, categorias = self._datas, self._valores, self._categorias
+        por_dia = {}
+        for i in slots:
+            ordinal = datas[i]
+            if ordinal <= 0:
+                continue
+            chave = (ordinal, categorias[i])
+            balde = por_dia.get(chave)
+            if balde is None:
+                por_dia[chave] = [1, valores[i]]
+            else:
+                balde[0] += 1
+                balde[1] += valores[i]
+
+        for mes in meses:
+            self._semanas_por_mes[mes] = {}
+        textos = self._pool_categorias.textos
+        for (ordinal, codigo), (qtd, soma) in por_dia.items():
+            dia = date.fromordinal(ordinal)
+            mes = f"{dia.year:04d}-{dia.month:02d}"
+            if mes not in meses:
+                continue
+            ano, semana, _ = dia.isocalendar()
+            balde = self._semanas_por_mes[mes].setdefault(f"{ano:04d}-W{semana:02d}", [0, 0, {}])
+            balde[0] += qtd
+            balde[1] += soma
+            somar_no_balde(balde[2], textos[codigo], qtd, soma)
+
+    def _normalizar_pools(self):
+        """Completa as versões normalizadas dos textos (uma por código do pool)."""
+        for pool, normalizados in ((self._pool_descricoes, self._descricoes_n),
+                                   (self._pool_categorias, self._categorias_n)):
+            textos = pool.textos
+            normalizados.extend(normalizar_texto(textos[codigo]) for codigo in range(len(normalizados), len(textos)))
+
+    def _indexar_texto(self, id_linha, cod_descricao, cod_categoria):
+        if not self._indices_prontos:
+            return
+        self._normalizar_pools()
+        while self._descricoes_com_trigramas < len(self._descricoes_n):
+            codigo = self._descricoes_com_trigramas
+            normalizada = self._descricoes_n[codigo]
+            for i in range(len(normalizada) - 2):
+                codigos = self._trigramas.get(normalizada[i:i + 3])
+                if codigos is None:
+                    self._trigramas[normalizada[i:i + 3]] = array("I", (codigo,))
+                elif codigos[-1] != codigo:
+                    codigos.append(codigo)
+            self._descricoes_com_trigramas += 1
+
+        linhas = self._linhas_por_descricao.get(cod_descricao)
+        if linhas is None:
+            linhas = self._linhas_por_descricao[cod_descricao] = array("q")
+        inserir_ordenado(linhas, id_linha)
+        cat_n = self._categorias_n[cod_categoria]
+        linhas = self._linhas_por_categoria_n.get(cat_n)
+        if linhas is None:
+            linhas = self._linhas_por_categoria_n[cat_n] = array("q")
+        inserir_ordenado(linhas, id_linha)
+
+    def _desindexar_texto(self, id_linha, cod_descricao, cod_categoria):
+        if not self._indices_prontos:
+            return
+        remover_ordenado(self._linhas_por_descricao[cod_descricao], id_linha)
+        remover_ordenado(self._linhas_por_categoria_n[self._categorias_n[cod_categoria]], id_linha)
+
+    def _indexar(self, id_linha, ordinal):
+        if not self._indices_prontos:
+            return
+        if ordinal <= 0:
+            self._sem_data.add(id_linha)
+            return
+        inicio = bisect_left(self._indice_ordinais, ordinal)
+        fim = bisect_right(self._indice_ordinais, ordinal, inicio)
+        pos = bisect_left(self._indice_ids, id_linha, inicio, fim)
+        self._indice_ordinais.insert(pos, ordinal)
+        self._indice_ids.insert(pos, id_linha)
+
+    def _desindexar(self, id_linha, ordinal):
+        if not self._indices_prontos:
+            return
+        if ordinal <= 0:
+            self._sem_data.discard(id_linha)
+            return
+        inicio = bisect_left(self._indice_ordinais, ordinal)
+        fim = bisect_right(self._indice_ordinais, ordinal, inicio)
+        pos = bisect_left(self._indice_ids, id_linha, inicio, fim)
+        del self._indice_ordinais[pos]
+        del self._indice_ids[pos]
+
+    def _reconstruir_indice(self):
+        self._compactar()
+        pares = sorted(
+            (ordinal, id_linha) for ordinal, id_linha in zip(self._datas, self._ids) if ordinal > 0
+        )
+        self._indice_ordinais = array("i", (ordinal for ordinal, _ in pares))
+        self._indice_ids = array("q", (id_linha for _, id_linha in pares))
+        self._sem_data = {id_linha for ordinal, id_linha in zip(self._datas, self._ids) if ordinal <= 0}
+
+        self._indices_prontos = True
+        self._linhas_por_descricao = {}
+        self._linhas_por_categoria_n = {}
+        for id_linha, cod_descricao, cod_categoria in zip(self._ids, self._descricoes, self._categorias):
+            self._indexar_texto(id_linha, cod_descricao, cod_categoria)
+
+    def _procurar_slot(self, id_gasto):
+        """Posição do gasto `id_gasto` nas colunas, ou None."""
+        self._garantir_slots()
+        if self._slots is not None:
+            return self._slots.get(id_gasto)
+        slot = bisect_left(self._ids, id_gasto)
+        if slot < len(self._ids) and self._ids[slot] == id_gasto and slot not in self._lapides:
+            return slot
+        return None
+
+    def _slots_dos_ids(self, ids):
+        """Posições de ids sabidamente em uso (vindos dos índices)."""
+        self._garantir_slots()
+        if self._slots is not None:
+            return map(self._slots.__getitem__, ids)
+        return map(partial(bisect_left, self._ids), ids)
+
+    def _slot(self, id_gasto):
+        slot = self._procurar_slot(id_gasto)
+        if slot is None:
+            raise KeyError(f"gasto #{id_gasto} não encontrado")
+        return slot
+
+    def tem_id(self, id_gasto):
+        return self._procurar_slot(id_gasto) is not None
+
+    def _codificar_data(self, data):
+        ordinal = data_para_ordinal(data)
+        if ordinal is None:
+            return -(self._datas_invalidas.codigo(data) + 1)
+        return ordinal
+
+    def _decodificar_data(self, codigo):
+        if codigo > 0:
+            return date.fromordinal(codigo).isoformat()
+        if codigo < 0:
+            return self._datas_invalidas.textos[-codigo - 1]
+        return None
+
+    def _indice(self, i):
+        self._compactar()
+        n = len(self._valores)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError("índice de gasto fora do intervalo")
+        return i
+
+    def __len__(self):
+        return len(self._valores) - len(self._lapides)
+
+    def _linha(self, i):
+        return {
+            "id": self._ids[i],
+            "descricao": self._pool_descricoes.textos[self._descricoes[i]],
+            "categoria": self._pool_categorias.textos[self._categorias[i]],
+            "valor": self._valores[i] / 100,
+            "data": self._decodificar_data(self._datas[i]),
+        }
+
+    def __getitem__(self, i):
+        return self._linha(self._indice(i))
+
+    def __setitem__(self, i, gasto):
+        self._atualizar(self._indice(i), gasto)
+
+    def gasto_por_id(self, id_gasto):
+        return self._linha(self._slot(id_gasto))
+
+    def editar_por_id(self, id_gasto, gasto):
+        self._atualizar(self._slot(id_gasto), gasto)
+
+    def _atualizar(self, i, gasto):
+        # Um valor ilegível levanta ValueError antes de a linha ser tocada.
+        centavos = centavos_do_gasto(gasto)
+        self._garantir_mutavel()
+        self._versao += 1
+        self._agregar(i, -1)
+        self._desindexar_texto(self._ids[i], self._descricoes[i], self._categorias[i])
+        self._descricoes[i] = self._pool_descricoes.codigo(gasto.get("descricao") or "")
+        self._categorias[i] = self._pool_categorias.codigo(gasto.get("categoria") or "")
+        self._indexar_texto(self._ids[i], self._descricoes[i], self._categorias[i])
+        self._valores[i] = centavos
+
+        ordinal = self._codificar_data(gasto.get("data"))
+        if ordinal != self._datas[i]:
+            self._desindexar(self._ids[i], self._datas[i])
+            self._datas[i] = ordinal
+            self._indexar(self._ids[i], ordinal)
+        self._agregar(i, 1)
+
+    def __iter__(self):
+        for i in range(len(self._valores)):
+            if i not in self._lapides:
+                yield self._linha(i)
+
+    def linhas_posicionais(self):
+        """[id, descricao, categoria, centavos, data] de cada gasto, na ordem
+        de CAMPOS_SNAPSHOT, sem montar os dicts."""
+        descricoes, categorias = self._pool_descricoes.textos, self._pool_categorias.textos
+        datas = {}
+        for i in range(len(self._valores)):
+            if i in self._lapides:
+                continue
+            ordinal = self._datas[i]
+            data = datas.get(ordinal)
+            if data is None and ordinal not in datas:
+                data = datas[ordinal] = self._decodificar_data(ordinal)
+            yield [self._ids[i], descricoes[self._descricoes[i]], categorias[self._categorias[i]],
+                   self._valores[i], data]
+
+    def _acrescentar(self, gasto, agregar=True):
+        """Acrescenta o gasto e grava nele o id usado.
+
+        Um "id" já presente no gasto (snapshot, journal) é mantido se não
+        estiver em uso; senão o gasto recebe o próximo id livre.
+        """
+        centavos = centavos_do_gasto(gasto)
+        self._garantir_mutavel()
+        self._garantir_ordem_dos_ids()
+        self._versao += 1
+        id_gasto = gasto.get("id")
+        # Todo id em uso é menor que _proximo_id.
+        if type(id_gasto) is not int or id_gasto <= 0 or (id_gasto < self._proximo_id and self.tem_id(id_gasto)):
+            id_gasto = self._proximo_id
+        self._proximo_id = max(self._proximo_id, id_gasto + 1)
+        gasto["id"] = id_gasto
+        if self._slots is not None:
+            self._slots[id_gasto] = len(self._ids)
+        elif len(self._ids) and id_gasto < self._ids[-1]:
+            self._ids_ordenados = False
+
+        self._descricoes.append(self._pool_descricoes.codigo(gasto.get("descricao") or ""))
+        self._categorias.append(self._pool_categorias.codigo(gasto.get("categoria") or ""))
+        self._valores.append(centavos)
+        self._datas.append(self._codificar_data(gasto.get("data")))
+        self._ids.append(id_gasto)
+        if agregar:
+            self._agregar(len(self._ids) - 1, 1)
+
+    def append(self, gasto):
+        self._acrescentar(gasto)
+        self._indexar(self._ids[-1], self._datas[-1])
+        self._indexar_texto(self._ids[-1], self._descricoes[-1], self._categorias[-1])
+
+    def extend(self, gastos, agregar=True):
+        # Em carga em lote é mais barato montar os índices depois, uma vez
+        # só. agregar=False deixa os resumos pendentes (para quem vai adotar
+        # resumos já gravados ou calculá-los só se alguém pedir).
+        if not agregar:
+            self._agregados_prontos = False
+        for gasto in gastos:
+            self._acrescentar(gasto, agregar)
+        self._indices_prontos = False
+
+    def pop(self, i=-1):
+        i = self._indice(i)
+        return self.remover_por_id(self._ids[i])
+
+    def remover_por_id(self, id_gasto):
+        i = self._slot(id_gasto)
+        gasto = self._linha(i)
+        self._garantir_mutavel()
+        self._versao += 1
+        self._agregar(i, -1)
+        self._desindexar(id_gasto, self._datas[i])
+        self._desindexar_texto(id_gasto, self._descricoes[i], self._categorias[i])
+        if self._slots is not None:
+            del self._slots[id_gasto]
+        self._lapides.add(i)
+        if len(self._lapides) * 4 > len(self._ids):
+            self._compactar()
+        return gasto
+
+    def filtrar(self, predicado):
+        return [gasto for gasto in self if predicado(gasto)]
+
+    def filtrar_datas(self, inicio, fim):
+        """Gastos cuja data (ordinal) está em [inicio, fim), na ordem de cadastro."""
+        return list(self.iterar_datas(inicio, fim))
+
+    def iterar_datas(self, inicio, fim):
+        self._garantir_indices()
+        lo = bisect_left(self._indice_ordinais, inicio)
+        hi = bisect_left(self._indice_ordinais, fim, lo)
+        for i in sorted(self._slots_dos_ids(self._indice_ids[lo:hi])):
+            yield self._linha(i)
+
+    def sem_data(self):
+        self._garantir_indices()
+        return self._gastos_dos_ids(self._sem_data)
+
+    def _gastos_dos_ids(self, ids):
+        return [self._linha(i) for i in sorted(self._slots_dos_ids(ids))]
+
+    def _descricoes_com_trecho(self, trecho):
+        if len(trecho) < 3:
+            candidatos = range(len(self._descricoes_n))
+        else:
+            listas = []
+            for i in range(len(trecho) - 2):
+                codigos = self._trigramas.get(trecho[i:i + 3])
+                if not codigos:
+                    return []
+                listas.append(codigos)
+            listas.sort(key=len)
+            candidatos = listas[0]
+            for codigos in listas[1:]:
+                if len(candidatos) * 8 < len(codigos):
+                    # Com poucos candidatos, conferir o trecho em cada um sai
+                    # mais barato que percorrer as listas maiores.
+                    break
+                candidatos = set(candidatos).intersection(codigos)
+        return [codigo for codigo in candidatos if trecho in self._descricoes_n[codigo]]
+
+    def buscar(self, termo_n=None, cat_n=None):
+        """Busca com termo e categoria já normalizados (vazios não filtram)."""
+        self._garantir_indices()
+        ids = None
+        if termo_n:
+            ids = set()
+            for codigo in self._descricoes_com_trecho(termo_n):
+                ids.update(self._linhas_por_descricao.get(codigo, ()))
+        if cat_n:
+            da_categoria = self._linhas_por_categoria_n.get(cat_n, ())
+            ids = da_categoria if ids is None else ids.intersection(da_categoria)
+        if ids is None:
+            return list(self)
+        return self._gastos_dos_ids(ids)
+
+    def quantidade_datas_invalidas(self):
+        self._compactar()
+        return sum(1 for ordinal in self._datas if ordinal < 0)
+
+    def _chaves(self, campo):
+        """Chave de ordenação de cada linha para `campo`, guardada até a
+        próxima alteração. Textos viram a posição do texto normalizado na
+        ordem alfabética, para as chaves serem todas números."""
+        guardada = self._chaves_ordenacao.get(campo)
+        if guardada is not None and guardada[0] == self._versao:
+            return guardada[1]
+
+        if campo == "valor":
+            chaves = self._valores
+        elif campo == "data":
+            # Sem data ou data inválida vai para o fim, como datetime.max.
+            sem_data = date.max.toordinal() + 1
+            chaves = array("i", (ordinal if ordinal > 0 else sem_data for ordinal in self._datas))
+        else:
+            self._normalizar_pools()
+            if campo == "categoria":
+                codigos, normalizados = self._categorias, self._categorias_n
+            else:
+                codigos, normalizados = self._descricoes, self._descricoes_n
+            posicoes = [0] * len(normalizados)
+            posicao, anterior = -1, None
+            for codigo in sorted(range(len(normalizados)), key=normalizados.__getitem__):
+                if normalizados[codigo] != anterior:
+                    posicao, anterior = posicao + 1, normalizados[codigo]
+                posicoes[codigo] = posicao
+            chaves = array("I", (posicoes[codigo] for codigo in codigos))
+
+        self._chaves_ordenacao[campo] = (self._versao, chaves)
+        return chaves
+
+    def ordenar(self, criterios, limite=None):
+        """Gastos ordenados por `criterios`, uma lista de (campo, decrescente).
+
+        Empates mantêm a ordem de cadastro. A permutação calculada fica
+        guardada até a próxima alteração; com `limite`, só os primeiros
+        são escolhidos (heapq), sem ordenar a tabela inteira.
+        """
+        self._compactar()
+        criterios = tuple(criterios)
+        guardada = self._ordens.get(criterios)
+        if guardada is not None and guardada[0] == self._versao:
+            ordem = guardada[1]
+        elif limite is not None and limite < len(self):
+            ordem = self._primeiros(criterios, limite)
+        else:
+            ordem = list(range(len(self)))
+            for campo, decrescente in reversed(criterios):
+                ordem.sort(key=self._chaves(campo).__getitem__, reverse=decrescente)
+            ordem = array("I", ordem)
+            self._guardar_ordem(criterios, ordem)
+        if limite is not None:
+            ordem = ordem[:limite]
+        return [self._linha(i) for i in ordem]
+
+    def _guardar_ordem(self, criterios, ordem):
+        for chave, (versao, _) in list(self._ordens.items()):
+            if versao != self._versao:
+                del self._ordens[chave]
+        self._ordens.pop(criterios, None)
+        self._ordens[criterios] = (self._versao, ordem)
+        while len(self._ordens) > ORDENS_GUARDADAS:
+            del self._ordens[next(iter(self._ordens))]
+
+    def _primeiros(self, criterios, limite):
+        if len(criterios) == 1:
+            campo, decrescente = criterios[0]
+            escolher = heapq.nlargest if decrescente else heapq.nsmallest
+            return escolher(limite, range(len(self)), key=self._chaves(campo).__getitem__)
+        colunas = [(self._chaves(campo), -1 if decrescente else 1) for campo, decrescente in criterios]
+        return heapq.nsmallest(
+            limite, range(len(self)), key=lambda i: tuple(sinal * coluna[i] for coluna, sinal in colunas)
+        )
+
+    def particoes(self, quantidade):
+        """Divide as colunas em até `quantidade` fatias contíguas.
+
+        Cada fatia é (valores, datas, categorias, textos das categorias),
+        só com arrays e listas, para poder ser enviada a outro processo.
+        """
+        self._compactar()
+        textos = list(self._pool_categorias.textos)
+        n = len(self._valores)
+        tamanho = max(1, -(-n // quantidade))
+
+        def fatia(coluna, inicio, fim):
+            if isinstance(coluna, memoryview):
+                copia = array(coluna.format)
+                copia.frombytes(coluna[inicio:fim].cast("B"))
+                return copia
+            return coluna[inicio:fim]
+
+        for inicio in range(0, n, tamanho):
+            fim = inicio + tamanho
+            yield (
+                fatia(self._valores, inicio, fim),
+                fatia(self._datas, inicio, fim),
+                fatia(self._categorias, inicio, fim),
+                textos,
+            )
+
+    def colunas_do_resumo(self):
+        """(valores, datas, categorias, textos das categorias) sem cópia."""
+        self._compactar()
+        return self._valores, self._datas, self._categorias, self._pool_categorias.textos
+
+    def valores(self):
+        self._compactar()
+        return self._valores
+
+    def categoria(self, i):
+        i = self._indice(i)
+        return self._pool_categorias.textos[self._categorias[i]]
+
+
 # =========================
 # Arquivos (JSON) - por usuário
 # =========================
 
-def salvar_gastos(gastos, usuario):
-    caminho = arquivo_dados_do_usuario(usuario)
-    with open(caminho, "w", encoding="utf-8") as arquivo:
-        json.dump(gastos, arquivo, ensure_ascii=False, indent=2)
+# O arquivo gastos_<usuario>.json é um snapshot completo. Cada alteração
+# feita depois dele vira uma linha no journal (gastos_<usuario>.journal),
+# cuja primeira linha guarda o hash do snapshot a que ele se refere. Assim,
+# se o programa cair entre gravar um snapshot novo e reiniciar o journal,
+# o journal antigo é reconhecido como já incorporado e descartado.
+#
+# Várias sessões podem usar os mesmos arquivos. Quem grava segura uma trava
+# exclusiva (fcntl.flock em gastos_<usuario>.lock) e antes confere se o
+# journal em disco ainda é o que a sessão leu (base + tamanho); se outra
+# sessão gravou nesse meio-tempo, levanta ConflitoDeVersao em vez de
+# sobrescrever. Quem só lê não trava: snapshots são trocados inteiros com
+# os.replace, e linhas incompletas no fim do journal são ignoradas.
+
+
+class ConflitoDeVersao(Exception):
+    """Os gastos em disco mudaram depois que esta sessão os carregou."""
+
+
+# Travas que cada thread já segura (caminho -> [arquivo, níveis, trava
+# local]) e, para excluir threads do mesmo processo, um threading.Lock por
+# caminho.
+_TRAVAS = threading.local()
+_TRAVAS_DO_PROCESSO = {}
+_TRAVA_DAS_TRAVAS = threading.Lock()
+
+
+@contextlib.contextmanager
+def travar_arquivo(caminho, esperar=True):
+    """Trava exclusiva em `caminho`; entrega True se conseguiu.
+
+    Com esperar=False não bloqueia: entrega False se outra sessão (ou
+    outra thread) está com a trava. Pode ser aninhada na mesma thread.
+    """
+    presas = _TRAVAS.__dict__.setdefault("presas", {})
+    trava = presas.get(caminho)
+    if trava is None:
+        with _TRAVA_DAS_TRAVAS:
+            local = _TRAVAS_DO_PROCESSO.setdefault(caminho, threading.Lock())
+        if not local.acquire(esperar):
+            yield False
+            return
+        try:
+            arquivo = open(caminho, "a")
+            if fcntl is not None:
+                try:
+                    fcntl.flock(arquivo.fileno(), fcntl.LOCK_EX | (0 if esperar else fcntl.LOCK_NB))
+                except BlockingIOError:
+                    arquivo.close()
+                    arquivo = None
+        except BaseException:
+            local.release()
+            raise
+        if arquivo is None:
+            local.release()
+            yield False
+            return
+        trava = presas[caminho] = [arquivo, 0, local]
+    trava[1] += 1
+    try:
+        yield True
+    finally:
+        trava[1] -= 1
+        if trava[1] == 0:
+            del presas[caminho]
+            trava[0].close()
+            trava[2].release()
+
+
+def escrever_arquivo_atomico(caminho, conteudo):
+    temporario = caminho + ".tmp"
+    with open(temporario, "wb") as arquivo:
+        arquivo.write(conteudo)
+        arquivo.flush()
+        os.fsync(arquivo.fileno())
+    os.replace(temporario, caminho)
+    # A troca de nome só sobrevive a uma queda de energia depois do fsync
+    # do diretório.
+    if hasattr(os, "O_DIRECTORY"):
+        pasta = os.open(os.path.dirname(os.path.abspath(caminho)), os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(pasta)
+        finally:
+            os.close(pasta)
 
 
-def carregar_gastos(usuario):
-    caminho = arquivo_dados_do_usuario(usuario)
+def rotacionar_backups(caminho):
+    """Guarda a versão atual de `caminho` como caminho.1 (empurrando as
+    anteriores até caminho.BACKUPS_MANTIDOS) antes de ela ser trocada."""
+    if BACKUPS_MANTIDOS <= 0 or not os.path.exists(caminho):
+        return
+    for n in range(BACKUPS_MANTIDOS - 1, 0, -1):
+        if os.path.exists(f"{caminho}.{n}"):
+            os.replace(f"{caminho}.{n}", f"{caminho}.{n + 1}")
     try:
-        with open(caminho, "r", encoding="utf-8") as arquivo:
-            dados = json.load(arquivo)
-            return dados if isinstance(dados, list) else []
+        # O arquivo nunca é alterado no lugar, então um hard link basta.
+        os.link(caminho, f"{caminho}.1")
+    except OSError:
+        shutil.copyfile(caminho, f"{caminho}.1")
+
+
+def codificar_json(dados):
+    """JSON compacto em UTF-8, pelo codec mais rápido disponível."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(dados)
+        except TypeError:  # chaves não-texto, inteiros grandes demais...
+            pass
+    elif ujson is not None:
+        return ujson.dumps(dados, ensure_ascii=False, escape_forward_slashes=False).encode("utf-8")
+    return json.dumps(dados, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def decodificar_json(conteudo):
+    """Lê JSON de bytes UTF-8; qualquer erro vira ValueError."""
+    if orjson is not None:
+        return orjson.loads(conteudo)
+    if ujson is not None:
+        return ujson.loads(conteudo)
+    return json.loads(conteudo.decode("utf-8"))
+
+
+# Snapshot compacto: {"esquema": {"versao": 1, "campos": [...]}, "gastos":
+# [[1, "Almoço", "Alimentação", 2050, "2026-01-05"], ...]}, com o valor em
+# centavos. O legado é uma lista de dicts, um por gasto, com "valor" em
+# reais; snapshots compactos antigos têm o campo "valor" no lugar de
+# "centavos". Os dois são convertidos para centavos na carga.
+VERSAO_SNAPSHOT_COMPACTO = 1
+CAMPOS_SNAPSHOT = ("id", "descricao", "categoria", "centavos", "data")
+
+
+def serializar_snapshot_json(gastos, formato=None):
+    if (formato or FORMATO_JSON) == "legado":
+        return json.dumps(list(gastos), ensure_ascii=False, indent=2).encode("utf-8")
+    if isinstance(gastos, GastosTable):
+        linhas = list(gastos.linhas_posicionais())
+    else:
+        linhas = [[g.get("id"), g.get("descricao"), g.get("categoria"), centavos_do_gasto(g), g.get("data")]
+                  for g in gastos]
+    return codificar_json({
+        "esquema": {"versao": VERSAO_SNAPSHOT_COMPACTO, "campos": list(CAMPOS_SNAPSHOT)},
+        "gastos": linhas,
+    })
+
+
+def gastos_do_snapshot(dados):
+    """Lista de dicts de um snapshot lido, no formato legado ou compacto."""
+    if isinstance(dados, list):
+        return [g for g in dados if isinstance(g, dict)]
+    esquema = dados.get("esquema") if isinstance(dados, dict) else None
+    if not isinstance(esquema, dict) or not isinstance(dados.get("gastos"), list):
+        raise ValueError("arquivo JSON não contém uma lista de gastos")
+    if esquema.get("versao") != VERSAO_SNAPSHOT_COMPACTO or not isinstance(esquema.get("campos"), list):
+        raise ValueError(f"versão de snapshot desconhecida: {esquema.get('versao')!r}")
+    campos = esquema["campos"]
+    return [dict(zip(campos, linha)) for linha in dados["gastos"] if isinstance(linha, list)]
+
+
+def separar_valores_invalidos(dados):
+    """(gastos com valor legível, gastos com valor nulo ou que não é número)."""
+    validos, invalidos = [], []
+    for gasto in dados:
+        if type(gasto.get("centavos")) is not int:
+            valor = gasto.get("valor", 0)
+            # Números comuns passam direto; o resto é conferido de verdade.
+            if type(valor) not in (int, float) or not abs(valor) * 100 < MAXIMO_CENTAVOS:
+                try:
+                    centavos_de_valor(valor)
+                except ValueError:
+                    invalidos.append(gasto)
+                    continue
+        validos.append(gasto)
+    return validos, invalidos
+
+
+def hash_snapshot(conteudo):
+    return hashlib.sha256(conteudo).hexdigest() if conteudo else ""
+
+
+def cabecalho_journal(base):
+    return (json.dumps({"base": base}) + "\n").encode("utf-8")
+
+
+def iniciar_journal(usuario, base, backend=None):
+    escrever_arquivo_atomico(arquivo_journal_do_usuario(usuario, backend), cabecalho_journal(base))
+
+
+def base_do_snapshot(usuario, backend=None):
+    """Identificação do snapshot gravado em disco ("" se ainda não existir)."""
+    try:
+        if (backend or BACKEND_ARMAZENAMENTO) == "binario":
+            return ler_token_binario(arquivo_binario_do_usuario(usuario))
+        with open(arquivo_dados_do_usuario(usuario), "rb") as arquivo:
+            return hash_snapshot(arquivo.read())
     except FileNotFoundError:
-        return []
-    except json.JSONDecodeError:
-        print("\n⚠️ O arquivo JSON do usuário está corrompido. Iniciando lista vazia.")
-        return []
+        return ""
+
+
+def versao_em_disco(usuario, backend=None):
+    """(base, tamanho) do journal como está agora: muda a cada alteração
+    gravada e a cada snapshot novo."""
+    try:
+        with open(arquivo_journal_do_usuario(usuario, backend), "rb") as arquivo:
+            cabecalho = arquivo.readline()
+            tamanho = os.fstat(arquivo.fileno()).st_size
+    except FileNotFoundError:
+        return base_do_snapshot(usuario, backend), 0
+    try:
+        return json.loads(cabecalho)["base"], tamanho
+    except (ValueError, KeyError, TypeError):
+        return None, tamanho
+
+
+def conferir_versao(gastos, usuario, backend=None):
+    """Levanta ConflitoDeVersao se outra sessão gravou depois da carga.
+
+    Deve ser chamada com a trava do usuário.
+    """
+    backend = backend or BACKEND_ARMAZENAMENTO
+    versao = getattr(gastos, "versao_arquivo", None)
+    # Tabelas que não vieram do disco (ou de outro backend, numa
+    # conversão) não têm o que conferir.
+    if versao is None or versao[0] != backend:
+        return
+    if versao_em_disco(usuario, backend) != versao[1:]:
+        raise ConflitoDeVersao("os gastos foram alterados em outra sessão; recarregue e repita a operação")
+
+
+def snapshot_em_dia(gastos, backend):
+    """True se o snapshot em disco já tem exatamente estes gastos (journal
+    vazio e nenhuma alteração na tabela desde a carga ou a última gravação)."""
+    versao = gastos.versao_arquivo
+    return (
+        versao is not None and versao[0] == backend
+        and versao[2] == len(cabecalho_journal(versao[1]))
+        and not gastos.alterada()
+    )
+
+
+def salvar_gastos(gastos, usuario, backend=None, formato=None):
+    """Grava um snapshot novo (e zera o journal); devolve False se não havia
+    nada a gravar. Com `formato` ("compacto" ou "legado"), o snapshot JSON é
+    regravado nesse formato mesmo sem alterações."""
+    if isinstance(gastos, GastosSQLite):
+        gastos.conexao.commit()
+        return True
+
+    backend = backend or BACKEND_ARMAZENAMENTO
+    if FILA_GRAVACAO is not None:
+        FILA_GRAVACAO.gravar(usuario)
+    with travar_arquivo(arquivo_trava_do_usuario(usuario)):
+        conferir_versao(gastos, usuario, backend)
+        if formato is None and isinstance(gastos, GastosTable) and snapshot_em_dia(gastos, backend):
+            return False
+        if backend == "binario":
+            token = os.urandom(16)
+            caminho = arquivo_binario_do_usuario(usuario)
+            conteudo = serializar_snapshot_binario(gastos, token)
+            base = token.hex()
+        else:
+            caminho = arquivo_dados_do_usuario(usuario)
+            conteudo = serializar_snapshot_json(gastos, formato)
+            base = hash_snapshot(conteudo)
+        rotacionar_backups(caminho)
+        escrever_arquivo_atomico(caminho, conteudo)
+        iniciar_journal(usuario, base, backend)
+        if isinstance(gastos, GastosTable):
+            gastos.marcar_gravada((backend, base, len(cabecalho_journal(base))))
+
+    if isinstance(gastos, GastosTable):
+        agregados = dict(gastos.agregados(), base=base, quantidade=len(gastos), unidade="centavos")
+        escrever_arquivo_atomico(arquivo_agregados_do_usuario(usuario), codificar_json(agregados))
+    return True
+
+
+def carregar_agregados(usuario, base):
+    """Resumos gravados junto com o snapshot `base`, ou None se não servirem."""
+    try:
+        with open(arquivo_agregados_do_usuario(usuario), "rb") as arquivo:
+            agregados = decodificar_json(arquivo.read())
+    except (FileNotFoundError, ValueError):
+        return None
+    # Resumos de versões antigas somavam reais em float.
+    if not isinstance(agregados, dict) or agregados.get("base") != base or agregados.get("unidade") != "centavos":
+        return None
+    return agregados
+
+
+def linha_do_journal(op, id_gasto=None, gasto=None):
+    registro = {"op": op}
+    if id_gasto is not None:
+        registro["id"] = id_gasto
+    if gasto is not None:
+        registro["gasto"] = gasto
+    return json.dumps(registro, ensure_ascii=False) + "\n"
+
+
+def registrar_alteracao(gastos, usuario, op, id_gasto=None, gasto=None, anterior=None):
+    """Acrescenta uma alteração ao journal em vez de regravar todos os gastos.
+
+    `op` é "add", "edit", "del" ou "clear"; "edit" e "del" apontam o gasto
+    pelo id e levam em `anterior` o gasto como a sessão o via antes da
+    alteração (usado se outra sessão gravar antes). Se outra sessão gravou
+    depois da carga, a tabela é recarregada e a alteração reaplicada como na
+    FilaDeGravacao (um "add" recebe outro id, anotado em `gasto`); só levanta
+    ConflitoDeVersao se ela não puder ser reaplicada. Quando o journal passa
+    de LIMITE_JOURNAL_BYTES, ele é compactado num snapshot novo.
+    """
+    if isinstance(gastos, GastosSQLite):
+        # A alteração já foi gravada na base.
+        return
+    if FILA_GRAVACAO is not None:
+        FILA_GRAVACAO.registrar(gastos, usuario, op, id_gasto, gasto, anterior)
+        return
+    alteracoes = [(linha_do_journal(op, id_gasto, gasto), anterior)]
+    while True:
+        try:
+            gravar_no_journal(gastos, usuario, [linha for linha, _ in alteracoes])
+            return
+        except ConflitoDeVersao:
+            alteracoes = reaplicar_pendentes(gastos, usuario, alteracoes)
+            if not alteracoes:
+                raise
+            if op == "add" and gasto is not None:
+                gasto["id"] = json.loads(alteracoes[0][0])["gasto"]["id"]
+
+
+def gravar_no_journal(gastos, usuario, linhas, compactar=True):
+    """Acrescenta várias linhas ao journal com uma única escrita e um fsync.
+
+    Com compactar=False, um journal grande não vira snapshot agora (quem
+    grava de outra thread não pode percorrer a tabela).
+    """
+    caminho = arquivo_journal_do_usuario(usuario)
+    with travar_arquivo(arquivo_trava_do_usuario(usuario)):
+        conferir_versao(gastos, usuario)
+        if not os.path.exists(caminho):
+            iniciar_journal(usuario, base_do_snapshot(usuario))
+
+        with open(caminho, "a", encoding="utf-8") as arquivo:
+            arquivo.write("".join(linhas))
+            arquivo.flush()
+            os.fsync(arquivo.fileno())
+
+        if isinstance(gastos, GastosTable) and gastos.versao_arquivo is not None:
+            gastos.versao_arquivo = (BACKEND_ARMAZENAMENTO,) + versao_em_disco(usuario)
+        if compactar and os.path.getsize(caminho) > LIMITE_JOURNAL_BYTES:
+            salvar_gastos(gastos, usuario)
+
+
+def journal_grande(usuario):
+    try:
+        return os.path.getsize(arquivo_journal_do_usuario(usuario)) > LIMITE_JOURNAL_BYTES
+    except FileNotFoundError:
+        return False
+
+
+def aplicar_alteracao(gastos, registro):
+    op = registro.get("op")
+    if op == "add":
+        gastos.append(registro["gasto"])
+    # Journals antigos apontam pela posição ("idx").
+    elif op == "edit" and "id" in registro:
+        gastos.editar_por_id(registro["id"], registro["gasto"])
+    elif op == "edit":
+        gastos[registro["idx"]] = registro["gasto"]
+    elif op == "del" and "id" in registro:
+        gastos.remover_por_id(registro["id"])
+    elif op == "del":
+        gastos.pop(registro["idx"])
+    elif op == "clear":
+        gastos.clear()
+
+
+def reaplicar_journal(gastos, usuario, base, backend=None, somente_leitura=False):
+    """Aplica o journal do snapshot `base` e anota em gastos.versao_arquivo
+    até onde o journal foi lido.
+
+    Devolve False se outra sessão trocou o snapshot depois que ele foi
+    lido: a carga precisa ser refeita. Com somente_leitura=True nenhum
+    arquivo é alterado (journal antigo, fim incompleto, rejeitadas).
+    """
+    backend = backend or BACKEND_ARMAZENAMENTO
+    caminho = arquivo_journal_do_usuario(usuario, backend)
+    try:
+        arquivo = open(caminho, "rb")
+    except FileNotFoundError:
+        gastos.marcar_gravada((backend, base, 0))
+        return True
+
+    with arquivo:
+        try:
+            cabecalho = json.loads(arquivo.readline())
+        except ValueError:
+            cabecalho = None
+
+        if not isinstance(cabecalho, dict) or cabecalho.get("base") != base:
+            arquivo.close()
+            if somente_leitura:
+                # Journal de um snapshot anterior, já incorporado.
+                return base_do_snapshot(usuario, backend) == base
+            return descartar_journal_antigo(gastos, usuario, base, backend)
+
+        validos = arquivo.tell()
+        rejeitadas = []
+        for linha in arquivo:
+            # Uma linha sem "\n" final é uma escrita interrompida (ou em
+            # andamento em outra sessão).
+            if not linha.endswith(b"\n"):
+                break
+            # Uma linha completa que não dá para aplicar é pulada; as
+            # seguintes continuam valendo.
+            try:
+                aplicar_alteracao(gastos, json.loads(linha))
+            except (ValueError, KeyError, IndexError, TypeError, AttributeError):
+                rejeitadas.append(linha)
+            validos += len(linha)
+        tamanho = os.fstat(arquivo.fileno()).st_size
+
+    gastos.marcar_gravada((backend, base, validos))
+    if somente_leitura:
+        return True
+    if rejeitadas:
+        destino = guardar_linhas_rejeitadas(caminho, rejeitadas)
+        print(f"\n⚠️ {len(rejeitadas)} alteração(ões) do journal não puderam ser aplicadas e foram"
+              f" ignoradas; cópia em {destino}.")
+    if tamanho > validos:
+        cortar_journal(usuario, base, backend, validos)
+    return True
+
+
+def guardar_linhas_rejeitadas(caminho, linhas):
+    """Acrescenta a <caminho>.rejeitados as linhas que ainda não estão lá."""
+    destino = caminho + ".rejeitados"
+    try:
+        with open(destino, "rb") as arquivo:
+            guardadas = set(arquivo)
+    except FileNotFoundError:
+        guardadas = set()
+    novas = [linha for linha in linhas if linha not in guardadas]
+    if novas:
+        with open(destino, "ab") as arquivo:
+            arquivo.writelines(novas)
+    return destino
+
+
+def descartar_journal_antigo(gastos, usuario, base, backend):
+    with travar_arquivo(arquivo_trava_do_usuario(usuario), esperar=False) as travado:
+        if not travado:
+            # Outra sessão está gravando agora. O snapshot lido vale por si
+            # só; a primeira gravação desta sessão vai acusar o conflito.
+            gastos.marcar_gravada((backend, base, None))
+            return True
+        if base_do_snapshot(usuario, backend) != base:
+            return False
+        # Journal de um snapshot anterior: já está incorporado.
+        iniciar_journal(usuario, base, backend)
+        gastos.marcar_gravada((backend, base, len(cabecalho_journal(base))))
+        return True
+
+
+def cortar_journal(usuario, base, backend, validos):
+    """Remove o fim incompleto do journal, se nenhuma sessão estiver gravando."""
+    with travar_arquivo(arquivo_trava_do_usuario(usuario), esperar=False) as travado:
+        if not travado:
+            return
+        with open(arquivo_journal_do_usuario(usuario, backend), "r+b") as arquivo:
+            if arquivo.readline() != cabecalho_journal(base):
+                return
+            arquivo.seek(validos)
+            resto = arquivo.read()
+            # Uma linha completa foi terminada por outra sessão depois da
+            # leitura: fica para a próxima carga.
+            if b"\n" not in resto:
+                arquivo.truncate(validos)
+
+
+def ler_snapshot_json(caminho):
+    """(conteúdo, gastos) do snapshot; ValueError se estiver corrompido."""
+    with open(caminho, "rb") as arquivo:
+        conteudo = arquivo.read()
+    if not conteudo:
+        return conteudo, []
+    try:
+        dados = decodificar_json(conteudo)
+    except ValueError:
+        raise ValueError("arquivo JSON corrompido") from None
+    return conteudo, gastos_do_snapshot(dados)
+
+
+def restaurar_backup(usuario, backend):
+    """Troca um snapshot corrompido pelo backup legível mais recente.
+
+    O arquivo corrompido não se perde: vira o backup .1.
+    """
+    if backend == "binario":
+        caminho = arquivo_binario_do_usuario(usuario)
+    else:
+        caminho = arquivo_dados_do_usuario(usuario)
+
+    gastos = None
+    for n in range(1, BACKUPS_MANTIDOS + 1):
+        try:
+            if backend == "binario":
+                gastos = abrir_snapshot_binario(f"{caminho}.{n}")[0]
+            else:
+                gastos = GastosTable(ler_snapshot_json(f"{caminho}.{n}")[1])
+        except (OSError, ValueError):
+            continue
+        print(f"\n⚠️ O arquivo de gastos do usuário está corrompido. Recuperado o backup {caminho}.{n};"
+              " as alterações feitas depois dele se perderam.")
+        break
+    else:
+        print("\n⚠️ O arquivo de gastos do usuário está corrompido e não há backup legível. Iniciando lista vazia.")
+        gastos = GastosTable()
+
+    salvar_gastos(gastos, usuario, backend)
+    print(f"   O arquivo corrompido foi guardado em {caminho}.1.")
+    return gastos
+
+
+def carregar_gastos_json(usuario, estrito=False):
+    """Carrega snapshot + journal. Com estrito=True, um arquivo corrompido
+    levanta ValueError em vez de ser trocado pelo backup."""
+    caminho = arquivo_dados_do_usuario(usuario)
+    for _ in range(TENTATIVAS_CARGA):
+        try:
+            conteudo, dados = ler_snapshot_json(caminho)
+        except FileNotFoundError:
+            conteudo, dados = b"", []
+        except ValueError:
+            if estrito:
+                raise
+            return restaurar_backup(usuario, "json")
+
+        dados, invalidos = separar_valores_invalidos(dados)
+        gastos = GastosTable()
+        gastos.extend(dados, agregar=False)
+        base = hash_snapshot(conteudo)
+        agregados = carregar_agregados(usuario, base)
+        if agregados is not None and agregados.get("quantidade") == len(gastos):
+            gastos.adotar_agregados(agregados)
+        if reaplicar_journal(gastos, usuario, base, "json"):
+            break
+
+    if invalidos:
+        print(f"\n⚠️ {len(invalidos)} gasto(s) com valor inválido no arquivo foram ignorados"
+              " (somem do arquivo na próxima gravação):")
+        for gasto in invalidos[:5]:
+            print(f"   {json.dumps(gasto, ensure_ascii=False)}")
+    invalidas = gastos.quantidade_datas_invalidas()
+    if invalidas:
+        print(f"\n⚠️ {invalidas} gasto(s) com data inválida serão tratados como 'sem data' nos filtros.")
+    return gastos
+
+
+def carregar_gastos(usuario, estrito=False):
+    if BACKEND_ARMAZENAMENTO == "sqlite":
+        return carregar_gastos_sqlite(usuario)
+    if BACKEND_ARMAZENAMENTO == "binario":
+        return carregar_gastos_binario(usuario, estrito)
+    return carregar_gastos_json(usuario, estrito)
+
+
+def ler_gastos_sem_alterar(usuario, backend=None):
+    """Gastos do usuário como estão em disco, sem gravar nada.
+
+    Ao contrário de carregar_gastos, não converte JSON em binário ou SQLite,
+    não migra a base, não troca um arquivo corrompido pelo backup nem mexe
+    no journal. Levanta ValueError se o arquivo estiver ruim.
+    """
+    backend = backend or BACKEND_ARMAZENAMENTO
+    if backend == "sqlite" and os.path.exists(arquivo_sqlite_do_usuario(usuario)):
+        return ler_sqlite_sem_alterar(usuario)
+    if backend != "binario" or not os.path.exists(arquivo_binario_do_usuario(usuario)):
+        backend = "json"
+
+    for _ in range(TENTATIVAS_CARGA):
+        if backend == "binario":
+            gastos, base, _ = abrir_snapshot_binario(arquivo_binario_do_usuario(usuario))
+        else:
+            try:
+                conteudo, dados = ler_snapshot_json(arquivo_dados_do_usuario(usuario))
+            except FileNotFoundError:
+                conteudo, dados = b"", []
+            gastos = GastosTable()
+            gastos.extend(separar_valores_invalidos(dados)[0], agregar=False)
+            base = hash_snapshot(conteudo)
+        agregados = carregar_agregados(usuario, base)
+        if agregados is not None and agregados.get("quantidade") == len(gastos):
+            gastos.adotar_agregados(agregados)
+        if reaplicar_journal(gastos, usuario, base, backend, somente_leitura=True):
+            break
+    return gastos
+
+
+def recarregar_gastos(gastos, usuario):
+    if isinstance(gastos, GastosSQLite):
+        # Cada consulta já lê a base.
+        return
+    novos = carregar_gastos(usuario)
+    gastos.clear()
+    gastos.extend(novos)
+    gastos.marcar_gravada(novos.versao_arquivo)
+
+
+def adicionar_em_lote(gastos, usuario, novos):
+    """Acrescenta vários gastos com uma única gravação no armazenamento."""
+    gastos.extend(novos)
+    salvar_gastos(gastos, usuario)
+
+
+# =========================
+# Política de gravação
+# =========================
+
+# Com uma política diferente de "imediata" (GASTOS_GRAVACAO), as linhas do
+# journal ficam numa FilaDeGravacao e vão para o disco em lote, numa única
+# escrita com um fsync. Se outra sessão gravou antes, a tabela é recarregada
+# do disco e as alterações pendentes são reaplicadas sobre ela campo a
+# campo: uma edição só leva os campos que esta sessão mudou, e é recusada
+# se a outra sessão mudou algum desses campos; uma remoção é recusada se o
+# gasto mudou; um "clear" é sempre recusado.
+
+FILA_GRAVACAO = None
+
+
+def interpretar_politica_gravacao(texto):
+    """("imediata", None), ("lote", N), ("intervalo", segundos) ou ("saida", None)."""
+    modo, _, parametro = texto.strip().lower().partition(":")
+    try:
+        if modo in ("imediata", "saida") and not parametro:
+            return modo, None
+        if modo == "lote" and int(parametro) >= 1:
+            return modo, int(parametro)
+        if modo == "intervalo" and float(parametro) > 0:
+            return modo, float(parametro)
+    except ValueError:
+        pass
+    raise ValueError(f"política de gravação inválida: {texto!r} (use imediata, lote:N, intervalo:T ou saida)")
+
+
+CAMPOS_GASTO = ("descricao", "categoria", "valor", "data")
+
+
+def campo_do_gasto(gasto, campo):
+    if campo == "valor":
+        return centavos_do_gasto(gasto)
+    return gasto.get(campo) or None
+
+
+def reaplicar_pendentes(gastos, usuario, alteracoes):
+    """Recarrega `gastos` do disco (no mesmo objeto), reaplica nele as
+    alterações que ainda fizerem sentido e as devolve, prontas para gravar.
+
+    `alteracoes` são pares (linha do journal, gasto anterior). Um "add"
+    pode receber outro id.
+    """
+    with contextlib.redirect_stdout(sys.stderr):
+        recarregar_gastos(gastos, usuario)
+    aplicadas = []
+    for linha, anterior in alteracoes:
+        registro = json.loads(linha)
+        op = registro.get("op")
+        try:
+            if op == "clear" or (op in ("edit", "del") and ("id" not in registro or anterior is None)):
+                motivo = "os gastos foram alterados em outra sessão"
+            elif op == "edit":
+                atual = gastos.gasto_por_id(registro["id"])
+                novo = registro["gasto"]
+                mudados = [c for c in CAMPOS_GASTO if campo_do_gasto(novo, c) != campo_do_gasto(anterior, c)]
+                if any(campo_do_gasto(atual, c) not in (campo_do_gasto(anterior, c), campo_do_gasto(novo, c))
+                       for c in mudados):
+                    motivo = "o gasto foi alterado nos mesmos campos em outra sessão"
+                else:
+                    anterior = dict(atual)
+                    atual.update((c, novo.get(c)) for c in mudados)
+                    registro["gasto"] = atual
+                    motivo = None
+            elif op == "del":
+                atual = gastos.gasto_por_id(registro["id"])
+                mudou = any(campo_do_gasto(atual, c) != campo_do_gasto(anterior, c) for c in CAMPOS_GASTO)
+                motivo = "o gasto foi alterado em outra sessão" if mudou else None
+                anterior = atual
+            else:
+                motivo = None
+            if motivo is None:
+                aplicar_alteracao(gastos, registro)
+        except (KeyError, IndexError):
+            motivo = "o gasto foi removido em outra sessão"
+        if motivo is not None:
+            print(f"⚠️ Alteração recusada ({motivo}): {linha.strip()}", file=sys.stderr)
+            continue
+        aplicadas.append((json.dumps(registro, ensure_ascii=False) + "\n", anterior))
+    return aplicadas
+
+
+class FilaDeGravacao:
+    """Alterações ainda não gravadas no journal, por usuário."""
+
+    def __init__(self, politica="imediata"):
+        self.modo, self.parametro = interpretar_politica_gravacao(politica)
+        self.trava = threading.RLock()
+        # usuario -> (gastos, [(linha do journal, gasto anterior), ...])
+        self.pendentes = {}
+        # Usuários cuja gravação em segundo plano esbarrou em outra sessão;
+        # a reaplicação fica para a thread principal.
+        self.conflitos = set()
+        self.thread = None
+        # Enquanto a thread principal grava, SIGTERM/SIGHUP só são atendidos
+        # no fim da gravação (ver encerrar_por_sinal).
+        self.gravando = 0
+        self.sinal_adiado = None
+
+    def tem_pendentes(self, usuario):
+        return usuario in self.pendentes
+
+    def registrar(self, gastos, usuario, op, id_gasto=None, gasto=None, anterior=None):
+        if isinstance(gastos, GastosSQLite):
+            return
+        with self.trava:
+            pendente = self.pendentes.get(usuario)
+            if pendente is not None and pendente[0] is not gastos:
+                self.gravar(usuario)
+            linhas = self.pendentes.setdefault(usuario, (gastos, []))[1]
+            linhas.append((linha_do_journal(op, id_gasto, gasto), anterior))
+            if (self.modo == "imediata" or usuario in self.conflitos
+                    or (self.modo == "lote" and len(linhas) >= self.parametro)):
+                self.gravar(usuario)
+            elif self.modo == "intervalo":
+                if journal_grande(usuario):
+                    self.gravar(usuario)
+                if self.thread is None:
+                    self.thread = threading.Thread(target=self.gravar_periodicamente, daemon=True)
+                    self.thread.start()
+
+    def gravar(self, usuario=None, em_segundo_plano=False):
+        """Grava as alterações pendentes de `usuario` (ou de todos).
+
+        As linhas só saem da fila depois de gravadas e sincronizadas.
+        """
+        principal = threading.current_thread() is threading.main_thread()
+        with self.trava:
+            self.gravando += principal
+            try:
+                for u in [usuario] if usuario is not None else list(self.pendentes):
+                    self.gravar_usuario(u, em_segundo_plano)
+            finally:
+                self.gravando -= principal
+                if not self.gravando and self.sinal_adiado is not None:
+                    sinal, self.sinal_adiado = self.sinal_adiado, None
+                    raise SystemExit(128 + sinal)
+
+    def gravar_usuario(self, usuario, em_segundo_plano):
+        gastos, linhas = self.pendentes.get(usuario, (None, None))
+        while linhas:
+            try:
+                gravar_no_journal(gastos, usuario, [linha for linha, _ in linhas], compactar=False)
+                break
+            except ConflitoDeVersao:
+                if em_segundo_plano:
+                    self.conflitos.add(usuario)
+                    return
+                linhas = reaplicar_pendentes(gastos, usuario, linhas)
+                self.pendentes[usuario] = (gastos, linhas)
+        self.pendentes.pop(usuario, None)
+        self.conflitos.discard(usuario)
+        if linhas and not em_segundo_plano and journal_grande(usuario):
+            salvar_gastos(gastos, usuario)
+
+    def gravar_periodicamente(self):
+        while True:
+            time.sleep(self.parametro)
+            try:
+                self.gravar(em_segundo_plano=True)
+            except OSError as e:
+                print(f"\n⚠️ Falha ao gravar alterações: {e}", file=sys.stderr)
+
+
+def gravar_pendentes():
+    """Grava o que a política de gravação ainda estiver segurando."""
+    if FILA_GRAVACAO is not None:
+        FILA_GRAVACAO.gravar()
+
+
+def encerrar_por_sinal(numero, quadro):
+    # SystemExit desfaz a pilha normalmente e deixa o atexit gravar; no
+    # meio de uma gravação, espera ela terminar (FilaDeGravacao.gravar).
+    if FILA_GRAVACAO is not None and FILA_GRAVACAO.gravando:
+        FILA_GRAVACAO.sinal_adiado = numero
+        return
+    raise SystemExit(128 + numero)
+
+
+def configurar_gravacao(politica):
+    """Ativa a política de gravação para esta sessão e garante que as
+    pendentes sejam gravadas ao encerrar."""
+    global FILA_GRAVACAO
+    FILA_GRAVACAO = FilaDeGravacao(politica)
+    atexit.register(gravar_pendentes)
+    for nome in ("SIGTERM", "SIGHUP"):
+        if hasattr(signal, nome):
+            signal.signal(getattr(signal, nome), encerrar_por_sinal)
+
+
+# =========================
+# Snapshot binário (mmap)
+# =========================
+
+# Com GASTOS_BACKEND=binario o snapshot é gastos_<usuario>.bin: um cabeçalho
+# fixo seguido de seções alinhadas em 8 bytes — as cinco colunas da
+# GastosTable e, para cada pool de textos, uma tabela de offsets (uint64) e
+# um heap UTF-8. O arquivo é aberto com mmap e as colunas viram memoryviews
+# sobre ele, então abrir o snapshot não depende do tamanho do histórico:
+# só os gastos listados ou alterados são decodificados. O token aleatório
+# do cabeçalho identifica o snapshot para o journal e para os resumos.
+
+MAGICO_BINARIO = b"GASTOSB1"
+# Versão 1 guardava os valores em reais (double); a 2, em centavos.
+VERSAO_BINARIO = 2
+ORDEM_BYTES = 1 if sys.byteorder == "little" else 2
+
+SECOES_BINARIO = (
+    ("valores", "q"),
+    ("datas", "i"),
+    ("categorias", "I"),
+    ("descricoes", "I"),
+    ("ids", "q"),
+    ("offsets_categorias", "Q"),
+    ("heap_categorias", "B"),
+    ("offsets_descricoes", "Q"),
+    ("heap_descricoes", "B"),
+    ("offsets_datas_invalidas", "Q"),
+    ("heap_datas_invalidas", "B"),
+)
+
+# mágico, versão, ordem dos bytes, quantidade de gastos, quantidade de datas
+# inválidas, token e (offset, tamanho em bytes) de cada seção.
+CABECALHO_BINARIO = struct.Struct("<8sIIQQ16s" + "QQ" * len(SECOES_BINARIO))
+
+
+def heap_de_textos(textos):
+    partes = [texto.encode("utf-8") for texto in textos]
+    offsets = array("Q", [0])
+    for parte in partes:
+        offsets.append(offsets[-1] + len(parte))
+    return offsets, b"".join(partes)
+
+
+def serializar_snapshot_binario(gastos, token):
+    colunas = gastos.colunas_compactadas()
+    dados = {nome: colunas[nome] for nome in ("valores", "datas", "categorias", "descricoes", "ids")}
+    for pool in ("categorias", "descricoes", "datas_invalidas"):
+        dados[f"offsets_{pool}"], dados[f"heap_{pool}"] = heap_de_textos(colunas[f"textos_{pool}"])
+
+    partes, secoes = [], []
+    posicao = CABECALHO_BINARIO.size
+    for nome, _ in SECOES_BINARIO:
+        bruto = bytes(dados[nome])
+        preenchimento = -posicao % 8
+        partes.append(b"\0" * preenchimento)
+        posicao += preenchimento
+        secoes.extend((posicao, len(bruto)))
+        partes.append(bruto)
+        posicao += len(bruto)
+
+    cabecalho = CABECALHO_BINARIO.pack(
+        MAGICO_BINARIO, VERSAO_BINARIO, ORDEM_BYTES, len(gastos),
+        gastos.quantidade_datas_invalidas(), token, *secoes,
+    )
+    return cabecalho + b"".join(partes)
+
+
+def ler_token_binario(caminho):
+    with open(caminho, "rb") as arquivo:
+        cabecalho = arquivo.read(CABECALHO_BINARIO.size)
+    if len(cabecalho) < CABECALHO_BINARIO.size:
+        return ""
+    return CABECALHO_BINARIO.unpack(cabecalho)[5].hex()
+
+
+def abrir_snapshot_binario(caminho):
+    """(tabela sobre o arquivo mapeado, token, quantidade de datas inválidas).
+
+    Levanta ValueError se o arquivo não for um snapshot válido.
+    """
+    with open(caminho, "rb") as arquivo:
+        mapa = mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if len(mapa) < CABECALHO_BINARIO.size:
+        raise ValueError("snapshot binário truncado")
+    campos = CABECALHO_BINARIO.unpack_from(mapa, 0)
+    magico, versao, ordem, quantidade, invalidas, token = campos[:6]
+    if magico != MAGICO_BINARIO or versao not in (1, VERSAO_BINARIO):
+        raise ValueError("arquivo não é um snapshot binário de gastos")
+    if ordem != ORDEM_BYTES:
+        raise ValueError("snapshot gravado com outra ordem de bytes")
+
+    visao = memoryview(mapa)
+    secoes = {}
+    for i, (nome, formato) in enumerate(SECOES_BINARIO):
+        offset, tamanho = campos[6 + 2 * i], campos[7 + 2 * i]
+        if offset + tamanho > len(mapa):
+            raise ValueError("snapshot binário truncado")
+        secoes[nome] = visao[offset:offset + tamanho].cast(formato)
+    if versao == 1:
+        # Reais em double: convertidos para centavos agora e gravados na
+        # versão 2 no próximo snapshot.
+        reais_v1 = visao[campos[6]:campos[6] + campos[7]].cast("d")
+        secoes["valores"] = memoryview(array("q", (centavos_de_valor(v) for v in reais_v1)))
+
+    tabela = GastosTable.de_colunas(
+        secoes["valores"], secoes["datas"], secoes["categorias"], secoes["descricoes"], secoes["ids"],
+        TextosMapeados(secoes["offsets_categorias"], secoes["heap_categorias"]),
+        TextosMapeados(secoes["offsets_descricoes"], secoes["heap_descricoes"]),
+        TextosMapeados(secoes["offsets_datas_invalidas"], secoes["heap_datas_invalidas"]),
+    )
+    if len(tabela) != quantidade:
+        raise ValueError("snapshot binário inconsistente")
+    return tabela, token.hex(), invalidas
+
+
+def converter_json_para_binario(usuario, estrito=False):
+    gastos = carregar_gastos_json(usuario, estrito)
+    salvar_gastos(gastos, usuario, backend="binario")
+    return len(gastos)
+
+
+def converter_binario_para_json(usuario, formato=None):
+    gastos = carregar_gastos_binario(usuario)
+    salvar_gastos(gastos, usuario, backend="json", formato=formato)
+    return len(gastos)
+
+
+def converter_formato_json(usuario, formato):
+    """Regrava no lugar gastos_<usuario>.json (com o journal incorporado) e
+    usuarios.json no formato pedido, seja qual for o formato atual."""
+    with travar_arquivo(arquivo_trava_do_usuario(usuario)):
+        gastos = carregar_gastos_json(usuario, estrito=True)
+        salvar_gastos(gastos, usuario, backend="json", formato=formato)
+    with travar_arquivo(ARQUIVO_USUARIOS + ".lock"):
+        try:
+            usuarios = ler_usuarios(ARQUIVO_USUARIOS)
+        except FileNotFoundError:
+            pass
+        else:
+            salvar_usuarios(usuarios, formato)
+    return len(gastos)
+
+
+def carregar_gastos_binario(usuario, estrito=False):
+    caminho = arquivo_binario_do_usuario(usuario)
+    if not os.path.exists(caminho) and (
+        os.path.exists(arquivo_dados_do_usuario(usuario))
+        or os.path.exists(arquivo_journal_do_usuario(usuario, "json"))
+    ):
+        convertidos = converter_json_para_binario(usuario, estrito)
+        print(f"\n✅ {convertidos} gasto(s) convertidos do JSON para o snapshot binário.")
+
+    for _ in range(TENTATIVAS_CARGA):
+        try:
+            gastos, base, invalidas = abrir_snapshot_binario(caminho)
+        except FileNotFoundError:
+            gastos, base, invalidas = GastosTable(), "", 0
+        except ValueError:
+            if estrito:
+                raise
+            return restaurar_backup(usuario, "binario")
+
+        agregados = carregar_agregados(usuario, base)
+        if agregados is not None and agregados.get("quantidade") == len(gastos):
+            gastos.adotar_agregados(agregados)
+        if reaplicar_journal(gastos, usuario, base, "binario"):
+            break
+
+    if invalidas:
+        print(f"\n⚠️ {invalidas} gasto(s) com data inválida serão tratados como 'sem data' nos filtros.")
+    return gastos
+
+
+# =========================
+# Armazenamento SQLite (opcional)
+# =========================
+
+# Com GASTOS_BACKEND=sqlite os gastos ficam em gastos_<usuario>.db e não são
+# carregados: listagem, filtros, busca, ordenação e resumos viram consultas
+# SQL nos índices abaixo, e só o que é mostrado passa pela memória.
+
+TABELA_SQLITE = """
+CREATE TABLE IF NOT EXISTS gastos (
+    id INTEGER PRIMARY KEY,
+    descricao TEXT NOT NULL DEFAULT '',
+    categoria TEXT NOT NULL DEFAULT '',
+    centavos INTEGER NOT NULL DEFAULT 0,
+    data TEXT,
+    dia TEXT,
+    descricao_n TEXT NOT NULL DEFAULT '',
+    categoria_n TEXT NOT NULL DEFAULT ''
+)
+"""
+
+INDICES_SQLITE = """
+CREATE INDEX IF NOT EXISTS idx_gastos_dia ON gastos(dia);
+CREATE INDEX IF NOT EXISTS idx_gastos_categoria_n ON gastos(categoria_n);
+CREATE INDEX IF NOT EXISTS idx_gastos_centavos ON gastos(centavos);
+"""
+
+COLUNAS_GASTO_SQLITE = "id, descricao, categoria, centavos, data"
+
+SQL_INSERIR_GASTO = (
+    "INSERT INTO gastos (id, descricao, categoria, centavos, data, dia, descricao_n, categoria_n) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+
+def linha_sqlite_do_gasto(gasto):
+    data = gasto.get("data")
+    ordinal = data_para_ordinal(data)
+    dia = date.fromordinal(ordinal).isoformat() if ordinal else None
+    return (
+        gasto.get("descricao") or "",
+        gasto.get("categoria") or "",
+        centavos_do_gasto(gasto),
+        data or None,
+        dia,
+        normalizar_texto(gasto.get("descricao", "")),
+        normalizar_texto(gasto.get("categoria", "")),
+    )
+
+
+def gasto_da_linha_sqlite(linha):
+    id_gasto, descricao, categoria, centavos, data = linha
+    return {"id": id_gasto, "descricao": descricao, "categoria": categoria, "valor": reais(centavos), "data": data}
+
+
+# PRAGMA user_version da base: sobe quando normalizar_texto muda e as
+# colunas descricao_n/categoria_n precisam ser recalculadas.
+VERSAO_NORMALIZACAO_SQLITE = 1
+
+# Bases anteriores a esta versão guardam o valor em reais numa coluna
+# `valor REAL`; a partir dela é `centavos INTEGER`, e as somas em SQL são
+# exatas.
+VERSAO_CENTAVOS_SQLITE = 3
+
+
+def migrar_valor_para_centavos(conexao):
+    """Recria a tabela de uma base antiga trocando `valor` (reais) por
+    `centavos`, numa única transação."""
+    linhas = conexao.execute(
+        "SELECT id, descricao, categoria, valor, data, dia, descricao_n, categoria_n FROM gastos"
+    ).fetchall()
+    conexao.execute("BEGIN")
+    with conexao:
+        conexao.execute("DROP TABLE gastos")
+        conexao.execute(TABELA_SQLITE)
+        conexao.executemany(
+            "INSERT INTO gastos (id, descricao, categoria, centavos, data, dia, descricao_n, categoria_n) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            ((i, d, c, centavos_de_valor(float(v or 0)), data, dia, dn, cn)
+             for i, d, c, v, data, dia, dn, cn in linhas),
+        )
+        conexao.execute(f"PRAGMA user_version = {VERSAO_CENTAVOS_SQLITE}")
+
+
+def abrir_sqlite(usuario):
+    # O servidor usa a conexão de threads diferentes, uma de cada vez (trava
+    # do usuário).
+    conexao = sqlite3.connect(arquivo_sqlite_do_usuario(usuario), check_same_thread=False)
+    conexao.execute("PRAGMA journal_mode=WAL")
+    conexao.execute(TABELA_SQLITE)
+    versao = conexao.execute("PRAGMA user_version").fetchone()[0]
+    if versao < VERSAO_NORMALIZACAO_SQLITE:
+        linhas = conexao.execute("SELECT id, descricao, categoria FROM gastos").fetchall()
+        with conexao:
+            conexao.executemany(
+                "UPDATE gastos SET descricao_n = ?, categoria_n = ? WHERE id = ?",
+                ((normalizar_texto(d), normalizar_texto(c), i) for i, d, c in linhas),
+            )
+            conexao.execute(f"PRAGMA user_version = {VERSAO_NORMALIZACAO_SQLITE}")
+    if versao < VERSAO_CENTAVOS_SQLITE:
+        if any(coluna[1] == "valor" for coluna in conexao.execute("PRAGMA table_info(gastos)")):
+            migrar_valor_para_centavos(conexao)
+        else:
+            conexao.execute(f"PRAGMA user_version = {VERSAO_CENTAVOS_SQLITE}")
+    conexao.executescript(INDICES_SQLITE)
+    return conexao
+
+
+class GastosSQLite:
+    """Gastos guardados numa base SQLite, lidos sob demanda.
+
+    Nada fica em memória: contagem, páginas, filtros e resumos são
+    consultas, e cada alteração é gravada na base na hora. A posição de um
+    gasto é a ordem do id, e o id é o da coluna `id` no SQL.
+    """
+
+    # Uma base SQLite nunca fica desatualizada em relação ao disco.
+    versao_arquivo = None
+
+    def __init__(self, conexao):
+        self.conexao = conexao
+
+    def __len__(self):
+        return self.conexao.execute("SELECT COUNT(*) FROM gastos").fetchone()[0]
+
+    def __iter__(self):
+        return self.iterar_consulta()
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            inicio, fim, passo = i.indices(len(self))
+            if passo != 1:
+                raise ValueError("fatias de GastosSQLite não aceitam passo")
+            return self.consultar(limite=max(0, fim - inicio), deslocamento=inicio)
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError("índice de gasto fora do intervalo")
+        return self.consultar(limite=1, deslocamento=i)[0]
+
+    def tem_id(self, id_gasto):
+        return self.conexao.execute("SELECT 1 FROM gastos WHERE id = ?", (id_gasto,)).fetchone() is not None
+
+    def gasto_por_id(self, id_gasto):
+        linha = self.conexao.execute(
+            f"SELECT {COLUNAS_GASTO_SQLITE} FROM gastos WHERE id = ?", (id_gasto,)
+        ).fetchone()
+        if linha is None:
+            raise KeyError(f"gasto #{id_gasto} não encontrado")
+        return gasto_da_linha_sqlite(linha)
+
+    def _inserir(self, gasto):
+        # Um valor ilegível levanta ValueError antes de a base ser tocada.
+        linha = linha_sqlite_do_gasto(gasto)
+        id_gasto = gasto.get("id")
+        if type(id_gasto) is not int or id_gasto <= 0 or self.tem_id(id_gasto):
+            id_gasto = None
+        gasto["id"] = self.conexao.execute(SQL_INSERIR_GASTO, (id_gasto,) + linha).lastrowid
+
+    def append(self, gasto):
+        with self.conexao:
+            self._inserir(gasto)
+
+    def extend(self, gastos, agregar=True):
+        with self.conexao:
+            for gasto in gastos:
+                self._inserir(gasto)
+
+    def editar_por_id(self, id_gasto, gasto):
+        with self.conexao:
+            alteradas = self.conexao.execute(
+                "UPDATE gastos SET descricao = ?, categoria = ?, centavos = ?, data = ?, dia = ?, "
+                "descricao_n = ?, categoria_n = ? WHERE id = ?",
+                linha_sqlite_do_gasto(gasto) + (id_gasto,),
+            ).rowcount
+        if not alteradas:
+            raise KeyError(f"gasto #{id_gasto} não encontrado")
+
+    def remover_por_id(self, id_gasto):
+        gasto = self.gasto_por_id(id_gasto)
+        with self.conexao:
+            self.conexao.execute("DELETE FROM gastos WHERE id = ?", (id_gasto,))
+        return gasto
+
+    def pop(self, i=-1):
+        return self.remover_por_id(self[i]["id"])
+
+    def clear(self):
+        with self.conexao:
+            self.conexao.execute("DELETE FROM gastos")
+
+    def consultar(self, where="", parametros=(), ordem="id", limite=None, deslocamento=0):
+        return list(self.iterar_consulta(where, parametros, ordem, limite, deslocamento))
+
+    def iterar_consulta(self, where="", parametros=(), ordem="id", limite=None, deslocamento=0):
+        sql = f"SELECT {COLUNAS_GASTO_SQLITE} FROM gastos"
+        if where:
+            sql += f" WHERE {where}"
+        sql += f" ORDER BY {ordem}"
+        if limite is not None or deslocamento:
+            sql += " LIMIT ? OFFSET ?"
+            parametros = tuple(parametros) + (-1 if limite is None else limite, deslocamento)
+        for linha in self.conexao.execute(sql, parametros):
+            yield gasto_da_linha_sqlite(linha)
+
+    def posicao_com_texto(self, inicio, termo_n):
+        """Posição do primeiro gasto a partir de `inicio` cuja descrição ou
+        categoria contém o termo (já normalizado), ou None."""
+        linhas = self.conexao.execute(
+            "SELECT descricao_n, categoria_n FROM gastos ORDER BY id LIMIT -1 OFFSET ?", (inicio,)
+        )
+        for i, (descricao_n, categoria_n) in enumerate(linhas, inicio):
+            if termo_n in descricao_n or termo_n in categoria_n:
+                return i
+        return None
+
+    def agregados(self):
+        total, categorias, meses = 0, {}, {}
+        for mes, categoria, qtd, soma in self.conexao.execute(
+            "SELECT substr(dia, 1, 7), categoria, COUNT(*), SUM(centavos) FROM gastos "
+            "GROUP BY 1, 2 ORDER BY MIN(id)"
+        ):
+            total += soma
+            somar_no_balde(categorias, categoria, qtd, soma)
+            if mes is not None:
+                balde = meses.setdefault(mes, [0, 0, {}])
+                balde[0] += qtd
+                balde[1] += soma
+                somar_no_balde(balde[2], categoria, qtd, soma)
+        return {"total": total, "categorias": categorias, "meses": meses}
+
+    def resumo_mes(self, yyyy_mm):
+        if len(yyyy_mm) != 7:
+            return 0, 0, {}
+        por_categoria = {categoria: (qtd, soma) for categoria, qtd, soma in self.conexao.execute(
+            "SELECT categoria, COUNT(*), SUM(centavos) FROM gastos WHERE dia >= ? AND dia < ? "
+            "GROUP BY categoria ORDER BY MIN(id)",
+            (f"{yyyy_mm}-01", f"{yyyy_mm}-32"),
+        )}
+        return (sum(qtd for qtd, _ in por_categoria.values()), sum(soma for _, soma in por_categoria.values()),
+                {categoria: soma for categoria, (_, soma) in por_categoria.items()})
+
+    def por_semana(self):
+        """Baldes por semana ISO, como GastosTable.por_semana."""
+        semanas = {}
+        for dia, categoria, qtd, soma in self.conexao.execute(
+            "SELECT dia, categoria, COUNT(*), SUM(centavos) FROM gastos WHERE dia IS NOT NULL "
+            "GROUP BY dia, categoria ORDER BY dia"
+        ):
+            ano, semana, _ = date.fromisoformat(dia).isocalendar()
+            balde = semanas.setdefault(f"{ano:04d}-W{semana:02d}", [0, 0, {}])
+            balde[0] += qtd
+            balde[1] += soma
+            somar_no_balde(balde[2], categoria, qtd, soma)
+        return semanas
+
+
+def migrar_json_para_sqlite(usuario):
+    """Copia gastos_<usuario>.json (+ journal) para gastos_<usuario>.db.
+
+    O arquivo JSON é mantido intacto; só roda se a base ainda não existir.
+    """
+    if os.path.exists(arquivo_sqlite_do_usuario(usuario)):
+        return 0
+
+    gastos = carregar_gastos_json(usuario)
+    conexao = abrir_sqlite(usuario)
+    try:
+        with conexao:
+            conexao.executemany(SQL_INSERIR_GASTO, ((g["id"],) + linha_sqlite_do_gasto(g) for g in gastos))
+    finally:
+        conexao.close()
+    return len(gastos)
+
+
+def carregar_gastos_sqlite(usuario):
+    if os.path.exists(arquivo_dados_do_usuario(usuario)) or os.path.exists(arquivo_journal_do_usuario(usuario)):
+        migrados = migrar_json_para_sqlite(usuario)
+        if migrados:
+            print(f"\n✅ {migrados} gasto(s) migrados do JSON para SQLite.")
+    return GastosSQLite(abrir_sqlite(usuario))
+
+
+def ler_sqlite_sem_alterar(usuario):
+    caminho = os.path.abspath(arquivo_sqlite_do_usuario(usuario))
+    conexao = sqlite3.connect(f"file:{caminho}?mode=ro", uri=True)
+    try:
+        colunas = {coluna[1] for coluna in conexao.execute("PRAGMA table_info(gastos)")}
+        if not colunas:
+            return GastosTable()
+        if "centavos" in colunas:
+            linhas = conexao.execute(f"SELECT {COLUNAS_GASTO_SQLITE} FROM gastos ORDER BY id")
+            return GastosTable(gasto_da_linha_sqlite(linha) for linha in linhas)
+        # Base ainda não migrada: reais na coluna `valor`.
+        linhas = conexao.execute("SELECT id, descricao, categoria, valor, data FROM gastos ORDER BY id")
+        return GastosTable(
+            {"id": i, "descricao": d, "categoria": c, "valor": float(v or 0), "data": data}
+            for i, d, c, v, data in linhas
+        )
+    finally:
+        conexao.close()
 
 
 # =========================
@@ -187,18 +2512,13 @@ def pausar():
 
 def perguntar_voltar_ou_encerrar(gastos, usuario):
     while True:
-        resp = input("\nVoltar ao menu? (Sim/Não): ").strip().lower()
-
-        resp = (
-            resp.replace("ã", "a").replace("á", "a").replace("â", "a").replace("à", "a")
-                .replace("õ", "o").replace("ó", "o").replace("ô", "o").replace("ò", "o")
-        )
+        resp = normalizar_texto(input("\nVoltar ao menu? (Sim/Não): "))
 
         if resp in ("s", "sim", "y", "yes"):
             return True
 
         if resp in ("n", "nao", "no"):
-            salvar_gastos(gastos, usuario)
+            gravar_pendentes()
             print("\nEncerrando...")
             return False
 
@@ -210,23 +2530,54 @@ def perguntar_voltar_ou_encerrar(gastos, usuario):
 # =====================
 
 def pedir_float_positivo(msg):
+    """Valor em reais, arredondado para centavos."""
     while True:
         try:
-            valor = float(input(msg).replace(",", "."))
-            if valor <= 0:
+            centavos = centavos_de_texto(input(msg))
+            if centavos <= 0:
                 print("Digite um valor maior que zero.")
             else:
-                return valor
+                return reais(centavos)
         except ValueError:
             print("Digite um número válido. Ex: 12.50")
 
 
-def validar_data_yyyy_mm_dd(texto):
+def converter_valor(texto):
+    """Valor positivo (em reais, arredondado para centavos) a partir de número
+    ou texto com ',' ou '.'; ValueError se inválido."""
+    centavos = centavos_de_valor(texto)
+    if not centavos > 0:
+        raise ValueError("valor deve ser maior que zero")
+    return reais(centavos)
+
+
+def validar_gasto(dados):
+    """Confere um gasto vindo de fora dos menus e devolve o dict normalizado.
+
+    Levanta ValueError com a mensagem do problema encontrado.
+    """
+    if not isinstance(dados, dict):
+        raise ValueError("registro não é um objeto")
     try:
-        datetime.strptime(texto, "%Y-%m-%d")
-        return True
+        valor = converter_valor(dados.get("valor", ""))
     except ValueError:
-        return False
+        raise ValueError(f"valor inválido: {dados.get('valor')!r}")
+    for campo in ("descricao", "categoria", "data"):
+        if dados.get(campo) is not None and not isinstance(dados[campo], str):
+            raise ValueError(f"{campo} inválida: {dados[campo]!r}")
+    data = (dados.get("data") or "").strip() or None
+    if data is not None and not validar_data_yyyy_mm_dd(data):
+        raise ValueError(f"data inválida: {data!r}")
+    return {
+        "descricao": (dados.get("descricao") or "").strip(),
+        "categoria": (dados.get("categoria") or "").strip(),
+        "valor": valor,
+        "data": data,
+    }
+
+
+def validar_data_yyyy_mm_dd(texto):
+    return bool(data_para_ordinal(texto))
 
 
 def pedir_data_opcional():
@@ -247,84 +2598,290 @@ def pedir_data_obrigatoria(msg):
         print("Formato inválido. Exemplo: 2026-02-08")
 
 
-def pedir_indice_gasto(total):
+# Letras que não se decompõem em letra base + acento no Unicode.
+LETRAS_SEM_DECOMPOSICAO = {
+    "ß": "ss", "æ": "ae", "œ": "oe", "ø": "o", "đ": "d", "ł": "l", "þ": "th", "ð": "d", "ı": "i",
+}
+
+TAMANHO_CACHE_NORMALIZACAO = 8192
+
+
+def criar_tabela_sem_acentos():
+    """Tabela de str.translate que troca cada letra latina acentuada pela base
+    (é -> e, ç -> c, ü -> u, ...) e apaga acentos soltos (texto em NFD)."""
+    tabela = {}
+    for codigo in chain(range(0x00C0, 0x0250), range(0x1E00, 0x1F00)):
+        decomposta = unicodedata.normalize("NFD", chr(codigo))
+        base = "".join(c for c in decomposta if not unicodedata.combining(c))
+        if base != chr(codigo) and base.isascii():
+            tabela[codigo] = base
+    for codigo in range(0x0300, 0x0370):
+        tabela[codigo] = None
+    # normalizar_texto aplica lower() antes, então só as minúsculas importam.
+    for letra, base in LETRAS_SEM_DECOMPOSICAO.items():
+        tabela[ord(letra)] = base
+    return tabela
+
+
+TABELA_SEM_ACENTOS = criar_tabela_sem_acentos()
+
+
+@lru_cache(maxsize=TAMANHO_CACHE_NORMALIZACAO)
+def normalizar_texto(s):
+    """Minúsculas, sem espaços nas pontas e sem acentos ("  Ação " -> "acao")."""
+    return (s or "").strip().lower().translate(TABELA_SEM_ACENTOS)
+
+
+# =====================
+# Listagem e filtros
+# =====================
+
+def formatar_gasto(i, gasto):
+    data = gasto.get("data")
+    data_txt = data if isinstance(data, str) and data else "sem data"
+    posicao = f"{i}) " if i is not None else ""
+    id_txt = f"#{gasto['id']} " if "id" in gasto else ""
+    return (
+        f"{posicao}{id_txt}"
+        f"Data: {data_txt} | "
+        f"Descrição: {gasto.get('descricao', '')} | "
+        f"Categoria: {gasto.get('categoria', '')} | "
+        f"Valor: R$ {float(gasto.get('valor', 0)):.2f}"
+    )
+
+
+class PaginasDeGastos:
+    """Acesso por página a uma sequência ou a um iterador de gastos.
+
+    Iteradores (os filtros lazy) só são consumidos até a página pedida;
+    o número de cada linha é a posição dela na sequência completa.
+    """
+
+    def __init__(self, gastos):
+        # Da SQLite cada página é uma consulta; nada além dela fica em memória.
+        self._base = gastos if isinstance(gastos, GastosSQLite) else None
+        if self._base is not None or (hasattr(gastos, "__getitem__") and hasattr(gastos, "__len__")):
+            self._lidos, self._resto = gastos, None
+        else:
+            self._lidos, self._resto = [], iter(gastos)
+
+    def _ler_ate(self, n):
+        if self._resto is not None and len(self._lidos) < n:
+            faltam = n - len(self._lidos)
+            self._lidos.extend(islice(self._resto, faltam))
+            if len(self._lidos) < n:
+                self._resto = None
+
+    def existe(self, i):
+        """Se a sequência tem a posição i (lendo do iterador se preciso)."""
+        self._ler_ate(i + 1)
+        return 0 <= i < len(self._lidos)
+
+    def proximo_com(self, inicio, termo_n):
+        """Índice do primeiro gasto a partir de `inicio` que contém o termo, ou None."""
+        if self._base is not None:
+            return self._base.posicao_com_texto(inicio, termo_n)
+        i = inicio
+        while self.existe(i):
+            if gasto_contem(self._lidos[i], termo_n):
+                return i
+            i += 1
+        return None
+
+    def pagina(self, numero, tamanho):
+        """[(índice global, gasto)] da página e se há páginas depois dela."""
+        inicio = numero * tamanho
+        if self._base is not None:
+            linhas = self._base[inicio:inicio + tamanho + 1]
+            return list(enumerate(linhas[:tamanho], inicio)), len(linhas) > tamanho
+        self._ler_ate(inicio + tamanho + 1)
+        fim = min(inicio + tamanho, len(self._lidos))
+        return [(i, self._lidos[i]) for i in range(inicio, fim)], len(self._lidos) > fim
+
+    def total(self):
+        """Quantidade de gastos, ou None enquanto o iterador não acabou."""
+        return len(self._lidos) if self._resto is None else None
+
+
+def gasto_contem(gasto, termo_n):
+    return termo_n in normalizar_texto(gasto.get("descricao")) or termo_n in normalizar_texto(gasto.get("categoria"))
+
+
+def renderizar_pagina(titulo, linhas, numero, total, termo_n):
+    partes = [f"\n=== {titulo} ==="]
+    for i, gasto in linhas:
+        marca = "» " if termo_n and gasto_contem(gasto, termo_n) else ""
+        partes.append(marca + formatar_gasto(i + 1, gasto))
+    if total is None:
+        partes.append(f"\nPágina {numero + 1} (há mais gastos)")
+    else:
+        paginas = max(1, -(-total // TAMANHO_PAGINA))
+        partes.append(f"\nPágina {numero + 1} de {paginas} ({total} gasto(s))")
+    sys.stdout.write("\n".join(partes) + "\n")
+    sys.stdout.flush()
+
+
+def paginar_gastos(gastos, titulo="LISTA DE GASTOS", selecionar=False):
+    """Mostra os gastos página a página.
+
+    Com selecionar=True devolve o id do gasto escolhido, ou None se o
+    usuário cancelar: "#N" é o id, e um número sem "#" é a posição (N) de
+    um gasto da página mostrada.
+    """
+    paginas = PaginasDeGastos(gastos)
+    numero, termo_n = 0, ""
+    mensagem = ""
+
     while True:
-        try:
-            escolha = int(input(f"\nDigite o número do gasto (1 a {total}) ou 0 para cancelar: "))
-            if escolha == 0:
-                return None
-            if 1 <= escolha <= total:
-                return escolha - 1
-            print("Número fora do intervalo.")
-        except ValueError:
-            print("Digite um número inteiro válido.")
+        linhas, tem_mais = paginas.pagina(numero, TAMANHO_PAGINA)
+        if not linhas and numero == 0:
+            print(f"\n=== {titulo} ===")
+            print("Nenhum gasto registrado.")
+            return None
+
+        if selecionar or tem_mais or numero > 0:
+            limpar_tela()
+        renderizar_pagina(titulo, linhas, numero, paginas.total(), termo_n)
+        if not (selecionar or tem_mais or numero > 0):
+            return None
+
+        if mensagem:
+            print(mensagem)
+            mensagem = ""
+        opcoes = "[Enter] próxima | - anterior | p N ir para página | /texto buscar | 0 "
+        opcoes += "cancelar | N ou #id escolher o gasto" if selecionar else "sair"
+        op = input(f"\n{opcoes}\n> ").strip()
+
+        if op == "0" or (op.lower() == "s" and not selecionar):
+            return None
+
+        if op in ("", "+"):
+            if tem_mais:
+                numero += 1
+            else:
+                mensagem = "Esta é a última página."
+
+        elif op == "-":
+            numero = max(0, numero - 1)
+
+        elif op.lower().startswith("p") and op[1:].strip().isdigit():
+            destino = int(op[1:].strip()) - 1
+            if destino >= 0 and paginas.existe(destino * TAMANHO_PAGINA):
+                numero = destino
+            else:
+                mensagem = "Página inexistente."
+
+        elif op.startswith("/"):
+            termo_n = normalizar_texto(op[1:])
+            if not termo_n:
+                continue
+            # Fica na página atual se ela tiver o termo; senão avança até a
+            # próxima que tiver, recomeçando do início se chegar ao fim.
+            i = paginas.proximo_com(numero * TAMANHO_PAGINA, termo_n)
+            if i is None:
+                i = paginas.proximo_com(0, termo_n)
+            if i is not None:
+                numero = i // TAMANHO_PAGINA
+            else:
+                mensagem = "Nenhum gasto com esse texto."
+
+        elif selecionar and op.startswith("#") and op[1:].strip().isdigit():
+            return int(op[1:].strip())
+
+        elif selecionar and op.isdigit():
+            escolhido = next((gasto for i, gasto in linhas if i + 1 == int(op)), None)
+            if escolhido is not None:
+                return escolhido["id"]
+            mensagem = "Essa posição não está nesta página (use #id para escolher pelo id)."
+
+        else:
+            mensagem = "Opção inválida."
+
+
+def listar_gastos(gastos, titulo="LISTA DE GASTOS"):
+    paginar_gastos(gastos, titulo)
+
+
+# Os filtros por data existem em duas formas: iterar_* devolve um gerador
+# (usado pelo export, que não precisa da lista inteira em memória) e
+# filtrar_* devolve a lista pronta para os menus.
+
+def predicado_mes(yyyy_mm):
+    def predicado(g):
+        data = g.get("data")
+        return isinstance(data, str) and len(data) >= 7 and data[:7] == yyyy_mm
+    return predicado
+
+
+def predicado_intervalo(data_ini, data_fim):
+    ord_ini = data_para_ordinal(data_ini)
+    ord_fim = data_para_ordinal(data_fim)
+
+    def predicado(g):
+        ordinal = data_para_ordinal(g.get("data"))
+        return bool(ordinal) and ord_ini <= ordinal <= ord_fim
+    return predicado
 
 
-def normalizar_texto(s):
-    s = (s or "").strip().lower()
-    s = (
-        s.replace("ã", "a").replace("á", "a").replace("â", "a").replace("à", "a")
-         .replace("õ", "o").replace("ó", "o").replace("ô", "o").replace("ò", "o")
-         .replace("ç", "c")
-    )
-    return s
+def filtrar_lazy(gastos, *predicados):
+    return (g for g in gastos if all(p(g) for p in predicados))
 
 
-# =====================
-# Listagem e filtros
-# =====================
+def iterar_por_mes(gastos, yyyy_mm):
+    if isinstance(gastos, GastosSQLite):
+        if len(yyyy_mm) == 7:
+            yield from gastos.iterar_consulta("dia >= ? AND dia < ?", (f"{yyyy_mm}-01", f"{yyyy_mm}-32"))
+        return
 
-def formatar_gasto(i, gasto):
-    data = gasto.get("data")
-    data_txt = data if isinstance(data, str) and data else "sem data"
-    return (
-        f"{i}) "
-        f"Data: {data_txt} | "
-        f"Descrição: {gasto.get('descricao', '')} | "
-        f"Categoria: {gasto.get('categoria', '')} | "
-        f"Valor: R$ {float(gasto.get('valor', 0)):.2f}"
-    )
+    if isinstance(gastos, GastosTable):
+        intervalo = intervalo_do_mes(yyyy_mm)
+        if intervalo:
+            yield from gastos.iterar_datas(*intervalo)
+        return
 
+    yield from filtrar_lazy(gastos, predicado_mes(yyyy_mm))
 
-def listar_gastos(gastos):
-    print("\n=== LISTA DE GASTOS ===")
 
-    if not gastos:
-        print("Nenhum gasto registrado.")
+def iterar_por_intervalo(gastos, data_ini, data_fim):
+    if isinstance(gastos, GastosSQLite):
+        ini = datetime.strptime(data_ini, "%Y-%m-%d").strftime("%Y-%m-%d")
+        fim = datetime.strptime(data_fim, "%Y-%m-%d").strftime("%Y-%m-%d")
+        yield from gastos.iterar_consulta("dia BETWEEN ? AND ?", (ini, fim))
+        return
+
+    if isinstance(gastos, GastosTable):
+        yield from gastos.iterar_datas(data_para_ordinal(data_ini), data_para_ordinal(data_fim) + 1)
         return
 
-    for i, gasto in enumerate(gastos, start=1):
-        print(formatar_gasto(i, gasto))
+    yield from filtrar_lazy(gastos, predicado_intervalo(data_ini, data_fim))
 
 
 def filtrar_por_mes(gastos, yyyy_mm):
-    filtrados = []
-    for g in gastos:
-        data = g.get("data")
-        if isinstance(data, str) and len(data) >= 7 and data[:7] == yyyy_mm:
-            filtrados.append(g)
-    return filtrados
+    return list(iterar_por_mes(gastos, yyyy_mm))
 
 
 def filtrar_por_intervalo(gastos, data_ini, data_fim):
-    dt_ini = datetime.strptime(data_ini, "%Y-%m-%d").date()
-    dt_fim = datetime.strptime(data_fim, "%Y-%m-%d").date()
-
-    filtrados = []
-    for g in gastos:
-        data = g.get("data")
-        if not (isinstance(data, str) and validar_data_yyyy_mm_dd(data)):
-            continue
-        dt = datetime.strptime(data, "%Y-%m-%d").date()
-        if dt_ini <= dt <= dt_fim:
-            filtrados.append(g)
-    return filtrados
+    return list(iterar_por_intervalo(gastos, data_ini, data_fim))
 
 
 def buscar_gastos(gastos, termo=None, categoria=None):
     termo_n = normalizar_texto(termo) if termo else None
     cat_n = normalizar_texto(categoria) if categoria else None
 
+    if isinstance(gastos, GastosSQLite):
+        condicoes, parametros = [], []
+        if termo_n:
+            escapado = termo_n.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            condicoes.append("descricao_n LIKE ? ESCAPE '\\'")
+            parametros.append(f"%{escapado}%")
+        if cat_n:
+            condicoes.append("categoria_n = ?")
+            parametros.append(cat_n)
+        return gastos.consultar(" AND ".join(condicoes), parametros)
+
+    if isinstance(gastos, GastosTable):
+        return gastos.buscar(termo_n, cat_n)
+
     achados = []
     for g in gastos:
         desc_n = normalizar_texto(g.get("descricao", ""))
@@ -344,22 +2901,79 @@ def buscar_gastos(gastos, termo=None, categoria=None):
     return achados
 
 
-def ordenar_gastos(gastos, chave, reverso=False):
-    def chave_sort(g):
-        if chave == "valor":
-            return float(g.get("valor", 0))
-        if chave == "data":
-            data = g.get("data")
-            if isinstance(data, str) and validar_data_yyyy_mm_dd(data):
-                return datetime.strptime(data, "%Y-%m-%d")
-            return datetime.max
-        if chave == "categoria":
-            return normalizar_texto(g.get("categoria", ""))
-        if chave == "descricao":
-            return normalizar_texto(g.get("descricao", ""))
-        return 0
-
-    return sorted(gastos, key=chave_sort, reverse=reverso)
+CAMPOS_ORDENACAO = ("data", "valor", "categoria", "descricao")
+
+ORDEM_SQLITE = {
+    "valor": "centavos",
+    "data": "dia IS NULL, dia",
+    "categoria": "categoria_n",
+    "descricao": "descricao_n",
+}
+
+
+def interpretar_ordem(chave, reverso=False):
+    """Critérios de ordenação como lista de (campo, decrescente).
+
+    `chave` é um campo, uma lista de campos ou pares (campo, decrescente),
+    ou um texto como "categoria,-data,valor" ("-" pede ordem decrescente).
+    reverso=True inverte o sentido de todos os campos.
+    """
+    partes = chave.split(",") if isinstance(chave, str) else chave
+    criterios = []
+    for parte in partes:
+        if isinstance(parte, str):
+            parte = normalizar_texto(parte)
+            parte = (parte.lstrip("-").strip(), parte.startswith("-"))
+        campo, decrescente = parte
+        if campo not in CAMPOS_ORDENACAO:
+            raise ValueError(f"campo de ordenação inválido: {campo!r}")
+        criterios.append((campo, decrescente != reverso))
+    if not criterios:
+        raise ValueError("informe ao menos um campo de ordenação")
+    return criterios
+
+
+def chave_de_ordenacao(g, campo):
+    if campo == "valor":
+        return float(g.get("valor", 0))
+    if campo == "data":
+        # Sem data ou data inválida vai para o fim.
+        return data_para_ordinal(g.get("data")) or date.max.toordinal() + 1
+    return normalizar_texto(g.get(campo, ""))
+
+
+def ordenar_gastos(gastos, chave, reverso=False, limite=None):
+    """Ordena por um ou mais campos (veja interpretar_ordem).
+
+    Com `limite`, devolve só os `limite` primeiros. Empates mantêm a ordem
+    de cadastro.
+    """
+    criterios = interpretar_ordem(chave, reverso)
+
+    if isinstance(gastos, GastosSQLite):
+        colunas = []
+        for campo, decrescente in criterios:
+            for coluna in ORDEM_SQLITE[campo].split(", "):
+                colunas.append(f"{coluna} DESC" if decrescente else coluna)
+        return gastos.consultar(ordem=", ".join(colunas + ["id"]), limite=limite)
+
+    if isinstance(gastos, GastosTable):
+        return gastos.ordenar(criterios, limite)
+
+    # Listas comuns: cada chave é calculada uma vez por gasto, não a cada
+    # comparação.
+    gastos = list(gastos)
+    chaves = {campo: [chave_de_ordenacao(g, campo) for g in gastos] for campo, _ in criterios}
+    if limite is not None and len(criterios) == 1:
+        campo, decrescente = criterios[0]
+        escolher = heapq.nlargest if decrescente else heapq.nsmallest
+        ordem = escolher(limite, range(len(gastos)), key=chaves[campo].__getitem__)
+    else:
+        ordem = list(range(len(gastos)))
+        for campo, decrescente in reversed(criterios):
+            ordem.sort(key=chaves[campo].__getitem__, reverse=decrescente)
+        ordem = ordem[:limite]
+    return [gastos[i] for i in ordem]
 
 
 # ===========
@@ -367,57 +2981,626 @@ def ordenar_gastos(gastos, chave, reverso=False):
 # ===========
 
 def resumo_por_categoria(gastos):
+    if isinstance(gastos, GastosSQLite):
+        return dict(gastos.conexao.execute(
+            "SELECT categoria, SUM(centavos) FROM gastos GROUP BY categoria ORDER BY MIN(id)"
+        ))
+
+    if isinstance(gastos, GastosTable):
+        return gastos.resumo()[2]
+
     resumo = {}
     for g in gastos:
         cat = g.get("categoria", "Sem categoria")
-        val = float(g.get("valor", 0))
-        resumo[cat] = resumo.get(cat, 0.0) + val
+        resumo[cat] = resumo.get(cat, 0) + centavos_do_gasto(g)
     return resumo
 
 
-def mostrar_resumo(gastos, titulo="Resumo"):
+def calcular_resumo(gastos):
+    """(quantidade, total, total por categoria) de uma coleção de gastos,
+    com os totais em centavos."""
+    if isinstance(gastos, GastosSQLite):
+        qtd, total = gastos.conexao.execute(
+            "SELECT COUNT(*), COALESCE(SUM(centavos), 0) FROM gastos"
+        ).fetchone()
+        return qtd, total, resumo_por_categoria(gastos)
+
+    if isinstance(gastos, GastosTable):
+        return gastos.resumo()
+
+    total = sum(centavos_do_gasto(g) for g in gastos)
+    return len(gastos), total, resumo_por_categoria(gastos)
+
+
+def calcular_resumo_do_mes(gastos, yyyy_mm):
+    if isinstance(gastos, (GastosTable, GastosSQLite)):
+        return gastos.resumo_mes(yyyy_mm)
+    return calcular_resumo(filtrar_por_mes(gastos, yyyy_mm))
+
+
+def mostrar_resumo(gastos, titulo="Resumo", resumo=None):
     print(f"\n=== {titulo} ===")
 
-    if not gastos:
+    qtd, total, por_categoria = resumo if resumo is not None else calcular_resumo(gastos)
+
+    if not qtd:
         print("Nenhum gasto encontrado.")
         return
 
-    total = sum(float(g.get("valor", 0)) for g in gastos)
-    media = total / len(gastos) if gastos else 0
+    media = media_em_centavos(total, qtd)
 
-    print(f"\nQuantidade de gastos: {len(gastos)}")
-    print(f"Total geral: R$ {total:.2f}")
-    print(f"Média por gasto: R$ {media:.2f}")
+    print(f"\nQuantidade de gastos: {qtd}")
+    print(f"Total geral: R$ {formatar_centavos(total)}")
+    print(f"Média por gasto: R$ {formatar_centavos(media)}")
 
-    resumo = resumo_por_categoria(gastos)
     print("\nTotal por categoria:")
 
-    top = sorted(resumo.items(), key=lambda x: x[1], reverse=True)
+    top = sorted(por_categoria.items(), key=lambda x: x[1], reverse=True)
 
     for cat, val in top:
-        print(f"- {cat}: R$ {val:.2f}")
+        print(f"- {cat}: R$ {formatar_centavos(val)}")
 
     print("\nTop 3 categorias:")
     for i, (cat, val) in enumerate(top[:3], start=1):
-        print(f"{i}) {cat} — R$ {val:.2f}")
+        print(f"{i}) {cat} — R$ {formatar_centavos(val)}")
+
+
+# =====================
+# Relatórios por período
+# =====================
+
+# Série do histórico inteiro, mês a mês ou semana a semana, montada a partir
+# dos baldes da GastosTable (os mensais são mantidos a cada alteração; os
+# semanais, guardados por mês). Períodos sem gastos entram zerados para as
+# médias e comparações andarem no calendário. Valores em centavos.
+
+JANELAS_MEDIA_MOVEL = (3, 6, 12)
+
+
+def mes_seguinte(yyyy_mm):
+    ano, mes = int(yyyy_mm[:4]), int(yyyy_mm[5:])
+    return f"{ano + mes // 12:04d}-{mes % 12 + 1:02d}"
+
+
+def semana_seguinte(semana_iso):
+    segunda = date.fromisocalendar(int(semana_iso[:4]), int(semana_iso[6:]), 1)
+    ano, semana, _ = date.fromordinal(segunda.toordinal() + 7).isocalendar()
+    return f"{ano:04d}-W{semana:02d}"
+
+
+def comparacao(total, base):
+    """{"base", "variacao", "percentual"} de `total` contra `base` (None se não houver base)."""
+    if base is None:
+        return None
+    return {"base": base, "variacao": total - base,
+            "percentual": round((total - base) * 100 / base, 1) if base else None}
+
+
+def relatorio_por_periodo(gastos, por="mes", categoria=None, ultimos=None):
+    """Uma linha por mês (ou semana ISO) do primeiro ao último com gastos.
+
+    Cada linha tem "periodo", "quantidade", "total" e "por_categoria"; as
+    mensais também "medias_moveis" (3, 6 e 12 meses, None enquanto não há
+    meses suficientes), "mes_anterior" e "ano_anterior"; as semanais,
+    "semana_anterior". Com `categoria`, só os gastos dela (comparada como
+    na busca). `ultimos` limita às N linhas finais, mas médias e comparações
+    usam o histórico todo.
+    """
+    if not isinstance(gastos, (GastosTable, GastosSQLite)):
+        gastos = GastosTable(gastos)
+    if por == "semana":
+        baldes, seguinte = gastos.por_semana(), semana_seguinte
+    else:
+        baldes, seguinte = gastos.agregados()["meses"], mes_seguinte
+    if categoria is not None:
+        alvo = normalizar_texto(categoria)
+        filtrados = {}
+        for periodo, (_, _, por_categoria) in baldes.items():
+            escolhidas = {cat: b for cat, b in por_categoria.items() if normalizar_texto(cat) == alvo}
+            if escolhidas:
+                filtrados[periodo] = [sum(b[0] for b in escolhidas.values()),
+                                      sum(b[1] for b in escolhidas.values()), escolhidas]
+        baldes = filtrados
+    if not baldes:
+        return []
+
+    periodos = [min(baldes)]
+    ultimo = max(baldes)
+    while periodos[-1] != ultimo:
+        periodos.append(seguinte(periodos[-1]))
+
+    linhas, totais, acumulado = [], [], [0]
+    for i, periodo in enumerate(periodos):
+        qtd, total, por_categoria = baldes.get(periodo, (0, 0, {}))
+        totais.append(total)
+        acumulado.append(acumulado[-1] + total)
+        linha = {
+            "periodo": periodo,
+            "quantidade": qtd,
+            "total": total,
+            "por_categoria": {
+                cat: balde[1] for cat, balde in sorted(por_categoria.items(), key=lambda x: x[1][1], reverse=True)
+            },
+        }
+        if por == "semana":
+            linha["semana_anterior"] = comparacao(total, totais[i - 1] if i else None)
+        else:
+            linha["medias_moveis"] = {
+                n: media_em_centavos(acumulado[i + 1] - acumulado[i + 1 - n], n) if i + 1 >= n else None
+                for n in JANELAS_MEDIA_MOVEL
+            }
+            linha["mes_anterior"] = comparacao(total, totais[i - 1] if i else None)
+            linha["ano_anterior"] = comparacao(total, totais[i - 12] if i >= 12 else None)
+        linhas.append(linha)
+    return linhas[-ultimos:] if ultimos else linhas
+
+
+def linha_em_reais(linha):
+    """Cópia de uma linha de relatorio_por_periodo com os valores em reais (saída JSON)."""
+    saida = dict(linha, total=reais(linha["total"]),
+                 por_categoria={cat: reais(v) for cat, v in linha["por_categoria"].items()})
+    if "medias_moveis" in linha:
+        saida["medias_moveis"] = {n: None if v is None else reais(v) for n, v in linha["medias_moveis"].items()}
+    for chave in ("mes_anterior", "ano_anterior", "semana_anterior"):
+        if linha.get(chave) is not None:
+            saida[chave] = dict(linha[chave], base=reais(linha[chave]["base"]),
+                                variacao=reais(linha[chave]["variacao"]))
+    return saida
+
+
+def texto_relatorio_por_periodo(linhas, por="mes"):
+    if not linhas:
+        return "Nenhum gasto com data encontrado."
+
+    def valor(centavos):
+        return "-" if centavos is None else formatar_centavos(centavos)
+
+    def variacao(comparado):
+        if comparado is None:
+            return "-"
+        texto = ("+" if comparado["variacao"] >= 0 else "") + formatar_centavos(comparado["variacao"])
+        if comparado["percentual"] is not None:
+            texto += f" ({comparado['percentual']:+.1f}%)"
+        return texto
+
+    if por == "semana":
+        saida = [f"{'Semana':<9} {'Qtd':>5} {'Total':>12} {'Maior categoria':<20} {'vs semana anterior':>22}"]
+        for linha in linhas:
+            maior = next(iter(linha["por_categoria"]), "-")
+            saida.append(f"{linha['periodo']:<9} {linha['quantidade']:>5} {valor(linha['total']):>12} "
+                         f"{maior[:20]:<20} {variacao(linha['semana_anterior']):>22}")
+        return "\n".join(saida)
+
+    saida = [f"{'Mês':<7} {'Qtd':>5} {'Total':>12} {'Média 3m':>12} {'Média 6m':>12} {'Média 12m':>12} "
+             f"{'vs mês anterior':>22} {'vs ano anterior':>22}"]
+    for linha in linhas:
+        medias = linha["medias_moveis"]
+        saida.append(f"{linha['periodo']:<7} {linha['quantidade']:>5} {valor(linha['total']):>12} "
+                     f"{valor(medias[3]):>12} {valor(medias[6]):>12} {valor(medias[12]):>12} "
+                     f"{variacao(linha['mes_anterior']):>22} {variacao(linha['ano_anterior']):>22}")
+    return "\n".join(saida)
+
+
+# =====================
+# Resumo paralelo
+# =====================
+
+# Para auditorias sobre o histórico inteiro: as linhas são divididas em
+# fatias contíguas, cada processo soma as suas em baldes por mês e
+# categoria (map) e os baldes parciais são somados no fim (reduce). O
+# resultado tem o mesmo formato de GastosTable.agregados().
+#
+# Onde há fork, os processos herdam as colunas (_COLUNAS_EM_RESUMO) e
+# recebem só (início, fim) de cada fatia; nada é copiado no processo pai.
+# Sem fork, cada fatia é copiada e enviada ao processo.
+
+_COLUNAS_EM_RESUMO = None
+
+
+def cpus_disponiveis():
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def agregar_particao(valores, datas, categorias, textos_categorias):
+    """Baldes {mês: [qtd, soma, {categoria: [qtd, soma]}]} de uma fatia.
+
+    Gastos sem data (ou com data inválida) ficam na chave None.
+    """
+    por_mes = {}
+    meses = {}
+    for valor, ordinal, codigo in zip(valores, datas, categorias):
+        if ordinal > 0:
+            mes = meses.get(ordinal)
+            if mes is None:
+                mes = meses[ordinal] = mes_do_ordinal(ordinal)
+        else:
+            mes = None
+        balde = por_mes.get(mes)
+        if balde is None:
+            balde = por_mes[mes] = [0, 0, {}]
+        balde[0] += 1
+        balde[1] += valor
+        da_categoria = balde[2].get(codigo)
+        if da_categoria is None:
+            da_categoria = balde[2][codigo] = [0, 0]
+        da_categoria[0] += 1
+        da_categoria[1] += valor
+
+    for balde in por_mes.values():
+        por_categoria = {}
+        for codigo, (qtd, soma) in balde[2].items():
+            somar_no_balde(por_categoria, textos_categorias[codigo], qtd, soma)
+        balde[2] = por_categoria
+    return por_mes
+
+
+def agregar_intervalo(inicio, fim):
+    valores, datas, categorias, textos = _COLUNAS_EM_RESUMO
+    return agregar_particao(valores[inicio:fim], datas[inicio:fim], categorias[inicio:fim], textos)
+
+
+def combinar_parciais(parciais):
+    total, categorias, meses = 0, {}, {}
+    for parcial in parciais:
+        for mes, (qtd, soma, por_categoria) in parcial.items():
+            total += soma
+            if mes is not None:
+                balde = meses.setdefault(mes, [0, 0, {}])
+                balde[0] += qtd
+                balde[1] += soma
+            for categoria, (qtd_cat, soma_cat) in por_categoria.items():
+                somar_no_balde(categorias, categoria, qtd_cat, soma_cat)
+                if mes is not None:
+                    somar_no_balde(balde[2], categoria, qtd_cat, soma_cat)
+    return {"total": total, "categorias": categorias, "meses": meses}
+
+
+def agregados_paralelos(gastos, processos=None):
+    """Recalcula os resumos de uma GastosTable a partir das linhas, em paralelo."""
+    global _COLUNAS_EM_RESUMO
+    processos = processos or cpus_disponiveis()
+    if processos == 1 or len(gastos) < MINIMO_RESUMO_PARALELO:
+        return combinar_parciais([agregar_particao(*gastos.colunas_do_resumo())])
+
+    # Mais fatias que processos para equilibrar a carga entre eles.
+    fatias = processos * 4
+    if "fork" not in multiprocessing.get_all_start_methods():
+        with ProcessPoolExecutor(max_workers=processos) as executor:
+            parciais = executor.map(agregar_particao, *zip(*gastos.particoes(fatias)))
+            return combinar_parciais(parciais)
+
+    _COLUNAS_EM_RESUMO = gastos.colunas_do_resumo()
+    try:
+        n = len(_COLUNAS_EM_RESUMO[0])
+        tamanho = max(1, -(-n // fatias))
+        inicios = range(0, n, tamanho)
+        with ProcessPoolExecutor(max_workers=processos, mp_context=multiprocessing.get_context("fork")) as executor:
+            parciais = executor.map(agregar_intervalo, inicios, [inicio + tamanho for inicio in inicios])
+            return combinar_parciais(parciais)
+    finally:
+        _COLUNAS_EM_RESUMO = None
+
+
+def resumo_paralelo(gastos, processos=None):
+    """Como calcular_resumo, recalculando tudo com agregados_paralelos."""
+    if not isinstance(gastos, GastosTable):
+        return calcular_resumo(gastos)
+    agregados = agregados_paralelos(gastos, processos)
+    return len(gastos), agregados["total"], {cat: balde[1] for cat, balde in agregados["categorias"].items()}
+
+
+# =========================
+# Relatório administrativo
+# =========================
+
+# Junta os resumos de todos os usuários de usuarios.json. Cada arquivo é
+# carregado num processo separado (no máximo MAXIMO_PROCESSOS_RELATORIO
+# ao mesmo tempo) e os resumos são somados à medida que chegam; um
+# arquivo ilegível vira um erro no relatório, sem interromper os demais.
+
+def agregados_do_usuario(usuario):
+    """(quantidade, agregados) de um usuário; levanta erro se o arquivo estiver ruim."""
+    gastos = ler_gastos_sem_alterar(usuario)
+    return len(gastos), gastos.agregados()
+
+
+def acumular_agregados(destino, agregados):
+    destino["total"] += agregados["total"]
+    for categoria, (qtd, soma) in agregados["categorias"].items():
+        somar_no_balde(destino["categorias"], categoria, qtd, soma)
+    for mes, (qtd, soma, por_categoria) in agregados["meses"].items():
+        balde = destino["meses"].setdefault(mes, [0, 0, {}])
+        balde[0] += qtd
+        balde[1] += soma
+        for categoria, (qtd_cat, soma_cat) in por_categoria.items():
+            somar_no_balde(balde[2], categoria, qtd_cat, soma_cat)
+
+
+def relatorio_administrativo(processos=None, progresso=None):
+    """Resumo de todos os usuários.
+
+    Devolve {"quantidade", "total", "categorias", "meses", "usuarios",
+    "erros"}, com somas por categoria/mês e, em "erros", a mensagem de
+    cada usuário cujo arquivo não pôde ser lido. `progresso(usuario,
+    feitos, total)` é chamado a cada usuário concluído.
+    """
+    usuarios = sorted(carregar_usuarios())
+    processos = processos or min(MAXIMO_PROCESSOS_RELATORIO, cpus_disponiveis())
+    geral = {"total": 0, "categorias": {}, "meses": {}}
+    quantidade, por_usuario, erros = 0, {}, {}
+
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        futuros = {executor.submit(agregados_do_usuario, usuario): usuario for usuario in usuarios}
+        for feitos, futuro in enumerate(as_completed(futuros), start=1):
+            usuario = futuros[futuro]
+            try:
+                qtd, agregados = futuro.result()
+            except Exception as e:
+                erros[usuario] = f"{type(e).__name__}: {e}"
+            else:
+                quantidade += qtd
+                acumular_agregados(geral, agregados)
+                por_usuario[usuario] = {"quantidade": qtd, "total": reais(agregados["total"])}
+            if progresso is not None:
+                progresso(usuario, feitos, len(usuarios))
+
+    return {
+        "quantidade": quantidade,
+        "total": reais(geral["total"]),
+        "categorias": {cat: reais(balde[1]) for cat, balde in
+                       sorted(geral["categorias"].items(), key=lambda x: x[1][1], reverse=True)},
+        "meses": {mes: reais(geral["meses"][mes][1]) for mes in sorted(geral["meses"])},
+        "usuarios": dict(sorted(por_usuario.items())),
+        "erros": dict(sorted(erros.items())),
+    }
+
+
+def texto_relatorio_administrativo(relatorio):
+    linhas = [
+        f"Usuários: {len(relatorio['usuarios'])} lidos, {len(relatorio['erros'])} com erro",
+        f"Quantidade de gastos: {relatorio['quantidade']}",
+        f"Total geral: R$ {relatorio['total']:.2f}",
+        "",
+        "Total por categoria:",
+    ]
+    linhas += [f"- {cat}: R$ {val:.2f}" for cat, val in relatorio["categorias"].items()]
+    linhas += ["", "Total por mês:"]
+    linhas += [f"- {mes}: R$ {val:.2f}" for mes, val in relatorio["meses"].items()]
+    linhas += ["", "Por usuário:"]
+    linhas += [f"- {u}: {r['quantidade']} gasto(s), R$ {r['total']:.2f}" for u, r in relatorio["usuarios"].items()]
+    if relatorio["erros"]:
+        linhas += ["", "Arquivos com erro:"]
+        linhas += [f"- {u}: {erro}" for u, erro in relatorio["erros"].items()]
+    return "\n".join(linhas)
 
 
 # ==============
 # Export (CSV)
 # ==============
 
-def exportar_csv(gastos, caminho=ARQUIVO_EXPORT):
-    with open(caminho, "w", newline="", encoding="utf-8") as f:
+def exportar_csv(gastos, caminho=ARQUIVO_EXPORT, tamanho_lote=TAMANHO_LOTE_EXPORT, compactar=False, progresso=None):
+    """Grava os gastos em CSV (;) e devolve quantas linhas foram escritas.
+
+    `gastos` pode ser qualquer iterável, inclusive os geradores iterar_*;
+    as linhas vão para o arquivo em lotes de `tamanho_lote`. Com
+    `compactar=True` o arquivo sai em gzip. `progresso(linhas, segundos)`
+    é chamado a cada lote e no final.
+    """
+    abrir = gzip.open if compactar else open
+    inicio = time.perf_counter()
+    total = 0
+
+    with abrir(caminho, "wt", newline="", encoding="utf-8") as f:
         writer = csv.writer(f, delimiter=";")
         writer.writerow(["data", "descricao", "categoria", "valor"])
 
+        lote = []
         for g in gastos:
-            writer.writerow([
+            lote.append([
                 g.get("data") or "",
                 g.get("descricao") or "",
                 g.get("categoria") or "",
-                f"{float(g.get('valor', 0)):.2f}"
+                f"{g.get('valor', 0):.2f}"
             ])
+            if len(lote) >= tamanho_lote:
+                writer.writerows(lote)
+                total += len(lote)
+                lote = []
+                if progresso:
+                    progresso(total, time.perf_counter() - inicio)
+
+        writer.writerows(lote)
+        total += len(lote)
+
+    if progresso:
+        progresso(total, time.perf_counter() - inicio)
+    return total
+
+
+def mostrar_progresso_export(linhas, segundos):
+    taxa = linhas / segundos if segundos > 0 else 0
+    print(f"\r{linhas} linha(s) exportada(s) — {taxa:,.0f} linhas/s", end="", flush=True)
+
+
+# ==========================
+# Importação (CSV/OFX/JSON)
+# ==========================
+
+# Os leitores de extrato são geradores de (número da linha, registro), em
+# que registro é um dict no formato de gasto ou uma exceção descrevendo por
+# que a linha não pôde ser lida. importar_extrato valida os registros em
+# lotes, grava tudo com uma única escrita no armazenamento e manda as
+# linhas rejeitadas para <arquivo>.rejeitados.csv.
+
+CATEGORIA_PADRAO_IMPORT = "Extrato"
+
+
+def ler_extrato_csv(arquivo, categoria_padrao):
+    """CSV com ';' e cabeçalho, no mesmo formato que exportar_csv grava."""
+    leitor = csv.reader(arquivo, delimiter=";")
+    cabecalho = next(leitor, None)
+    campos = [c.strip().lower() for c in cabecalho or []]
+    if "valor" not in campos:
+        yield 1, ValueError("cabeçalho sem a coluna 'valor'")
+        return
+
+    for linha in leitor:
+        if not any(c.strip() for c in linha):
+            continue
+        if len(linha) != len(campos):
+            yield leitor.line_num, ValueError(f"esperadas {len(campos)} colunas, encontradas {len(linha)}")
+            continue
+        registro = dict(zip(campos, linha))
+        registro["categoria"] = registro.get("categoria") or categoria_padrao
+        yield leitor.line_num, registro
+
+
+def gasto_do_ofx(campos, categoria_padrao):
+    """Gasto de uma transação OFX; None para créditos, que não são gastos."""
+    try:
+        valor = float(campos.get("TRNAMT", "").replace(",", "."))
+    except ValueError:
+        return ValueError(f"TRNAMT inválido: {campos.get('TRNAMT')!r}")
+    if valor >= 0:
+        return None
+
+    dt = campos.get("DTPOSTED", "")[:8]
+    data = f"{dt[:4]}-{dt[4:6]}-{dt[6:8]}" if len(dt) == 8 and dt.isdigit() else dt
+    return {
+        "descricao": campos.get("MEMO") or campos.get("NAME") or "",
+        "categoria": categoria_padrao,
+        "valor": -valor,
+        "data": data,
+    }
+
+
+def ler_extrato_ofx(arquivo, categoria_padrao):
+    """Transações <STMTTRN> de um OFX; só débitos viram gastos."""
+    atual = None
+    for num, bruta in enumerate(arquivo, start=1):
+        try:
+            linha = bruta.decode("utf-8")
+        except UnicodeDecodeError:
+            linha = bruta.decode("cp1252", errors="replace")
+
+        for tag, valor in re.findall(r"<(/?\w+)>([^<\r\n]*)", linha):
+            tag = tag.upper()
+            if tag == "STMTTRN":
+                atual = {"_linha": num}
+            elif tag == "/STMTTRN" and atual is not None:
+                yield atual.pop("_linha"), gasto_do_ofx(atual, categoria_padrao)
+                atual = None
+            elif atual is not None:
+                atual[tag] = valor.strip()
+
+
+def ler_extrato_json(arquivo, categoria_padrao):
+    """Uma lista JSON de gastos ou um objeto JSON por linha."""
+    primeira = arquivo.readline()
+    if primeira.lstrip().startswith("["):
+        dados = json.loads(primeira + arquivo.read())
+        linhas = enumerate(dados if isinstance(dados, list) else [dados], start=1)
+    else:
+        linhas = enumerate(chain([primeira], arquivo), start=1)
+
+    for num, registro in linhas:
+        if isinstance(registro, str):
+            if not registro.strip():
+                continue
+            try:
+                registro = json.loads(registro)
+            except json.JSONDecodeError as e:
+                yield num, ValueError(f"JSON inválido: {e.msg}")
+                continue
+        if isinstance(registro, dict) and not registro.get("categoria"):
+            registro["categoria"] = categoria_padrao
+        yield num, registro
+
+
+LEITORES_EXTRATO = {
+    "csv": ler_extrato_csv,
+    "ofx": ler_extrato_ofx,
+    "json": ler_extrato_json,
+}
+
+
+def detectar_formato_extrato(caminho):
+    nome = caminho.lower()
+    if nome.endswith(".gz"):
+        nome = nome[:-3]
+    if nome.endswith(".ofx"):
+        return "ofx"
+    if nome.endswith(".csv"):
+        return "csv"
+    return "json"
+
+
+def abrir_extrato(caminho, formato):
+    binario = formato == "ofx"
+    if caminho == "-":
+        return contextlib.nullcontext(sys.stdin.buffer if binario else sys.stdin)
+    abrir = gzip.open if caminho.lower().endswith(".gz") else open
+    if binario:
+        return abrir(caminho, "rb")
+    return abrir(caminho, "rt", newline="", encoding="utf-8-sig")
+
+
+def validar_lote(registros):
+    """(válidos, erros, quantos foram ignorados); o leitor entrega None
+    para lançamentos que não são gastos, como créditos num OFX."""
+    validos, erros, ignorados = [], [], 0
+    for num, registro in registros:
+        if registro is None:
+            ignorados += 1
+            continue
+        try:
+            if isinstance(registro, Exception):
+                raise registro
+            validos.append(validar_gasto(registro))
+        except ValueError as e:
+            conteudo = registro if isinstance(registro, dict) else None
+            erros.append({"linha": num, "erro": str(e), "conteudo": conteudo})
+    return validos, erros, ignorados
+
+
+def gravar_quarentena(caminho, erros):
+    destino = ("stdin" if caminho == "-" else caminho) + ".rejeitados.csv"
+    with open(destino, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, delimiter=";")
+        writer.writerow(["linha", "erro", "registro"])
+        writer.writerows(
+            [e["linha"], e["erro"], json.dumps(e["conteudo"], ensure_ascii=False) if e["conteudo"] else ""]
+            for e in erros
+        )
+    return destino
+
+
+def importar_extrato(gastos, usuario, caminho, formato=None, categoria_padrao=CATEGORIA_PADRAO_IMPORT):
+    """Importa um extrato inteiro com uma só gravação.
+
+    Devolve (quantidade importada, erros, caminho da quarentena ou None,
+    quantidade de lançamentos ignorados).
+    """
+    formato = formato or detectar_formato_extrato(caminho)
+    validos, erros, ignorados = [], [], 0
+
+    with abrir_extrato(caminho, formato) as arquivo:
+        registros = LEITORES_EXTRATO[formato](arquivo, categoria_padrao)
+        while True:
+            lote = list(islice(registros, TAMANHO_LOTE_IMPORT))
+            if not lote:
+                break
+            lote_validos, lote_erros, lote_ignorados = validar_lote(lote)
+            validos.extend(lote_validos)
+            erros.extend(lote_erros)
+            ignorados += lote_ignorados
+
+    if validos:
+        adicionar_em_lote(gastos, usuario, validos)
+    quarentena = gravar_quarentena(caminho, erros) if erros else None
+    return len(validos), erros, quarentena, ignorados
 
 
 # =========
@@ -441,13 +3624,14 @@ def adicionar_gasto(gastos, usuario):
     }
 
     gastos.append(gasto)
-    salvar_gastos(gastos, usuario)
+    registrar_alteracao(gastos, usuario, "add", gasto=gasto)
 
     print("\n✅ Gasto registrado com sucesso!")
     print(formatar_gasto(len(gastos), gasto))
 
 
-def editar_gasto(gastos, usuario):
+def editar_gasto(gastos, usuario, id_gasto=None):
+    """Edita o gasto `id_gasto` ou, sem ele, o que o usuário escolher na lista."""
     limpar_tela()
     print("=== EDITAR GASTO ===")
 
@@ -455,16 +3639,19 @@ def editar_gasto(gastos, usuario):
         print("\nNenhum gasto para editar.")
         return
 
-    listar_gastos(gastos)
-
-    idx = pedir_indice_gasto(len(gastos))
-    if idx is None:
+    if id_gasto is None:
+        id_gasto = paginar_gastos(gastos, titulo="EDITAR GASTO", selecionar=True)
+    if id_gasto is None:
         print("\nEdição cancelada.")
         return
+    if not gastos.tem_id(id_gasto):
+        print(f"\nGasto #{id_gasto} não encontrado.")
+        return
 
-    g = gastos[idx]
+    g = gastos.gasto_por_id(id_gasto)
+    anterior = dict(g)
     print("\nGasto selecionado:")
-    print(formatar_gasto(idx + 1, g))
+    print(formatar_gasto(None, g))
 
     print("\nO que deseja editar?")
     print("1 - Descrição")
@@ -499,12 +3686,14 @@ def editar_gasto(gastos, usuario):
         print("\nOpção inválida.")
         return
 
-    salvar_gastos(gastos, usuario)
+    gastos.editar_por_id(id_gasto, g)
+    registrar_alteracao(gastos, usuario, "edit", id_gasto=id_gasto, gasto=g, anterior=anterior)
     print("\n✅ Gasto atualizado:")
-    print(formatar_gasto(idx + 1, g))
+    print(formatar_gasto(None, g))
 
 
-def remover_gasto(gastos, usuario):
+def remover_gasto(gastos, usuario, id_gasto=None):
+    """Remove o gasto `id_gasto` ou, sem ele, o que o usuário escolher na lista."""
     limpar_tela()
     print("=== REMOVER GASTO ===")
 
@@ -512,15 +3701,17 @@ def remover_gasto(gastos, usuario):
         print("\nNenhum gasto para remover.")
         return
 
-    listar_gastos(gastos)
-
-    idx = pedir_indice_gasto(len(gastos))
-    if idx is None:
+    if id_gasto is None:
+        id_gasto = paginar_gastos(gastos, titulo="REMOVER GASTO", selecionar=True)
+    if id_gasto is None:
         print("\nRemoção cancelada.")
         return
+    if not gastos.tem_id(id_gasto):
+        print(f"\nGasto #{id_gasto} não encontrado.")
+        return
 
-    removido = gastos.pop(idx)
-    salvar_gastos(gastos, usuario)
+    removido = gastos.remover_por_id(id_gasto)
+    registrar_alteracao(gastos, usuario, "del", id_gasto=id_gasto, anterior=removido)
 
     print("\n✅ Gasto removido:")
     print(
@@ -531,6 +3722,22 @@ def remover_gasto(gastos, usuario):
     )
 
 
+def editar_ou_remover_da_lista(gastos, usuario):
+    """Depois de uma listagem, edita ou remove um gasto pelo #id mostrado nela."""
+    op = input("\ne #id editar | r #id remover | Enter voltar\n> ").strip().lower()
+    if not op:
+        return
+    alvo = op[1:].strip().lstrip("#")
+    if op[0] in ("e", "r") and alvo.isdigit():
+        if op[0] == "e":
+            editar_gasto(gastos, usuario, int(alvo))
+        else:
+            remover_gasto(gastos, usuario, int(alvo))
+    else:
+        print("\nOpção inválida.")
+    pausar()
+
+
 # ====================
 # Menus
 # ====================
@@ -542,19 +3749,22 @@ def menu_dados(gastos, usuario):
         print("1 - Salvar agora")
         print("2 - Recarregar do arquivo")
         print("3 - Limpar todos os dados")
+        print("4 - Verificar/reconstruir resumos")
+        print("5 - Importar extrato (CSV/OFX/JSON)")
         print("0 - Voltar")
 
         op = input("\n> ").strip()
 
         if op == "1":
-            salvar_gastos(gastos, usuario)
-            print("\n✅ Dados salvos.")
+            if salvar_gastos(gastos, usuario):
+                print("\n✅ Dados salvos.")
+            else:
+                print("\n✅ Nada mudou desde a última gravação.")
             pausar()
 
         elif op == "2":
-            novos = carregar_gastos(usuario)
-            gastos.clear()
-            gastos.extend(novos)
+            gravar_pendentes()
+            recarregar_gastos(gastos, usuario)
             print("\n✅ Dados recarregados do arquivo.")
             pausar()
 
@@ -562,12 +3772,37 @@ def menu_dados(gastos, usuario):
             conf = input("\nTem certeza? (digite APAGAR para confirmar): ").strip()
             if conf == "APAGAR":
                 gastos.clear()
-                salvar_gastos(gastos, usuario)
+                registrar_alteracao(gastos, usuario, "clear")
                 print("\n✅ Tudo apagado.")
             else:
                 print("\nCancelado.")
             pausar()
 
+        elif op == "4":
+            # Na SQLite os resumos são sempre calculados das linhas.
+            if isinstance(gastos, GastosSQLite) or gastos.verificar_agregados(agregados_paralelos(gastos)):
+                print("\n✅ Resumos consistentes com os gastos.")
+            else:
+                print("\n⚠️ Resumos estavam divergentes e foram reconstruídos.")
+            pausar()
+
+        elif op == "5":
+            caminho = input("\nArquivo do extrato: ").strip()
+            categoria = input(f"Categoria para lançamentos sem categoria [{CATEGORIA_PADRAO_IMPORT}]: ").strip()
+            try:
+                importados, erros, quarentena, ignorados = importar_extrato(
+                    gastos, usuario, caminho, categoria_padrao=categoria or CATEGORIA_PADRAO_IMPORT
+                )
+            except (OSError, UnicodeDecodeError, json.JSONDecodeError) as e:
+                print(f"\n⚠️ Não foi possível importar: {e}")
+            else:
+                print(f"\n✅ {importados} gasto(s) importado(s), {len(erros)} linha(s) rejeitada(s).")
+                if ignorados:
+                    print(f"{ignorados} crédito(s) ignorado(s) (não são gastos).")
+                if quarentena:
+                    print(f"Linhas rejeitadas (com número da linha) em {quarentena}")
+            pausar()
+
         elif op == "0":
             return
 
@@ -576,14 +3811,14 @@ def menu_dados(gastos, usuario):
             pausar()
 
 
-def menu_listagem(gastos):
+def menu_listagem(gastos, usuario):
     while True:
         limpar_tela()
         print("=== LISTAGEM / FILTROS / ORDENAR ===\n")
         print("1 - Listar tudo")
         print("2 - Listar por mês (YYYY-MM)")
         print("3 - Listar por intervalo de datas (YYYY-MM-DD)")
-        print("4 - Ordenar (data/valor/categoria/descricao)")
+        print("4 - Ordenar (data/valor/categoria/descricao, um ou mais campos)")
         print("0 - Voltar")
 
         op = input("\n> ").strip()
@@ -591,38 +3826,50 @@ def menu_listagem(gastos):
         if op == "1":
             limpar_tela()
             listar_gastos(gastos)
-            pausar()
+            editar_ou_remover_da_lista(gastos, usuario)
 
         elif op == "2":
             mes = input("\nMês (YYYY-MM): ").strip()
-            filtrados = filtrar_por_mes(gastos, mes)
+            filtrados = iterar_por_mes(gastos, mes)
             limpar_tela()
             listar_gastos(filtrados)
-            pausar()
+            editar_ou_remover_da_lista(gastos, usuario)
 
         elif op == "3":
             di = pedir_data_obrigatoria("\nData inicial (YYYY-MM-DD): ")
             df = pedir_data_obrigatoria("Data final (YYYY-MM-DD): ")
-            filtrados = filtrar_por_intervalo(gastos, di, df)
+            filtrados = iterar_por_intervalo(gastos, di, df)
             limpar_tela()
             listar_gastos(filtrados)
-            pausar()
+            editar_ou_remover_da_lista(gastos, usuario)
 
         elif op == "4":
-            chave = input("\nOrdenar por (data/valor/categoria/descricao): ").strip().lower()
-            if chave not in ("data", "valor", "categoria", "descricao"):
-                print("Chave inválida.")
+            print("\nCampos: data, valor, categoria, descricao. Para vários, separe por vírgula;")
+            print("'-' antes do campo ordena do maior para o menor (ex.: categoria,-data,valor).")
+            texto = input("Ordenar por: ").strip()
+            try:
+                criterios = interpretar_ordem(texto)
+            except ValueError as e:
+                print(f"Ordenação inválida: {e}")
                 pausar()
                 continue
 
-            sentido = input("Ordem (cresc/desc): ").strip().lower()
-            reverso = (sentido == "desc")
+            # Com '-' o sentido já foi dado; perguntar de novo inverteria duas vezes.
+            if len(criterios) == 1 and not texto.startswith("-"):
+                sentido = input("Ordem (cresc/desc): ").strip().lower()
+                criterios = interpretar_ordem(criterios, reverso=(sentido == "desc"))
+
+            limite = input("Mostrar só os N primeiros (Enter = todos): ").strip()
+            if limite and not (limite.isdigit() and int(limite) > 0):
+                print("Quantidade inválida.")
+                pausar()
+                continue
 
-            ordenados = ordenar_gastos(gastos, chave, reverso=reverso)
+            ordenados = ordenar_gastos(gastos, criterios, limite=int(limite) if limite else None)
 
             limpar_tela()
             listar_gastos(ordenados)
-            pausar()
+            editar_ou_remover_da_lista(gastos, usuario)
 
         elif op == "0":
             return
@@ -632,7 +3879,7 @@ def menu_listagem(gastos):
             pausar()
 
 
-def menu_busca(gastos):
+def menu_busca(gastos, usuario):
     while True:
         limpar_tela()
         print("=== BUSCA ===\n")
@@ -649,7 +3896,7 @@ def menu_busca(gastos):
             limpar_tela()
             listar_gastos(achados)
             mostrar_resumo(achados, titulo="Resumo da busca")
-            pausar()
+            editar_ou_remover_da_lista(gastos, usuario)
 
         elif op == "2":
             cat = input("\nCategoria: ").strip()
@@ -657,7 +3904,7 @@ def menu_busca(gastos):
             limpar_tela()
             listar_gastos(achados)
             mostrar_resumo(achados, titulo="Resumo da busca")
-            pausar()
+            editar_ou_remover_da_lista(gastos, usuario)
 
         elif op == "3":
             termo = input("\nPalavra (descrição): ").strip()
@@ -666,7 +3913,7 @@ def menu_busca(gastos):
             limpar_tela()
             listar_gastos(achados)
             mostrar_resumo(achados, titulo="Resumo da busca")
-            pausar()
+            editar_ou_remover_da_lista(gastos, usuario)
 
         elif op == "0":
             return
@@ -683,6 +3930,8 @@ def menu_resumo(gastos):
         print("1 - Resumo geral")
         print("2 - Resumo por mês (YYYY-MM)")
         print("3 - Resumo por intervalo de datas (YYYY-MM-DD)")
+        print("4 - Evolução mês a mês (médias móveis e comparações)")
+        print("5 - Evolução semana a semana")
         print("0 - Voltar")
 
         op = input("\n> ").strip()
@@ -694,9 +3943,9 @@ def menu_resumo(gastos):
 
         elif op == "2":
             mes = input("\nMês (YYYY-MM): ").strip()
-            filtrados = filtrar_por_mes(gastos, mes)
+            resumo = calcular_resumo_do_mes(gastos, mes)
             limpar_tela()
-            mostrar_resumo(filtrados, titulo=f"Resumo do mês {mes}")
+            mostrar_resumo(None, titulo=f"Resumo do mês {mes}", resumo=resumo)
             pausar()
 
         elif op == "3":
@@ -707,6 +3956,21 @@ def menu_resumo(gastos):
             mostrar_resumo(filtrados, titulo=f"Resumo {di} até {df}")
             pausar()
 
+        elif op in ("4", "5"):
+            por = "mes" if op == "4" else "semana"
+            categoria = input("\nCategoria (Enter = todas): ").strip() or None
+            ultimos = input("Quantos períodos mostrar (Enter = 12): ").strip()
+            if ultimos and not (ultimos.isdigit() and int(ultimos) > 0):
+                print("\nDigite um número maior que zero.")
+                pausar()
+                continue
+            linhas = relatorio_por_periodo(gastos, por, categoria, int(ultimos or 12))
+            limpar_tela()
+            titulo = "mês a mês" if por == "mes" else "semana a semana"
+            print(f"=== Evolução {titulo}{f' — {categoria}' if categoria else ''} ===\n")
+            print(texto_relatorio_por_periodo(linhas, por))
+            pausar()
+
         elif op == "0":
             return
 
@@ -728,26 +3992,21 @@ def menu_exportar(gastos):
         op = input("\n> ").strip()
 
         if op == "1":
-            exportar_csv(gastos, ARQUIVO_EXPORT)
-            print(f"\n✅ Exportado para {ARQUIVO_EXPORT}")
+            exportar_com_progresso(gastos, ARQUIVO_EXPORT)
             pausar()
 
         elif op == "2":
             mes = input("\nMês (YYYY-MM): ").strip()
-            filtrados = filtrar_por_mes(gastos, mes)
             nome = f"gastos_{mes}.csv"
-            exportar_csv(filtrados, nome)
-            print(f"\n✅ Exportado para {nome}")
+            exportar_com_progresso(iterar_por_mes(gastos, mes), nome)
             pausar()
 
         elif op == "3":
             di = pedir_data_obrigatoria("\nData inicial (YYYY-MM-DD): ")
             df = pedir_data_obrigatoria("Data final (YYYY-MM-DD): ")
-            filtrados = filtrar_por_intervalo(gastos, di, df)
             nome = f"gastos_{di}_ate_{df}.csv".replace("-", "")
             nome = f"{nome}.csv"
-            exportar_csv(filtrados, nome)
-            print(f"\n✅ Exportado para {nome}")
+            exportar_com_progresso(iterar_por_intervalo(gastos, di, df), nome)
             pausar()
 
         elif op == "0":
@@ -758,11 +4017,722 @@ def menu_exportar(gastos):
             pausar()
 
 
+def exportar_com_progresso(gastos, nome):
+    compactar = input("Compactar com gzip? (s/N): ").strip().lower() in ("s", "sim")
+    if compactar:
+        nome = f"{nome}.gz"
+    print()
+    total = exportar_csv(gastos, nome, compactar=compactar, progresso=mostrar_progresso_export)
+    print(f"\n\n✅ {total} gasto(s) exportado(s) para {nome}")
+
+
+# ===================
+# CLI (sem menus)
+# ===================
+
+# `python main.py <comando> ...` roda uma operação e sai, sem input(),
+# limpar_tela() ou pausar(). Com --json a saída é legível por máquina. O
+# código de saída é 0 em sucesso, 1 em erro (login, validação, arquivo ou
+# linhas rejeitadas no import) e 2 para uso incorreto (argparse).
+
+class ErroCLI(Exception):
+    pass
+
+
+def criar_parser_cli():
+    parser = argparse.ArgumentParser(prog="main.py", description="Gerenciador de gastos sem menus interativos.")
+    parser.add_argument("--usuario", required=True)
+    parser.add_argument("--senha", default=os.environ.get("GASTOS_SENHA"),
+                        help="senha do usuário (padrão: variável GASTOS_SENHA)")
+    parser.add_argument("--json", action="store_true", help="saída em JSON")
+    parser.add_argument("--perfil", action="store_true",
+                        help="mede as operações e mostra um relatório no stderr (como GASTOS_PERFIL=1)")
+    parser.add_argument("--servidor", metavar="ENDERECO",
+                        help="envia o comando a um servidor (python main.py serve) em host:porta ou unix:/caminho")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p = sub.add_parser("add", help="adiciona um gasto")
+    p.add_argument("--descricao", default="")
+    p.add_argument("--categoria", default="")
+    p.add_argument("--valor", required=True)
+    p.add_argument("--data")
+
+    p = sub.add_parser("edit", help="altera um gasto pelo id")
+    p.add_argument("id", type=int)
+    p.add_argument("--descricao")
+    p.add_argument("--categoria")
+    p.add_argument("--valor")
+    p.add_argument("--data")
+
+    p = sub.add_parser("remove", help="remove um gasto pelo id")
+    p.add_argument("id", type=int)
+
+    p = sub.add_parser("import", help="importa extrato CSV (;), OFX ou JSON")
+    p.add_argument("arquivo", nargs="?", default="-", help="arquivo de entrada ('-' = stdin)")
+    p.add_argument("--formato", choices=tuple(LEITORES_EXTRATO), help="padrão: pela extensão do arquivo")
+    p.add_argument("--categoria-padrao", default=CATEGORIA_PADRAO_IMPORT,
+                   help="categoria para registros sem categoria")
+
+    def filtros(p):
+        p.add_argument("--mes", help="YYYY-MM")
+        p.add_argument("--de", help="data inicial YYYY-MM-DD")
+        p.add_argument("--ate", help="data final YYYY-MM-DD")
+
+    p = sub.add_parser("list", help="lista gastos")
+    filtros(p)
+    p.add_argument("--busca", help="palavra na descrição")
+    p.add_argument("--categoria")
+    p.add_argument("--ordenar", metavar="CAMPOS",
+                   help="data, valor, categoria ou descricao; vários separados por vírgula, "
+                        "'-' para decrescente (ex.: --ordenar=-valor ou categoria,-data,valor)")
+    p.add_argument("--desc", action="store_true", help="ordem decrescente")
+    p.add_argument("--limite", type=int, help="mostra só os N primeiros")
+
+    p = sub.add_parser("summary", help="resumo de totais")
+    filtros(p)
+    p.add_argument("--processos", type=int, metavar="N",
+                   help="recalcula o resumo a partir dos gastos em N processos (0 = todos os núcleos)")
+
+    p = sub.add_parser("report", help="evolução mês a mês (ou semana a semana) com médias e comparações")
+    p.add_argument("--por", choices=("mes", "semana"), default="mes")
+    p.add_argument("--categoria")
+    p.add_argument("--ultimos", type=int, metavar="N", help="só os N últimos períodos")
+
+    p = sub.add_parser("admin-report", help="resumo de todos os usuários (requer usuário admin)")
+    p.add_argument("--processos", type=int, metavar="N",
+                   help=f"arquivos carregados ao mesmo tempo (padrão: até {MAXIMO_PROCESSOS_RELATORIO})")
+
+    p = sub.add_parser("convert", help="converte o snapshot entre JSON e binário ou muda o formato do JSON")
+    p.add_argument("--para", choices=("binario", "json"))
+    p.add_argument("--formato", choices=("compacto", "legado"),
+                   help="formato do JSON; sem --para, regrava o JSON atual e o usuarios.json")
+
+    p = sub.add_parser("export", help="exporta CSV")
+    filtros(p)
+    p.add_argument("--saida", default=ARQUIVO_EXPORT)
+    p.add_argument("--gzip", action="store_true")
+
+    return parser
+
+
+def autenticar_cli(usuario, senha):
+    registro = carregar_usuarios().get(usuario)
+    if not registro or senha is None or registro.get("senha_hash") != hash_senha(senha):
+        raise ErroCLI("usuário ou senha inválidos")
+
+
+def selecionar_cli(gastos, args):
+    """Aplica --mes ou --de/--ate e devolve um iterável de gastos."""
+    if args.mes:
+        return iterar_por_mes(gastos, args.mes)
+    if args.de or args.ate:
+        if not (args.de and args.ate and validar_data_yyyy_mm_dd(args.de) and validar_data_yyyy_mm_dd(args.ate)):
+            raise ErroCLI("--de e --ate precisam ser datas YYYY-MM-DD")
+        return iterar_por_intervalo(gastos, args.de, args.ate)
+    return gastos
+
+
+def executar_cli(args):
+    autenticar_cli(args.usuario, args.senha)
+
+    if args.comando == "admin-report":
+        if not carregar_usuarios()[args.usuario].get("admin"):
+            raise ErroCLI("o relatório administrativo exige um usuário com \"admin\": true em usuarios.json")
+        if args.processos is not None and args.processos < 1:
+            raise ErroCLI("--processos precisa ser 1 ou mais")
+        relatorio = relatorio_administrativo(args.processos)
+        return relatorio, texto_relatorio_administrativo(relatorio)
+
+    if args.comando == "convert":
+        if not (args.para or args.formato):
+            raise ErroCLI("informe --para e/ou --formato")
+        with contextlib.redirect_stdout(sys.stderr):
+            if args.para == "binario":
+                total = converter_json_para_binario(args.usuario)
+            elif args.para == "json":
+                total = converter_binario_para_json(args.usuario, args.formato)
+            else:
+                try:
+                    total = converter_formato_json(args.usuario, args.formato)
+                except ValueError as e:
+                    raise ErroCLI(f"não foi possível ler os gastos: {e}") from None
+        destino = " ".join(filter(None, (args.para, args.formato)))
+        return {"convertidos": total, "formato": destino}, f"✅ {total} gasto(s) convertidos para {destino}."
+
+    # Avisos de carga vão para stderr para não misturar com a saída.
+    with contextlib.redirect_stdout(sys.stderr):
+        gastos = carregar_gastos(args.usuario)
+    return executar_comando(gastos, args)
+
+
+def executar_comando(gastos, args, registrar=None):
+    """Executa um comando da CLI sobre gastos já carregados.
+
+    `registrar` substitui registrar_alteracao (o servidor adia a gravação).
+    Devolve (resultado para JSON, texto).
+    """
+    registrar = registrar or registrar_alteracao
+
+    if args.comando == "add":
+        try:
+            gasto = validar_gasto(vars(args))
+        except ValueError as e:
+            raise ErroCLI(str(e))
+        gastos.append(gasto)
+        registrar(gastos, args.usuario, "add", gasto=gasto)
+        return {"adicionados": 1, "id": gasto["id"]}, f"✅ Gasto registrado: {formatar_gasto(len(gastos), gasto)}"
+
+    if args.comando in ("edit", "remove") and not gastos.tem_id(args.id):
+        raise ErroCLI(f"gasto #{args.id} não encontrado")
+
+    if args.comando == "edit":
+        alterados = {campo: getattr(args, campo) for campo in ("descricao", "categoria", "valor", "data")
+                     if getattr(args, campo) is not None}
+        gasto = gastos.gasto_por_id(args.id)
+        anterior = dict(gasto)
+        try:
+            validados = validar_gasto({"valor": gasto["valor"], **alterados})
+        except ValueError as e:
+            raise ErroCLI(str(e))
+        gasto.update((campo, validados[campo]) for campo in alterados)
+        gastos.editar_por_id(args.id, gasto)
+        registrar(gastos, args.usuario, "edit", id_gasto=args.id, gasto=gasto, anterior=anterior)
+        return gasto, f"✅ Gasto atualizado: {formatar_gasto(None, gasto)}"
+
+    if args.comando == "remove":
+        removido = gastos.remover_por_id(args.id)
+        registrar(gastos, args.usuario, "del", id_gasto=args.id, anterior=removido)
+        return removido, f"✅ Gasto removido: {formatar_gasto(None, removido)}"
+
+    if args.comando == "import":
+        try:
+            importados, erros, quarentena, ignorados = importar_extrato(
+                gastos, args.usuario, args.arquivo, args.formato, args.categoria_padrao
+            )
+        except UnicodeDecodeError as e:
+            raise ErroCLI(f"codificação inválida em {args.arquivo}: {e.reason}")
+        texto = f"✅ {importados} gasto(s) importado(s), {len(erros)} rejeitado(s)."
+        if ignorados:
+            texto += f" {ignorados} crédito(s) ignorado(s)."
+        texto += "".join(f"\n- linha {e['linha']}: {e['erro']}" for e in erros[:20])
+        if quarentena:
+            texto += f"\nLinhas rejeitadas em {quarentena}"
+        erros_json = [{"linha": e["linha"], "erro": e["erro"]} for e in erros]
+        return {"adicionados": importados, "erros": erros_json, "quarentena": quarentena,
+                "ignorados": ignorados}, texto
+
+    if args.comando == "list":
+        if args.limite is not None and args.limite < 1:
+            raise ErroCLI("--limite precisa ser 1 ou mais")
+        selecionados = selecionar_cli(gastos, args)
+        if args.busca or args.categoria:
+            if selecionados is not gastos:
+                selecionados = list(selecionados)
+            selecionados = buscar_gastos(selecionados, termo=args.busca, categoria=args.categoria)
+        if args.ordenar:
+            try:
+                # Sem filtros, a ordenação roda na própria tabela (chaves em cache).
+                achados = ordenar_gastos(selecionados, args.ordenar, reverso=args.desc, limite=args.limite)
+            except ValueError as e:
+                raise ErroCLI(str(e)) from None
+        else:
+            achados = list(islice(selecionados, args.limite))
+        texto = "\n".join(formatar_gasto(i, g) for i, g in enumerate(achados, start=1)) or "Nenhum gasto registrado."
+        return achados, texto
+
+    if args.comando == "summary":
+        selecionados = selecionar_cli(gastos, args)
+        if args.processos is not None:
+            if args.processos < 0:
+                raise ErroCLI("--processos precisa ser 0 ou mais")
+            if selecionados is not gastos:
+                selecionados = GastosTable(selecionados)
+            qtd, total, por_categoria = resumo_paralelo(selecionados, args.processos or None)
+        else:
+            qtd, total, por_categoria = calcular_resumo(selecionados if selecionados is gastos else list(selecionados))
+        por_categoria = sorted(por_categoria.items(), key=lambda x: x[1], reverse=True)
+        resultado = {
+            "quantidade": qtd,
+            "total": reais(total),
+            "media": reais(media_em_centavos(total, qtd)) if qtd else 0,
+            "por_categoria": {cat: reais(val) for cat, val in por_categoria},
+        }
+        texto = "\n".join([f"Quantidade de gastos: {qtd}", f"Total geral: R$ {formatar_centavos(total)}"] +
+                          [f"- {cat}: R$ {formatar_centavos(val)}" for cat, val in por_categoria])
+        return resultado, texto
+
+    if args.comando == "report":
+        if args.ultimos is not None and args.ultimos < 1:
+            raise ErroCLI("--ultimos precisa ser 1 ou mais")
+        linhas = relatorio_por_periodo(gastos, args.por, args.categoria, args.ultimos)
+        return [linha_em_reais(linha) for linha in linhas], texto_relatorio_por_periodo(linhas, args.por)
+
+    if args.comando == "export":
+        saida = args.saida + (".gz" if args.gzip and not args.saida.endswith(".gz") else "")
+        total = exportar_csv(selecionar_cli(gastos, args), saida, compactar=args.gzip)
+        return {"arquivo": saida, "linhas": total}, f"✅ {total} gasto(s) exportado(s) para {saida}"
+
+    raise ErroCLI(f"comando desconhecido: {args.comando}")
+
+
+def main_cli(argv):
+    if argv[:1] == ["serve"]:
+        return main_servidor(argv[1:])
+    args = criar_parser_cli().parse_args(argv)
+    if args.perfil:
+        ativar_instrumentacao()
+    try:
+        if args.servidor:
+            resultado, texto = executar_no_servidor(args)
+        else:
+            resultado, texto = executar_cli(args)
+    except (ErroCLI, ConflitoDeVersao, OSError, json.JSONDecodeError) as e:
+        if args.json:
+            print(json.dumps({"erro": str(e)}, ensure_ascii=False))
+        else:
+            print(f"Erro: {e}", file=sys.stderr)
+        return 1
+
+    if args.json:
+        print(json.dumps(resultado, ensure_ascii=False))
+    else:
+        print(texto)
+    # Import com linhas rejeitadas grava as válidas, mas sinaliza falha.
+    return 1 if isinstance(resultado, dict) and resultado.get("erros") else 0
+
+
+# ===================
+# Servidor (asyncio)
+# ===================
+
+# `python main.py serve` atende várias sessões num único event loop, por
+# TCP ou socket Unix, com um JSON por linha em cada sentido:
+#
+#   -> {"comando": "login", "usuario": "Dante", "senha": "1234"}
+#   <- {"ok": true, "resultado": {"usuario": "Dante"}}
+#   -> {"comando": "list", "mes": "2026-02", "ordenar": "-valor"}
+#   <- {"ok": true, "resultado": [...], "texto": "..."}
+#   -> {"comando": "sair"}
+#
+# Os campos de cada comando são os da CLI (o nome do destino no argparse,
+# como "categoria_padrao"); erros voltam como {"ok": false, "erro": "..."}.
+# Os gastos de cada usuário ficam em memória, e as alterações vão para o
+# journal em lote a cada INTERVALO_GRAVACAO_SERVIDOR segundos (e ao
+# encerrar o servidor). Cada comando roda numa thread (asyncio.to_thread)
+# com a trava do usuário: sessões de usuários diferentes andam em paralelo,
+# as do mesmo usuário uma de cada vez. Por isso o summary não aceita
+# "processos" (não se faz fork a partir dessas threads).
+# No export, só o nome do arquivo pedido é usado (ver saida_no_servidor).
+
+COMANDOS_SERVIDOR = ("add", "edit", "remove", "list", "summary", "report", "export")
+CAMPOS_RECUSADOS_SERVIDOR = ("processos",)
+
+
+@lru_cache(maxsize=None)
+def acoes_do_comando(comando):
+    """destino -> ação do argparse para as opções de um subcomando da CLI."""
+    subcomandos = next(
+        acao for acao in criar_parser_cli()._actions if isinstance(acao, argparse._SubParsersAction)
+    )
+    return {acao.dest: acao for acao in subcomandos.choices[comando]._actions if acao.dest != "help"}
+
+
+def argumentos_da_requisicao(usuario, requisicao):
+    """Namespace igual ao da CLI para um pedido recebido pelo servidor."""
+    comando = requisicao.get("comando")
+    if comando not in COMANDOS_SERVIDOR:
+        raise ErroCLI(f"comando desconhecido: {comando}")
+    acoes = acoes_do_comando(comando)
+    desconhecidos = set(requisicao) - set(acoes) - {"comando"}
+    if desconhecidos:
+        raise ErroCLI(f"campo(s) desconhecido(s) para {comando}: {', '.join(sorted(desconhecidos))}")
+    recusados = [campo for campo in CAMPOS_RECUSADOS_SERVIDOR if requisicao.get(campo) is not None]
+    if recusados:
+        raise ErroCLI(f"{comando}: {', '.join(recusados)} não é atendido pelo servidor")
+
+    args = argparse.Namespace(comando=comando, usuario=usuario)
+    for destino, acao in acoes.items():
+        valor = requisicao.get(destino, acao.default)
+        if valor is None and acao.required:
+            raise ErroCLI(f"{comando}: o campo {destino} é obrigatório")
+        if isinstance(acao, argparse._StoreTrueAction):
+            valor = bool(valor)
+        elif valor is not None:
+            try:
+                valor = acao.type(valor) if acao.type else str(valor)
+            except (TypeError, ValueError):
+                raise ErroCLI(f"{comando}: valor inválido para {destino}: {valor!r}") from None
+            if acao.choices and valor not in acao.choices:
+                raise ErroCLI(f"{comando}: {destino} precisa ser um de {', '.join(acao.choices)}")
+        setattr(args, destino, valor)
+    return args
+
+
+def saida_no_servidor(usuario, saida):
+    """Caminho do export de `usuario` no servidor: o nome pedido, sem pastas,
+    com prefixo fixo, dentro de PASTA_EXPORT_SERVIDOR/<usuario>."""
+    nome = os.path.basename(saida.replace("\\", "/")) or ARQUIVO_EXPORT
+    if not nome.endswith((".csv", ".csv.gz")):
+        nome += ".csv"
+    pasta = os.path.join(PASTA_EXPORT_SERVIDOR, usuario)
+    os.makedirs(pasta, exist_ok=True)
+    return os.path.join(pasta, "export_" + nome)
+
+
+class ServidorGastos:
+    def __init__(self, intervalo_gravacao=INTERVALO_GRAVACAO_SERVIDOR):
+        self.intervalo_gravacao = intervalo_gravacao
+        self.tabelas = {}
+        # Com intervalo, a fila só grava quando o gravador chama gravar();
+        # sem ele, cada alteração já é gravada por registrar().
+        self.fila = FilaDeGravacao("saida" if intervalo_gravacao else "imediata")
+        # Os comandos rodam em threads (fora do event loop); a trava de cada
+        # usuário impede dois comandos, ou um comando e o gravador, de
+        # mexerem na mesma tabela ao mesmo tempo.
+        self.travas = {}
+
+    def trava_do_usuario(self, usuario):
+        return self.travas.setdefault(usuario, threading.Lock())
+
+    def gastos_do_usuario(self, usuario):
+        gastos = self.tabelas.get(usuario)
+        if gastos is not None and not self.fila.tem_pendentes(usuario) \
+                and gastos.versao_arquivo is not None \
+                and versao_em_disco(usuario) != gastos.versao_arquivo[1:]:
+            # Outro processo (a CLI, por exemplo) gravou nos arquivos.
+            gastos = None
+        if gastos is None:
+            with contextlib.redirect_stdout(sys.stderr):
+                gastos = self.tabelas[usuario] = carregar_gastos(usuario)
+        return gastos
+
+    def gravar_pendentes(self):
+        for usuario in list(self.fila.pendentes):
+            with self.trava_do_usuario(usuario):
+                self.fila.gravar(usuario)
+
+    async def gravador(self):
+        while True:
+            await asyncio.sleep(self.intervalo_gravacao)
+            try:
+                await asyncio.to_thread(self.gravar_pendentes)
+            except OSError as e:
+                print(f"⚠️ Falha ao gravar alterações: {e}", file=sys.stderr)
+
+    def responder(self, sessao, requisicao):
+        comando = requisicao.get("comando")
+        if comando == "login":
+            usuario = requisicao.get("usuario")
+            autenticar_cli(usuario, requisicao.get("senha"))
+            sessao["usuario"] = usuario
+            with self.trava_do_usuario(usuario):
+                self.gastos_do_usuario(usuario)
+            return {"ok": True, "resultado": {"usuario": usuario}}
+        if sessao.get("usuario") is None:
+            raise ErroCLI("faça login primeiro")
+        usuario = sessao["usuario"]
+        args = argumentos_da_requisicao(usuario, requisicao)
+        if args.comando == "export":
+            args.saida = saida_no_servidor(usuario, args.saida)
+        with self.trava_do_usuario(usuario):
+            resultado, texto = executar_comando(self.gastos_do_usuario(usuario), args, self.fila.registrar)
+        return {"ok": True, "resultado": resultado, "texto": texto}
+
+    async def atender(self, leitor, escritor):
+        sessao = {}
+        try:
+            while True:
+                linha = await leitor.readline()
+                if not linha:
+                    break
+                try:
+                    requisicao = json.loads(linha)
+                    if not isinstance(requisicao, dict):
+                        raise ErroCLI("cada pedido precisa ser um objeto JSON")
+                    if requisicao.get("comando") == "sair":
+                        break
+                    resposta = await asyncio.to_thread(self.responder, sessao, requisicao)
+                except json.JSONDecodeError:
+                    resposta = {"ok": False, "erro": "pedido não é JSON válido"}
+                except Exception as e:  # um pedido ruim não derruba o servidor
+                    resposta = {"ok": False, "erro": str(e) or type(e).__name__}
+                escritor.write((json.dumps(resposta, ensure_ascii=False) + "\n").encode("utf-8"))
+                await escritor.drain()
+        except (ConnectionError, ValueError):
+            # Cliente caiu, ou mandou uma linha maior que LIMITE_LINHA_PROTOCOLO.
+            pass
+        finally:
+            escritor.close()
+
+
+async def abrir_conexao(endereco):
+    if endereco.startswith("unix:"):
+        return await asyncio.open_unix_connection(endereco[5:], limit=LIMITE_LINHA_PROTOCOLO)
+    host, _, porta = endereco.rpartition(":")
+    return await asyncio.open_connection(host or "127.0.0.1", int(porta), limit=LIMITE_LINHA_PROTOCOLO)
+
+
+async def servir(endereco, intervalo_gravacao):
+    servidor = ServidorGastos(intervalo_gravacao)
+    if endereco.startswith("unix:"):
+        escuta = await asyncio.start_unix_server(servidor.atender, endereco[5:], limit=LIMITE_LINHA_PROTOCOLO)
+    else:
+        host, _, porta = endereco.rpartition(":")
+        escuta = await asyncio.start_server(servidor.atender, host or "127.0.0.1", int(porta),
+                                            limit=LIMITE_LINHA_PROTOCOLO)
+
+    tarefa = asyncio.current_task()
+    with contextlib.suppress(NotImplementedError):  # Windows
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, tarefa.cancel)
+    # Com intervalo 0 cada alteração é gravada na hora; não há o que esperar.
+    gravador = asyncio.create_task(servidor.gravador()) if intervalo_gravacao > 0 else None
+    print(f"Servidor de gastos em {endereco} (Ctrl+C encerra)", file=sys.stderr)
+    try:
+        async with escuta:
+            await escuta.serve_forever()
+    finally:
+        if gravador is not None:
+            gravador.cancel()
+        servidor.gravar_pendentes()
+        print("Alterações gravadas; servidor encerrado.", file=sys.stderr)
+
+
+def main_servidor(argv):
+    parser = argparse.ArgumentParser(prog="main.py serve", description="Servidor de gastos para várias sessões.")
+    parser.add_argument("--endereco", default=ENDERECO_SERVIDOR, help="host:porta ou unix:/caminho")
+    parser.add_argument("--intervalo", type=float, default=INTERVALO_GRAVACAO_SERVIDOR,
+                        help="segundos entre gravações do journal (0 = grava a cada alteração)")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(servir(args.endereco, args.intervalo))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+    return 0
+
+
+async def conversar_com_servidor(endereco, requisicoes):
+    """Envia os pedidos em ordem e devolve as respostas; para no primeiro erro."""
+    leitor, escritor = await abrir_conexao(endereco)
+    respostas = []
+    try:
+        for requisicao in requisicoes:
+            escritor.write((json.dumps(requisicao, ensure_ascii=False) + "\n").encode("utf-8"))
+            await escritor.drain()
+            linha = await leitor.readline()
+            if not linha:
+                raise ErroCLI("o servidor encerrou a conexão")
+            respostas.append(json.loads(linha))
+            if not respostas[-1].get("ok"):
+                break
+    finally:
+        escritor.close()
+    return respostas
+
+
+def executar_no_servidor(args):
+    if args.comando not in COMANDOS_SERVIDOR:
+        raise ErroCLI(f"o comando {args.comando} não é atendido pelo servidor")
+    requisicao = {"comando": args.comando}
+    requisicao.update((destino, getattr(args, destino)) for destino in acoes_do_comando(args.comando))
+    respostas = asyncio.run(conversar_com_servidor(args.servidor, [
+        {"comando": "login", "usuario": args.usuario, "senha": args.senha},
+        requisicao,
+    ]))
+    if not respostas[-1].get("ok"):
+        raise ErroCLI(respostas[-1].get("erro"))
+    return respostas[-1]["resultado"], respostas[-1]["texto"]
+
+
+# ===================
+# Instrumentação
+# ===================
+
+# Com GASTOS_PERFIL=1 (ou --perfil na linha de comando) as funções de
+# FUNCOES_INSTRUMENTADAS são trocadas, no namespace do módulo, por versões
+# que medem tempo e linhas; `open` e `datetime.strptime` passam a contar
+# bytes e chamadas. Ao sair, o relatório vai para o stderr, e com
+# GASTOS_PERFIL_PSTATS=<arquivo> a sessão também é gravada pelo cProfile.
+# Desligado, nada é trocado.
+
+FUNCOES_INSTRUMENTADAS = (
+    "carregar_gastos", "salvar_gastos", "registrar_alteracao", "reaplicar_journal",
+    "carregar_agregados", "adicionar_em_lote", "importar_extrato",
+    "filtrar_por_mes", "filtrar_por_intervalo", "iterar_por_mes", "iterar_por_intervalo",
+    "buscar_gastos", "ordenar_gastos",
+    "calcular_resumo", "calcular_resumo_do_mes", "resumo_por_categoria", "agregados_paralelos",
+    "relatorio_por_periodo",
+    "exportar_csv",
+)
+
+# nome -> [chamadas, segundos, linhas recebidas, linhas devolvidas]
+PERFIL_FUNCOES = {}
+PERFIL_CONTADORES = {"bytes_lidos": 0, "bytes_escritos": 0, "strptime": 0, "normalizar_texto": 0}
+
+
+def tamanho_ou_zero(objeto):
+    if isinstance(objeto, (str, bytes, dict)):
+        return 0
+    try:
+        return len(objeto)
+    except TypeError:
+        return 0
+
+
+def instrumentar(nome, funcao):
+    estatisticas = PERFIL_FUNCOES.setdefault(nome, [0, 0.0, 0, 0])
+
+    def gerador_medido(gerador):
+        # Geradores (iterar_*) trabalham durante a iteração, não na chamada.
+        while True:
+            inicio = time.perf_counter()
+            try:
+                item = next(gerador)
+            except StopIteration:
+                estatisticas[1] += time.perf_counter() - inicio
+                return
+            estatisticas[1] += time.perf_counter() - inicio
+            estatisticas[3] += 1
+            yield item
+
+    def medida(*args, **kwargs):
+        inicio = time.perf_counter()
+        resultado = funcao(*args, **kwargs)
+        estatisticas[0] += 1
+        estatisticas[1] += time.perf_counter() - inicio
+        if args:
+            estatisticas[2] += tamanho_ou_zero(args[0])
+        if isinstance(resultado, types.GeneratorType):
+            return gerador_medido(resultado)
+        estatisticas[3] += tamanho_ou_zero(resultado)
+        return resultado
+
+    medida.__wrapped__ = funcao
+    return medida
+
+
+class ArquivoContado:
+    """Repassa tudo ao arquivo real, somando o que foi lido e escrito.
+
+    Em arquivos de texto a contagem é em caracteres.
+    """
+
+    def __init__(self, arquivo):
+        self._arquivo = arquivo
+
+    def __getattr__(self, nome):
+        return getattr(self._arquivo, nome)
+
+    def __enter__(self):
+        self._arquivo.__enter__()
+        return self
+
+    def __exit__(self, *excecao):
+        return self._arquivo.__exit__(*excecao)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        linha = next(self._arquivo)
+        PERFIL_CONTADORES["bytes_lidos"] += len(linha)
+        return linha
+
+    def read(self, *args):
+        dados = self._arquivo.read(*args)
+        PERFIL_CONTADORES["bytes_lidos"] += len(dados)
+        return dados
+
+    def readline(self, *args):
+        linha = self._arquivo.readline(*args)
+        PERFIL_CONTADORES["bytes_lidos"] += len(linha)
+        return linha
+
+    def write(self, dados):
+        PERFIL_CONTADORES["bytes_escritos"] += len(dados)
+        return self._arquivo.write(dados)
+
+
+def open_contado(*args, **kwargs):
+    return ArquivoContado(open_original(*args, **kwargs))
+
+
+class DatetimeContado(datetime):
+    @classmethod
+    def strptime(cls, texto, formato):
+        PERFIL_CONTADORES["strptime"] += 1
+        return super().strptime(texto, formato)
+
+
+def normalizar_texto_contado(s):
+    PERFIL_CONTADORES["normalizar_texto"] += 1
+    return normalizar_texto_original(s)
+
+
+def ativar_instrumentacao():
+    global open, datetime, normalizar_texto, open_original, normalizar_texto_original
+    if PERFIL_FUNCOES:
+        return
+    modulo = globals()
+    for nome in FUNCOES_INSTRUMENTADAS:
+        modulo[nome] = instrumentar(nome, modulo[nome])
+    open_original, open = open, open_contado
+    normalizar_texto_original, normalizar_texto = normalizar_texto, normalizar_texto_contado
+    datetime = DatetimeContado
+
+    perfilador = None
+    caminho_pstats = os.environ.get("GASTOS_PERFIL_PSTATS")
+    if caminho_pstats:
+        import cProfile
+        perfilador = cProfile.Profile()
+        perfilador.enable()
+    inicio = time.perf_counter()
+
+    def ao_sair():
+        if perfilador is not None:
+            perfilador.disable()
+            perfilador.dump_stats(caminho_pstats)
+        relatorio = relatorio_de_perfil(time.perf_counter() - inicio)
+        if perfilador is not None:
+            relatorio += f"\nPerfil do cProfile gravado em {caminho_pstats}"
+        print(relatorio, file=sys.stderr)
+
+    atexit.register(ao_sair)
+
+
+def relatorio_de_perfil(duracao):
+    linhas = [
+        f"\n=== Perfil da sessão ({duracao:.2f} s) ===",
+        f"{'função':<24} {'chamadas':>8} {'total (s)':>10} {'média (ms)':>11} {'linhas rec.':>12} {'linhas dev.':>12}",
+    ]
+    usadas = sorted(
+        ((nome, e) for nome, e in PERFIL_FUNCOES.items() if e[0]),
+        key=lambda item: item[1][1], reverse=True,
+    )
+    for nome, (chamadas, segundos, recebidas, devolvidas) in usadas:
+        linhas.append(
+            f"{nome:<24} {chamadas:>8} {segundos:>10.3f} {segundos / chamadas * 1000:>11.2f} "
+            f"{recebidas:>12} {devolvidas:>12}"
+        )
+    c = PERFIL_CONTADORES
+    linhas.append(
+        f"\nBytes lidos: {c['bytes_lidos']} | bytes escritos: {c['bytes_escritos']} | "
+        f"strptime: {c['strptime']} | normalizar_texto: {c['normalizar_texto']}"
+    )
+    cache = normalizar_texto_original.cache_info()
+    linhas.append(f"Cache de normalizar_texto: {cache.hits} acertos, {cache.misses} faltas ({cache.currsize}/{cache.maxsize})")
+    return "\n".join(linhas)
+
+
 # ===================
 # App
 # ===================
 
 def main():
+    try:
+        configurar_gravacao(POLITICA_GRAVACAO)
+    except ValueError as e:
+        sys.exit(f"GASTOS_GRAVACAO: {e}")
+
     usuario = menu_autenticacao()
     if usuario is None:
         return
@@ -790,47 +4760,58 @@ def main():
 
         opcao = input("\n> ").strip().lower()
 
-        if opcao == "1":
-            adicionar_gasto(gastos, usuario)
-            if not perguntar_voltar_ou_encerrar(gastos, usuario):
-                break
+        try:
+            if opcao == "1":
+                adicionar_gasto(gastos, usuario)
+                if not perguntar_voltar_ou_encerrar(gastos, usuario):
+                    break
 
-        elif opcao == "2":
-            editar_gasto(gastos, usuario)
-            pausar()
-            if not perguntar_voltar_ou_encerrar(gastos, usuario):
-                break
+            elif opcao == "2":
+                editar_gasto(gastos, usuario)
+                pausar()
+                if not perguntar_voltar_ou_encerrar(gastos, usuario):
+                    break
 
-        elif opcao == "3":
-            remover_gasto(gastos, usuario)
-            pausar()
-            if not perguntar_voltar_ou_encerrar(gastos, usuario):
-                break
+            elif opcao == "3":
+                remover_gasto(gastos, usuario)
+                pausar()
+                if not perguntar_voltar_ou_encerrar(gastos, usuario):
+                    break
 
-        elif opcao == "4":
-            menu_listagem(gastos)
+            elif opcao == "4":
+                menu_listagem(gastos, usuario)
 
-        elif opcao == "5":
-            menu_busca(gastos)
+            elif opcao == "5":
+                menu_busca(gastos, usuario)
 
-        elif opcao == "6":
-            menu_resumo(gastos)
+            elif opcao == "6":
+                menu_resumo(gastos)
 
-        elif opcao == "7":
-            menu_exportar(gastos)
+            elif opcao == "7":
+                menu_exportar(gastos)
 
-        elif opcao == "8":
-            menu_dados(gastos, usuario)
+            elif opcao == "8":
+                menu_dados(gastos, usuario)
 
-        elif opcao == "sair":
-            salvar_gastos(gastos, usuario)
-            print("\nEncerrando...")
-            break
+            elif opcao == "sair":
+                gravar_pendentes()
+                print("\nEncerrando...")
+                break
 
-        else:
-            print("\nOpção inválida.")
+            else:
+                print("\nOpção inválida.")
+                pausar()
+        except ConflitoDeVersao:
+            # Outra sessão gravou antes: a alteração desta não foi gravada.
+            print("\n⚠️ Os gastos foram alterados em outra sessão. A lista foi recarregada;")
+            print("   repita a última operação.")
+            recarregar_gastos(gastos, usuario)
             pausar()
 
 
 if __name__ == "__main__":
+    if os.environ.get("GASTOS_PERFIL"):
+        ativar_instrumentacao()
+    if len(sys.argv) > 1:
+        sys.exit(main_cli(sys.argv[1:]))
     main()
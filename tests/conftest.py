@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def pasta(tmp_path, monkeypatch):
+    """Cada teste roda numa pasta vazia, com backend JSON e gravação imediata."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(main, "BACKEND_ARMAZENAMENTO", "json")
+    monkeypatch.setattr(main, "FILA_GRAVACAO", None)
+    return tmp_path
+
+
+@pytest.fixture
+def gasto():
+    """Monta o dict de um gasto; os campos não informados têm valores fixos."""
+    def novo(descricao="x", categoria="c", valor=1, data="2026-01-02"):
+        return {"descricao": descricao, "categoria": categoria, "valor": valor, "data": data}
+    return novo
@@ -0,0 +1,43 @@
+import hashlib
+import json
+import os
+
+import main
+
+
+def foto(pasta):
+    return {nome: hashlib.sha256((pasta / nome).read_bytes()).hexdigest()
+            for nome in sorted(os.listdir(pasta)) if (pasta / nome).is_file()}
+
+
+def preparar_usuarios(gasto):
+    main.salvar_usuarios({u: {"senha_hash": "x"} for u in ("ana", "bia", "caio")})
+    g = main.carregar_gastos("ana")
+    g.append(gasto(descricao="a", valor=1))
+    main.salvar_gastos(g, "ana")
+    novo = gasto(descricao="b", valor=2, data="2026-02-01")
+    g.append(novo)
+    main.registrar_alteracao(g, "ana", "add", gasto=novo)
+    with open(main.arquivo_journal_do_usuario("ana"), "a") as arquivo:
+        arquivo.write('{"op": "edit", "id": 99, "gasto": {}}\n{"op":')
+    with open(main.arquivo_dados_do_usuario("bia"), "w") as arquivo:
+        json.dump([gasto(descricao="c", valor=5)], arquivo)
+    with open(main.arquivo_dados_do_usuario("caio"), "w") as arquivo:
+        arquivo.write("{corrompido")
+
+
+def test_relatorio_soma_os_usuarios_e_aponta_os_ilegiveis(gasto):
+    preparar_usuarios(gasto)
+    relatorio = main.relatorio_administrativo(processos=2)
+    assert relatorio["quantidade"] == 3 and relatorio["total"] == 8.0
+    assert sorted(relatorio["usuarios"]) == ["ana", "bia"] and list(relatorio["erros"]) == ["caio"]
+
+
+def test_leitura_sem_alterar_nao_grava_nada(pasta, gasto):
+    preparar_usuarios(gasto)
+    antes = foto(pasta)
+    for backend in ("json", "binario"):
+        assert [x["descricao"] for x in main.ler_gastos_sem_alterar("ana", backend)] == ["a", "b"]
+        assert len(main.ler_gastos_sem_alterar("bia", backend)) == 1
+    main.relatorio_administrativo(processos=2)
+    assert foto(pasta) == antes
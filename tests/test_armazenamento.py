@@ -0,0 +1,62 @@
+import json
+import os
+
+import main
+
+
+def test_salvar_e_carregar_mantem_ids_e_valores(gasto):
+    g = main.carregar_gastos("ana")
+    g.append(gasto(valor="12,50"))
+    g.append(gasto(data=None))
+    main.salvar_gastos(g, "ana")
+    assert list(main.carregar_gastos("ana")) == list(g)
+    assert main.carregar_gastos("ana").resumo()[1] == 1350
+
+
+def test_alteracoes_vao_para_o_journal_sem_regravar_o_snapshot(gasto):
+    g = main.carregar_gastos("ana")
+    g.append(gasto(descricao="a"))
+    main.salvar_gastos(g, "ana")
+    snapshot = open(main.arquivo_dados_do_usuario("ana"), "rb").read()
+
+    novo = gasto(descricao="b")
+    g.append(novo)
+    main.registrar_alteracao(g, "ana", "add", gasto=novo)
+    main.registrar_alteracao(g, "ana", "del", id_gasto=1, anterior=g.remover_por_id(1))
+    assert open(main.arquivo_dados_do_usuario("ana"), "rb").read() == snapshot
+    assert [x["descricao"] for x in main.carregar_gastos("ana")] == ["b"]
+
+
+def test_linha_ruim_do_journal_e_pulada_e_guardada(gasto):
+    g = main.carregar_gastos("ana")
+    g.append(gasto(descricao="a"))
+    main.salvar_gastos(g, "ana")
+    journal = main.arquivo_journal_do_usuario("ana")
+    with open(journal, "a") as arquivo:
+        for registro in ({"op": "add", "gasto": gasto(descricao="b")},
+                         {"op": "edit", "id": 99, "gasto": gasto(descricao="?")},
+                         {"op": "add", "gasto": gasto(descricao="c", valor=None)},
+                         {"op": "add", "gasto": gasto(descricao="d")}):
+            arquivo.write(json.dumps(registro) + "\n")
+    tamanho = os.path.getsize(journal)
+
+    for _ in range(2):
+        g = main.carregar_gastos("ana")
+        assert [x["descricao"] for x in g] == ["a", "b", "d"]
+    assert os.path.getsize(journal) == tamanho
+    with open(journal + ".rejeitados") as arquivo:
+        assert len(arquivo.readlines()) == 2
+
+
+def test_final_incompleto_do_journal_e_descartado(gasto):
+    g = main.carregar_gastos("ana")
+    g.append(gasto(descricao="a"))
+    main.salvar_gastos(g, "ana")
+    with open(main.arquivo_journal_do_usuario("ana"), "a") as arquivo:
+        arquivo.write(json.dumps({"op": "add", "gasto": gasto(descricao="b")}) + '\n{"op": "add", "gas')
+    assert [x["descricao"] for x in main.carregar_gastos("ana")] == ["a", "b"]
+    novo = gasto(descricao="c")
+    g = main.carregar_gastos("ana")
+    g.append(novo)
+    main.registrar_alteracao(g, "ana", "add", gasto=novo)
+    assert [x["descricao"] for x in main.carregar_gastos("ana")] == ["a", "b", "c"]
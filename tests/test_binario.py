@@ -0,0 +1,57 @@
+from array import array
+
+import pytest
+
+import main
+
+
+@pytest.fixture(autouse=True)
+def binario(monkeypatch):
+    monkeypatch.setattr(main, "BACKEND_ARMAZENAMENTO", "binario")
+
+
+def test_snapshot_binario_ida_e_volta(gasto):
+    g = main.carregar_gastos("ana")
+    g.extend([gasto(descricao="Pão", valor="2,35"), gasto(categoria="Lazer", data=None), gasto(data="31/02")])
+    main.salvar_gastos(g, "ana")
+    novo = gasto(descricao="depois")
+    g.append(novo)
+    main.registrar_alteracao(g, "ana", "add", gasto=novo)
+
+    lido = main.carregar_gastos("ana")
+    assert list(lido) == list(g)
+    assert lido.resumo() == g.resumo()
+    assert main.filtrar_por_mes(lido, "2026-01") == main.filtrar_por_mes(g, "2026-01")
+
+
+def test_json_existente_e_convertido(gasto, monkeypatch):
+    monkeypatch.setattr(main, "BACKEND_ARMAZENAMENTO", "json")
+    g = main.carregar_gastos("ana")
+    g.append(gasto(valor=7))
+    main.salvar_gastos(g, "ana")
+    monkeypatch.setattr(main, "BACKEND_ARMAZENAMENTO", "binario")
+    assert [x["valor"] for x in main.carregar_gastos("ana")] == [7.0]
+
+
+def test_snapshot_v1_em_reais_migra_para_centavos(gasto):
+    g = main.carregar_gastos("ana")
+    g.extend([gasto(valor=0.29), gasto(valor=10), gasto(valor=1.01)])
+    main.salvar_gastos(g, "ana")
+
+    # Regrava o arquivo como a versão 1 do formato: valores em reais (double).
+    caminho = main.arquivo_binario_do_usuario("ana")
+    conteudo = bytearray(open(caminho, "rb").read())
+    campos = list(main.CABECALHO_BINARIO.unpack_from(conteudo, 0))
+    campos[1] = 1
+    inicio, tamanho = campos[6], campos[7]
+    centavos = array("q", bytes(conteudo[inicio:inicio + tamanho]))
+    conteudo[inicio:inicio + tamanho] = array("d", [c / 100 for c in centavos]).tobytes()
+    main.CABECALHO_BINARIO.pack_into(conteudo, 0, *campos)
+    open(caminho, "wb").write(bytes(conteudo))
+
+    lido = main.carregar_gastos("ana")
+    assert [x["valor"] for x in lido] == [0.29, 10.0, 1.01] and lido.resumo()[1] == 1130
+    lido.append(gasto(valor=1))
+    main.salvar_gastos(lido, "ana")
+    assert main.CABECALHO_BINARIO.unpack_from(open(caminho, "rb").read(), 0)[1] == main.VERSAO_BINARIO
+    assert main.carregar_gastos("ana").resumo()[1] == 1230
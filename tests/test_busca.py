@@ -0,0 +1,48 @@
+import unicodedata
+
+import main
+from main import GastosTable
+
+
+def test_busca_ignora_acentos_e_maiusculas(gasto):
+    t = GastosTable([gasto(descricao="Pão de Açúcar", categoria="Mercado"), gasto(descricao="Uber"),
+                     gasto(descricao="PAO FRANCES", categoria="Padaria")])
+    assert [g["id"] for g in main.buscar_gastos(t, "pao")] == [1, 3]
+    assert [g["id"] for g in main.buscar_gastos(t, "  AÇU")] == [1]
+    assert [g["id"] for g in main.buscar_gastos(t, "pao", categoria="padaria")] == [3]
+    assert main.buscar_gastos(t, "xyz") == []
+
+
+def test_busca_na_tabela_igual_a_da_lista(gasto):
+    dados = [gasto(descricao=f"compra {i % 13} café", categoria="ab"[i % 2]) for i in range(200)]
+    t = GastosTable(dict(g) for g in dados)
+    lista = list(t)
+    for termo, categoria in (("pra 1", None), ("e", "b"), ("cafe", "a"), ("ra 12 ca", None), ("", "b")):
+        assert main.buscar_gastos(t, termo, categoria) == main.buscar_gastos(lista, termo, categoria)
+
+
+def test_indice_de_busca_acompanha_edicoes(gasto):
+    t = GastosTable([gasto(descricao="aluguel"), gasto(descricao="luz")])
+    main.buscar_gastos(t, "alu")
+    t.editar_por_id(1, gasto(descricao="condomínio"))
+    t.append(gasto(descricao="Aluguel novo"))
+    assert [g["id"] for g in main.buscar_gastos(t, "alu")] == [3]
+    assert [g["id"] for g in main.buscar_gastos(t, "condominio")] == [1]
+
+
+def test_normalizar_texto_tira_acentos_e_letras_especiais():
+    assert main.normalizar_texto("  Ação CAFÉ ") == "acao cafe"
+    assert main.normalizar_texto("Straße Øresund Æble Łódź") == "strasse oresund aeble lodz"
+    assert main.normalizar_texto("ño") == "no"
+    assert main.normalizar_texto(None) == "" and main.normalizar_texto("") == ""
+    assert main.normalizar_texto("日本 ok") == "日本 ok"
+
+
+def test_tabela_de_acentos_igual_a_decomposicao_unicode():
+    for codigo in range(0xC0, 0x250):
+        letra = chr(codigo).lower()
+        if letra in main.LETRAS_SEM_DECOMPOSICAO:
+            continue
+        base = "".join(c for c in unicodedata.normalize("NFD", letra) if not unicodedata.combining(c))
+        if base.isascii():
+            assert main.normalizar_texto(letra) == base, letra
@@ -0,0 +1,39 @@
+import json
+
+import pytest
+
+import main
+
+
+@pytest.fixture
+def cli(capsys):
+    """Roda a CLI como usuário "ana" (senha 1234) e devolve (código, saída JSON)."""
+    main.salvar_usuarios({"ana": {"senha_hash": main.hash_senha("1234")}})
+
+    def rodar(*argv):
+        codigo = main.main_cli(["--usuario", "ana", "--senha", "1234", "--json"] + list(argv))
+        return codigo, json.loads(capsys.readouterr().out)
+    return rodar
+
+
+def test_add_list_e_summary(cli):
+    for descricao, valor, data in (("Café", "4,50", "2026-01-02"), ("Uber", "20", "2026-02-03"),
+                                   ("Pão", "3", "2026-02-04")):
+        assert cli("add", "--descricao", descricao, "--categoria", "c", "--valor", valor, "--data", data)[0] == 0
+    codigo, listados = cli("list", "--mes", "2026-02", "--ordenar=-valor")
+    assert codigo == 0 and [g["descricao"] for g in listados] == ["Uber", "Pão"]
+    assert cli("summary")[1]["total"] == 27.5
+
+
+def test_edit_muda_so_os_campos_pedidos(cli):
+    cli("add", "--descricao", "a", "--categoria", "c", "--valor", "2", "--data", "2026-01-02")
+    assert cli("edit", "1", "--valor", "3,5")[0] == 0
+    assert main.carregar_gastos("ana").gasto_por_id(1) == {
+        "id": 1, "descricao": "a", "categoria": "c", "valor": 3.5, "data": "2026-01-02"}
+
+
+def test_erros_saem_como_json_com_codigo_1(cli):
+    assert cli("remove", "7") == (1, {"erro": "gasto #7 não encontrado"})
+    codigo, saida = cli("add", "--descricao", "x", "--valor", "abc")
+    assert codigo == 1 and "erro" in saida
+    assert main.main_cli(["--usuario", "ana", "--senha", "errada", "--json", "list"]) == 1
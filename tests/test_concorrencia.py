@@ -0,0 +1,66 @@
+import os
+import subprocess
+import sys
+
+import main
+
+MAIN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+
+
+def test_politica_em_lote_grava_a_cada_n_alteracoes(monkeypatch, gasto):
+    monkeypatch.setattr(main, "FILA_GRAVACAO", main.FilaDeGravacao("lote:3"))
+    g = main.carregar_gastos("ana")
+    journal = main.arquivo_journal_do_usuario("ana")
+    for i in range(5):
+        novo = gasto(valor=i + 1)
+        g.append(novo)
+        main.registrar_alteracao(g, "ana", "add", gasto=novo)
+        assert main.FILA_GRAVACAO.tem_pendentes("ana") == (i != 2)
+    assert os.path.exists(journal) and len(main.carregar_gastos("ana")) == 3
+    main.gravar_pendentes()
+    assert len(main.carregar_gastos("ana")) == 5
+
+
+def test_conflito_reaplica_so_os_campos_alterados(monkeypatch, gasto):
+    g = main.carregar_gastos("ana")
+    g.append(gasto(descricao="x", valor=5))
+    g.append(gasto(descricao="y", valor=7))
+    main.salvar_gastos(g, "ana")
+    ids = [x["id"] for x in g]
+    a = main.carregar_gastos("ana")
+
+    # Outra sessão muda o valor do primeiro e a descrição do segundo.
+    b = main.carregar_gastos("ana")
+    for id_gasto, campo, novo in ((ids[0], "valor", 99), (ids[1], "descricao", "B")):
+        alterado = dict(b.gasto_por_id(id_gasto), **{campo: novo})
+        b.editar_por_id(id_gasto, alterado)
+        main.registrar_alteracao(b, "ana", "edit", id_gasto=id_gasto, gasto=alterado)
+
+    # Esta sessão renomeia os dois: o primeiro junta, o segundo é recusado.
+    fila = main.FilaDeGravacao("saida")
+    monkeypatch.setattr(main, "FILA_GRAVACAO", fila)
+    for id_gasto, nome in ((ids[0], "renomeado"), (ids[1], "A")):
+        antes = a.gasto_por_id(id_gasto)
+        novo = dict(antes, descricao=nome)
+        a.editar_por_id(id_gasto, novo)
+        main.registrar_alteracao(a, "ana", "edit", id_gasto=id_gasto, gasto=novo, anterior=antes)
+    fila.gravar()
+
+    esperado = [("renomeado", 99.0), ("B", 7.0)]
+    assert [(x["descricao"], x["valor"]) for x in main.carregar_gastos("ana")] == esperado
+    assert [(x["descricao"], x["valor"]) for x in a] == esperado
+
+
+def test_adds_de_processos_concorrentes_sao_todos_gravados(pasta):
+    main.salvar_usuarios({"ana": {"senha_hash": main.hash_senha("1234")}})
+    ambiente = dict(os.environ, GASTOS_BACKEND="json", GASTOS_GRAVACAO="imediata")
+    processos = [subprocess.Popen([sys.executable, MAIN, "--usuario", "ana", "--senha", "1234", "add",
+                                   "--descricao", f"compra {i}", "--categoria", "c", "--valor", str(i + 1)],
+                                  env=ambiente, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+                 for i in range(16)]
+    for processo in processos:
+        _, erro = processo.communicate(timeout=60)
+        assert processo.returncode == 0, erro
+    g = main.carregar_gastos("ana")
+    assert sorted(x["descricao"] for x in g) == sorted(f"compra {i}" for i in range(16))
+    assert sorted(x["id"] for x in g) == list(range(1, 17))
@@ -0,0 +1,25 @@
+import csv
+import gzip
+
+import main
+from main import GastosTable
+
+
+def test_exporta_um_gerador_em_lotes(pasta, gasto):
+    t = GastosTable(gasto(descricao=f"d{i}", valor=i, data=f"2026-0{i % 3 + 1}-01") for i in range(1, 11))
+    chamadas = []
+    total = main.exportar_csv(main.iterar_por_mes(t, "2026-02"), str(pasta / "fev.csv"), tamanho_lote=2,
+                              progresso=lambda linhas, segundos: chamadas.append(linhas))
+    with open(pasta / "fev.csv", newline="", encoding="utf-8") as arquivo:
+        linhas = list(csv.reader(arquivo, delimiter=";"))
+    assert total == 4 and chamadas == [2, 4, 4]
+    assert linhas == [["data", "descricao", "categoria", "valor"], ["2026-02-01", "d1", "c", "1.00"],
+                      ["2026-02-01", "d4", "c", "4.00"], ["2026-02-01", "d7", "c", "7.00"],
+                      ["2026-02-01", "d10", "c", "10.00"]]
+
+
+def test_exporta_em_gzip(pasta, gasto):
+    t = GastosTable([gasto(descricao="Pão", valor=2.5, data=None)])
+    assert main.exportar_csv(t, str(pasta / "tudo.csv.gz"), compactar=True) == 1
+    with gzip.open(pasta / "tudo.csv.gz", "rt", encoding="utf-8") as arquivo:
+        assert arquivo.read().splitlines() == ["data;descricao;categoria;valor", ";Pão;c;2.50"]
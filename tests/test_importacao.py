@@ -0,0 +1,46 @@
+import main
+
+OFX = """OFXHEADER:100
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20260105<TRNAMT>-42.50<MEMO>Mercado</STMTTRN>
+<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20260106<TRNAMT>1500.00<MEMO>Salario</STMTTRN>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20260107<TRNAMT>abc<MEMO>Ruim</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+
+
+def test_ofx_importa_debitos_e_ignora_creditos(pasta):
+    (pasta / "extrato.ofx").write_text(OFX)
+    g = main.carregar_gastos("ana")
+    importados, erros, quarentena, ignorados = main.importar_extrato(g, "ana", str(pasta / "extrato.ofx"))
+    assert (importados, ignorados, len(erros)) == (1, 1, 1)
+    assert quarentena is not None
+    assert [(x["descricao"], x["valor"], x["data"]) for x in main.carregar_gastos("ana")] == [
+        ("Mercado", 42.5, "2026-01-05")
+    ]
+
+
+def test_csv_com_linha_ruim_importa_as_outras(pasta):
+    (pasta / "extrato.csv").write_text(
+        "descricao;categoria;valor;data\nPão;Mercado;5,50;2026-01-02\nErro;Mercado;xx;2026-01-02\n"
+    )
+    g = main.carregar_gastos("ana")
+    importados, erros, _, _ = main.importar_extrato(g, "ana", str(pasta / "extrato.csv"))
+    assert importados == 1 and [e["linha"] for e in erros] == [3]
+    assert main.carregar_gastos("ana").resumo()[1] == 550
+
+
+def test_json_com_tipos_errados_rejeita_so_essas_linhas(pasta):
+    (pasta / "extrato.json").write_text(
+        '[{"descricao": "ok", "valor": "2", "data": "2026-01-02"},'
+        ' {"descricao": "d", "valor": 1, "data": 20260101},'
+        ' {"descricao": ["a"], "valor": 1},'
+        ' {"descricao": "c", "categoria": 7, "valor": 1},'
+        ' {"descricao": "v", "valor": [1]},'
+        ' "texto"]'
+    )
+    g = main.carregar_gastos("ana")
+    importados, erros, quarentena, _ = main.importar_extrato(g, "ana", str(pasta / "extrato.json"))
+    assert importados == 1 and [e["linha"] for e in erros] == [2, 3, 4, 5, 6]
+    assert "data" in erros[0]["erro"] and quarentena is not None
+    assert [x["descricao"] for x in main.carregar_gastos("ana")] == ["ok"]
@@ -0,0 +1,53 @@
+from itertools import count
+
+import pytest
+
+import main
+from main import GastosTable
+
+
+@pytest.fixture
+def digitar(monkeypatch):
+    """Responde aos input() com as entradas dadas, em ordem."""
+    monkeypatch.setattr(main, "limpar_tela", lambda: None)
+    monkeypatch.setattr(main, "pausar", lambda: None)
+
+    def responder(*entradas):
+        restantes = iter(entradas)
+        monkeypatch.setattr("builtins.input", lambda prompt="": next(restantes))
+    return responder
+
+
+def test_paginas_de_um_gerador_leem_so_ate_a_pagina(gasto):
+    lidos = count()
+    gerador = (dict(gasto(valor=i), id=i) for i in range(1, 1000) if next(lidos) is not None)
+    paginas = main.PaginasDeGastos(gerador)
+    linhas, tem_mais = paginas.pagina(2, 20)
+    assert [i for i, _ in linhas] == list(range(40, 60)) and linhas[0][1]["id"] == 41
+    assert tem_mais and paginas.total() is None
+    assert next(lidos) == 61
+
+
+@pytest.mark.parametrize("entradas, esperado", [
+    (["-valor", ""], [5, 3, 1]),
+    (["valor", "desc", ""], [5, 3, 1]),
+    (["valor", "cresc", ""], [1, 3, 5]),
+])
+def test_listagem_pergunta_o_sentido_so_sem_menos(digitar, monkeypatch, gasto, entradas, esperado):
+    t = GastosTable(gasto(valor=v) for v in (1, 5, 3))
+    mostrados = []
+    monkeypatch.setattr(main, "listar_gastos", lambda gastos: mostrados.append([g["valor"] for g in gastos]))
+    monkeypatch.setattr(main, "editar_ou_remover_da_lista", lambda *args: None)
+    digitar("4", *entradas, "0")
+    main.menu_listagem(t, "ana")
+    assert mostrados == [esperado]
+
+
+def test_seletor_numero_e_posicao_e_hash_e_id(digitar, gasto):
+    t = GastosTable(dict(gasto(descricao=d), id=i) for i, d in ((7, "a"), (3, "b"), (9, "c")))
+    digitar("2")
+    assert main.paginar_gastos(t, selecionar=True) == 3
+    digitar("#9")
+    assert main.paginar_gastos(t, selecionar=True) == 9
+    digitar("5", "0")
+    assert main.paginar_gastos(t, selecionar=True) is None
@@ -0,0 +1,35 @@
+import pytest
+
+import main
+from main import GastosTable
+
+
+@pytest.fixture
+def tabela(gasto):
+    return GastosTable(gasto(descricao=f"Item {i % 7}", categoria="bÁa"[i % 3], valor=i % 11,
+                             data=f"2026-01-{i % 28 + 1:02d}" if i % 5 else None) for i in range(60))
+
+
+@pytest.mark.parametrize("chave", ["valor", "-data", "categoria,-valor", "descricao,data,valor", "-categoria,data"])
+def test_tabela_ordena_como_a_lista(tabela, chave):
+    lista = list(tabela)
+    assert main.ordenar_gastos(tabela, chave) == main.ordenar_gastos(lista, chave)
+    assert main.ordenar_gastos(tabela, chave, limite=5) == main.ordenar_gastos(lista, chave)[:5]
+
+
+def test_menos_e_reverso_sao_decrescentes(gasto):
+    t = GastosTable(gasto(valor=v) for v in (1, 5, 3))
+    assert [g["valor"] for g in main.ordenar_gastos(t, "-valor")] == [5, 3, 1]
+    assert [g["valor"] for g in main.ordenar_gastos(t, "valor", reverso=True)] == [5, 3, 1]
+
+
+def test_sem_data_vai_para_o_fim_e_edicao_refaz_a_ordem(gasto):
+    t = GastosTable([gasto(data=None), gasto(data="2026-03-01"), gasto(data="2026-01-01")])
+    assert [g["id"] for g in main.ordenar_gastos(t, "data")] == [3, 2, 1]
+    t.editar_por_id(1, gasto(data="2025-12-31"))
+    assert [g["id"] for g in main.ordenar_gastos(t, "data")] == [1, 3, 2]
+
+
+def test_campo_invalido_e_recusado():
+    with pytest.raises(ValueError):
+        main.interpretar_ordem("valor,preco")
@@ -0,0 +1,24 @@
+import os
+import subprocess
+import sys
+
+import main
+
+MAIN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+
+
+def test_sem_perfil_nada_e_trocado():
+    assert not hasattr(main.carregar_gastos, "__wrapped__")
+    assert "open" not in vars(main) and main.datetime.strptime.__self__ is not main.DatetimeContado
+
+
+def test_perfil_mostra_as_operacoes_e_grava_pstats(pasta):
+    main.salvar_usuarios({"ana": {"senha_hash": main.hash_senha("1234")}})
+    ambiente = dict(os.environ, GASTOS_PERFIL_PSTATS=str(pasta / "sessao.pstats"))
+    for argv in (["add", "--descricao", "Café", "--valor", "4"], ["summary"]):
+        saida = subprocess.run([sys.executable, MAIN, "--usuario", "ana", "--senha", "1234", "--perfil"] + argv,
+                               capture_output=True, text=True, env=ambiente, check=True)
+    assert "=== Perfil da sessão" in saida.stderr
+    linhas = {linha.split()[0]: linha.split() for linha in saida.stderr.splitlines() if linha.strip()}
+    assert linhas["carregar_gastos"][1] == "1" and linhas["calcular_resumo"][1] == "1"
+    assert "Perfil do cProfile gravado em" in saida.stderr and (pasta / "sessao.pstats").exists()
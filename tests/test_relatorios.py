@@ -0,0 +1,52 @@
+import pytest
+
+import main
+from main import GastosTable
+
+
+@pytest.fixture
+def historico(gasto):
+    return GastosTable([gasto(categoria="Mercado", valor=10, data="2025-01-10"),
+                        gasto(categoria="Lazer", valor=20, data="2025-02-03"),
+                        gasto(categoria="mercado", valor=30, data="2025-04-20"),
+                        gasto(categoria="Lazer", valor=40, data="2026-01-05")])
+
+
+def test_meses_sem_gastos_entram_e_medias_usam_o_calendario(historico):
+    linhas = {linha["periodo"]: linha for linha in main.relatorio_por_periodo(historico)}
+    assert list(linhas)[0] == "2025-01" and list(linhas)[-1] == "2026-01" and len(linhas) == 13
+    assert linhas["2025-03"]["total"] == 0
+    assert linhas["2025-03"]["medias_moveis"] == {3: 1000, 6: None, 12: None}
+    assert linhas["2025-04"]["medias_moveis"][3] == 1667
+    assert linhas["2025-04"]["mes_anterior"] == {"base": 0, "variacao": 3000, "percentual": None}
+    assert linhas["2026-01"]["ano_anterior"] == {"base": 1000, "variacao": 3000, "percentual": 300.0}
+    assert linhas["2026-01"]["medias_moveis"] == {3: 1333, 6: 667, 12: 750}
+
+
+def test_ultimos_e_categoria(historico):
+    completo = main.relatorio_por_periodo(historico)
+    assert main.relatorio_por_periodo(historico, ultimos=2) == completo[-2:]
+    mercado = main.relatorio_por_periodo(historico, categoria="MERCADO")
+    assert [(linha["periodo"], linha["total"]) for linha in mercado] == [
+        ("2025-01", 1000), ("2025-02", 0), ("2025-03", 0), ("2025-04", 3000)]
+
+
+def test_relatorio_semanal_compara_com_a_semana_anterior(gasto):
+    t = GastosTable([gasto(valor=10, data="2025-12-29"), gasto(valor=25, data="2026-01-09")])
+    linhas = main.relatorio_por_periodo(t, por="semana")
+    assert [linha["periodo"] for linha in linhas] == ["2026-W01", "2026-W02"]
+    assert linhas[0]["semana_anterior"] is None
+    assert linhas[1]["semana_anterior"] == {"base": 1000, "variacao": 1500, "percentual": 150.0}
+
+
+@pytest.mark.parametrize("com_indice", [False, True])
+def test_por_semana_depois_de_edicoes_igual_ao_recalculo(gasto, com_indice):
+    t = GastosTable(gasto(categoria="abc"[i % 3], valor=i, data=f"2025-{i % 12 + 1:02d}-{i % 28 + 1:02d}")
+                    for i in range(1, 400))
+    t.por_semana()
+    if com_indice:
+        t.filtrar_datas(1, 2)
+    t.editar_por_id(3, gasto(valor=7, data="2025-03-09"))
+    t.append(gasto(categoria="nova", data="2025-07-15"))
+    t.remover_por_id(20)
+    assert t.por_semana() == GastosTable(list(t)).por_semana()
@@ -0,0 +1,18 @@
+import main
+from main import GastosTable
+
+
+def test_agregados_paralelos_iguais_aos_sequenciais(monkeypatch, gasto):
+    monkeypatch.setattr(main, "MINIMO_RESUMO_PARALELO", 0)
+    t = GastosTable(gasto(categoria="ab"[i % 2], valor=i, data=f"2026-0{i % 9 + 1}-01") for i in range(1, 500))
+    t.remover_por_id(7)
+    assert main.agregados_equivalentes(t.agregados(), main.agregados_paralelos(t, 2))
+    assert main.resumo_paralelo(t, 2) == main.calcular_resumo(t)
+
+
+def test_verificar_agregados_reconstroi_resumos_divergentes(gasto):
+    t = GastosTable([gasto(valor=1), gasto(valor=2)])
+    assert t.verificar_agregados()
+    t.adotar_agregados({"total": 0, "categorias": {}, "meses": {}})
+    assert not t.verificar_agregados(main.agregados_paralelos(t, 1))
+    assert t.resumo()[1] == 300
@@ -0,0 +1,67 @@
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+import main
+
+MAIN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+
+
+@pytest.fixture
+def servidor(pasta):
+    """Servidor real num socket Unix; devolve uma função que abre sessões."""
+    main.salvar_usuarios({u: {"senha_hash": main.hash_senha("1234")} for u in ("ana", "bia")})
+    caminho = str(pasta / "s.sock")
+    processo = subprocess.Popen([sys.executable, MAIN, "serve", "--endereco", f"unix:{caminho}", "--intervalo", "0"],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    limite = time.monotonic() + 10
+    while not os.path.exists(caminho):
+        assert processo.poll() is None and time.monotonic() < limite, "servidor não subiu"
+        time.sleep(0.05)
+
+    def sessao():
+        conexao = socket.socket(socket.AF_UNIX)
+        conexao.connect(caminho)
+        arquivo = conexao.makefile("rw", encoding="utf-8")
+
+        def pedir(**requisicao):
+            arquivo.write(json.dumps(requisicao) + "\n")
+            arquivo.flush()
+            return json.loads(arquivo.readline())
+        return pedir
+
+    yield sessao
+    processo.send_signal(signal.SIGTERM)
+    processo.wait(10)
+
+
+def test_sessoes_no_servidor(servidor):
+    ana, bia = servidor(), servidor()
+    assert ana(comando="list") == {"ok": False, "erro": "faça login primeiro"}
+    assert ana(comando="login", usuario="ana", senha="errada")["ok"] is False
+    for pedir, usuario in ((ana, "ana"), (bia, "bia")):
+        assert pedir(comando="login", usuario=usuario, senha="1234")["ok"]
+    criado = ana(comando="add", descricao="Café", categoria="c", valor="4,50", data="2026-01-02")
+    assert criado["ok"] and criado["resultado"]["id"] == 1
+    assert ana(comando="edit", id=1, valor=5)["ok"]
+    assert bia(comando="summary")["resultado"]["quantidade"] == 0
+    assert ana(comando="summary")["resultado"]["total"] == 5.0
+    assert ana(comando="list", mess=1)["ok"] is False
+    recusado = ana(comando="summary", processos=2)
+    assert recusado == {"ok": False, "erro": "summary: processos não é atendido pelo servidor"}
+    assert ana(comando="import", arquivo="x.csv")["ok"] is False
+    assert [g["valor"] for g in main.carregar_gastos("ana")] == [5.0]
+
+
+@pytest.mark.parametrize("pedido", ["usuarios.json", "../../x.csv", "/etc/passwd", "..\\..\\y.csv", ""])
+def test_export_do_servidor_fica_na_pasta_do_usuario(pedido):
+    caminho = main.saida_no_servidor("bob", pedido)
+    pasta = os.path.abspath(os.path.join(main.PASTA_EXPORT_SERVIDOR, "bob"))
+    assert os.path.dirname(os.path.abspath(caminho)) == pasta
+    assert os.path.basename(caminho).startswith("export_") and caminho.endswith(".csv")
@@ -0,0 +1,58 @@
+import pytest
+
+import main
+from main import GastosTable
+
+
+def gastos_de_exemplo(quantidade=300):
+    return [{"descricao": f"item {i % 17}", "categoria": "abcd"[i % 4], "valor": i % 90 + 0.5,
+             "data": f"2025-{i % 12 + 1:02d}-{i % 28 + 1:02d}" if i % 10 else None}
+            for i in range(quantidade)]
+
+
+@pytest.fixture
+def bases(monkeypatch):
+    """(GastosSQLite, GastosTable) com os mesmos gastos."""
+    monkeypatch.setattr(main, "BACKEND_ARMAZENAMENTO", "sqlite")
+    sqlite = main.carregar_gastos("ana")
+    sqlite.extend(gastos_de_exemplo())
+    yield sqlite, GastosTable(gastos_de_exemplo())
+    sqlite.conexao.close()
+
+
+def test_resumos_e_relatorios_iguais_aos_da_tabela(bases):
+    sqlite, tabela = bases
+    assert main.calcular_resumo(sqlite) == main.calcular_resumo(tabela)
+    assert main.agregados_equivalentes(sqlite.agregados(), tabela.agregados())
+    assert main.calcular_resumo_do_mes(sqlite, "2025-03") == main.calcular_resumo_do_mes(tabela, "2025-03")
+    for por in ("mes", "semana"):
+        assert main.relatorio_por_periodo(sqlite, por) == main.relatorio_por_periodo(tabela, por)
+
+
+def test_paginas_e_busca_vem_da_base(bases):
+    sqlite, tabela = bases
+    assert not hasattr(sqlite, "_valores")
+    paginas, esperadas = main.PaginasDeGastos(sqlite), main.PaginasDeGastos(tabela)
+    assert paginas.pagina(3, 20) == esperadas.pagina(3, 20)
+    assert paginas.pagina(50, 20) == esperadas.pagina(50, 20)
+    assert paginas.total() == len(tabela)
+    assert paginas.proximo_com(40, "item 5") == esperadas.proximo_com(40, "item 5")
+    assert sqlite[-1] == tabela[-1] and sqlite[10:13] == [tabela[i] for i in range(10, 13)]
+
+
+def test_alteracoes_gravadas_na_hora(bases):
+    sqlite, _ = bases
+    novo = {"descricao": "novo", "categoria": "z", "valor": "2,50", "data": "2026-02-03"}
+    sqlite.append(novo)
+    sqlite.editar_por_id(1, {"descricao": "e", "categoria": "z", "valor": 3, "data": None})
+    sqlite.remover_por_id(2)
+    with pytest.raises(ValueError):
+        sqlite.append({"descricao": "ruim", "valor": "abc"})
+    with pytest.raises(KeyError):
+        sqlite.remover_por_id(2)
+
+    outra = main.carregar_gastos("ana")
+    assert outra.gasto_por_id(novo["id"])["valor"] == 2.5
+    assert outra.gasto_por_id(1)["valor"] == 3.0
+    assert not outra.tem_id(2) and len(outra) == len(sqlite) == 300
+    outra.conexao.close()
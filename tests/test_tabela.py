@@ -0,0 +1,37 @@
+import main
+from main import GastosTable
+
+
+def test_tabela_guarda_os_gastos_como_foram_dados(gasto):
+    dados = [gasto(descricao="Pão", valor=2.5), gasto(categoria="Lazer", data=None), gasto(data="ruim")]
+    t = GastosTable(dict(g) for g in dados)
+    assert len(t) == 3
+    assert [{k: v for k, v in g.items() if k != "id"} for g in t] == dados
+    assert t[1]["categoria"] == "Lazer" and t[-1]["data"] == "ruim"
+
+
+def test_editar_remover_e_filtrar(gasto):
+    t = GastosTable([gasto(valor=1), gasto(valor=2), gasto(valor=3)])
+    t[0] = gasto(descricao="novo", valor=10)
+    assert t[0]["descricao"] == "novo" and t[0]["valor"] == 10.0
+    assert t.pop(1)["valor"] == 2.0
+    assert [g["valor"] for g in t] == [10.0, 3.0]
+    assert [g["valor"] for g in t.filtrar(lambda g: g["valor"] > 5)] == [10.0]
+    assert t.resumo() == (2, 1300, {"c": 1300})
+
+
+def test_ids_em_ordem_nao_montam_dicionario_de_posicoes(gasto):
+    t = GastosTable(gasto(valor=i) for i in range(1, 101))
+    assert t.tem_id(50) and t.gasto_por_id(50)["valor"] == 50.0
+    t.remover_por_id(10)
+    assert not t.tem_id(10) and t.gasto_por_id(11)["valor"] == 11.0
+    assert t._slots is None
+
+
+def test_ids_fora_de_ordem_continuam_achados(gasto):
+    t = GastosTable([dict(gasto(valor=5), id=5), dict(gasto(valor=2), id=2)])
+    assert [g["id"] for g in t] == [5, 2]
+    assert t.gasto_por_id(2)["valor"] == 2.0 and t.gasto_por_id(5)["valor"] == 5.0
+    novo = gasto()
+    t.append(novo)
+    assert novo["id"] == 6
@@ -0,0 +1,62 @@
+import json
+import sqlite3
+
+import pytest
+
+import main
+from main import GastosTable
+
+
+def test_valor_grande_demais_nao_altera_a_tabela(gasto):
+    t = GastosTable([gasto(valor=3)])
+    antes = list(t), t.resumo()
+    with pytest.raises(ValueError):
+        t.append(gasto(valor="9" * 40))
+    with pytest.raises(ValueError):
+        t.editar_por_id(1, gasto(descricao="novo", valor="1e999999"))
+    assert (list(t), t.resumo()) == antes
+
+
+def test_somas_sao_exatas_em_centavos(gasto):
+    t = GastosTable(gasto(valor=0.1) for _ in range(3))
+    assert t.resumo()[1] == 30
+    assert main.formatar_centavos(t.resumo()[1]) == "0.30"
+    assert main.centavos_de_texto("1234,565") == 123457 and main.centavos_de_valor(0.285) == 29
+
+
+def test_json_com_valores_ilegiveis_carrega_os_demais(gasto):
+    with open(main.arquivo_dados_do_usuario("ana"), "w") as arquivo:
+        json.dump([gasto(descricao="bom", valor=2), gasto(valor="abc"), gasto(valor=None),
+                   gasto(valor=1e300)], arquivo)
+    assert [x["descricao"] for x in main.carregar_gastos("ana")] == ["bom"]
+
+
+def test_sqlite_antigo_migra_valor_para_centavos(monkeypatch):
+    monkeypatch.setattr(main, "BACKEND_ARMAZENAMENTO", "sqlite")
+    conexao = sqlite3.connect(main.arquivo_sqlite_do_usuario("ana"))
+    conexao.execute(
+        "CREATE TABLE gastos (id INTEGER PRIMARY KEY, descricao TEXT NOT NULL DEFAULT '', "
+        "categoria TEXT NOT NULL DEFAULT '', valor REAL NOT NULL DEFAULT 0, data TEXT, dia TEXT, "
+        "descricao_n TEXT NOT NULL DEFAULT '', categoria_n TEXT NOT NULL DEFAULT '')"
+    )
+    conexao.executemany("INSERT INTO gastos (id, descricao, categoria, valor) VALUES (?, ?, ?, ?)",
+                        [(1, "a", "x", 0.285), (2, "b", "x", 0.1 + 0.2)])
+    conexao.execute("PRAGMA user_version = 1")
+    conexao.commit()
+    conexao.close()
+
+    g = main.carregar_gastos("ana")
+    assert [x["valor"] for x in g] == [0.29, 0.3]
+    assert main.calcular_resumo(g)[1] == 59
+    colunas = {coluna[1] for coluna in g.conexao.execute("PRAGMA table_info(gastos)")}
+    assert "centavos" in colunas and "valor" not in colunas
+    g.conexao.close()
+
+
+def test_media_arredonda_meio_centavo_para_cima(gasto, capsys):
+    assert main.media_em_centavos(11300, 8) == 1413 and main.media_em_centavos(-11300, 8) == -1413
+    assert main.media_em_centavos(1000, 3) == 333 and main.media_em_centavos(2000, 3) == 667
+    assert main.media_em_centavos(10 ** 17 + 1, 2) == 5 * 10 ** 16 + 1
+    t = GastosTable(gasto(valor=v) for v in ("14,12", "14,13") * 4)
+    main.mostrar_resumo(t)
+    assert "Média por gasto: R$ 14.13" in capsys.readouterr().out